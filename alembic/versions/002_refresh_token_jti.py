@@ -0,0 +1,35 @@
+"""Add jti to refresh_tokens
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '002'
+down_revision: Union[str, None] = '001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases built with create_all already have the column and index
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('refresh_tokens')}
+    if 'jti' not in columns:
+        # Nullable: rows issued before this revision are still matched by token_hash
+        op.add_column('refresh_tokens', sa.Column('jti', sa.String(length=32), nullable=True))
+
+    indexes = {index['name'] for index in inspector.get_indexes('refresh_tokens')}
+    if 'idx_refresh_tokens_jti' not in indexes:
+        op.create_index('idx_refresh_tokens_jti', 'refresh_tokens', ['jti'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_refresh_tokens_jti', table_name='refresh_tokens')
+    op.drop_column('refresh_tokens', 'jti')
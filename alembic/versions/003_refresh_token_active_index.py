@@ -0,0 +1,44 @@
+"""Partial index on active refresh token hashes
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '003'
+down_revision: Union[str, None] = '002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases built with create_all already have the index
+    inspector = sa.inspect(op.get_bind())
+    indexes = {index['name'] for index in inspector.get_indexes('refresh_tokens')}
+    if 'ix_refresh_tokens_hash_active' in indexes:
+        return
+
+    # CONCURRENTLY cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_refresh_tokens_hash_active',
+            'refresh_tokens',
+            ['token_hash'],
+            postgresql_where=sa.text('is_revoked = false'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_refresh_tokens_hash_active',
+            table_name='refresh_tokens',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,37 @@
+"""Add clerk_id to users with a unique index
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '004'
+down_revision: Union[str, None] = '003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases built with create_all already have the column and constraint
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('users')}
+    if 'clerk_id' not in columns:
+        op.add_column('users', sa.Column('clerk_id', sa.String(length=255), nullable=True))
+
+    unique_columns = [
+        constraint['column_names'] for constraint in inspector.get_unique_constraints('users')
+    ]
+    if ['clerk_id'] not in unique_columns:
+        # Backs the per-login clerk_id lookup
+        op.create_unique_constraint('users_clerk_id_key', 'users', ['clerk_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('users_clerk_id_key', 'users', type_='unique')
+    op.drop_column('users', 'clerk_id')
@@ -0,0 +1,57 @@
+"""Partial index on due pending notifications
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_pending_index() -> bool:
+    inspector = sa.inspect(op.get_bind())
+    if 'notifications' not in inspector.get_table_names():
+        return False
+    return any(
+        index['name'] == 'ix_notifications_pending_due'
+        for index in inspector.get_indexes('notifications')
+    )
+
+
+def upgrade() -> None:
+    # Only create_all builds the notifications table, and it creates the index too
+    if 'notifications' not in sa.inspect(op.get_bind()).get_table_names():
+        return
+    if _has_pending_index():
+        return
+
+    # CONCURRENTLY cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_notifications_pending_due',
+            'notifications',
+            ['scheduled_at'],
+            postgresql_where=sa.text("status = 'pending' AND retry_count < max_retries"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    if not _has_pending_index():
+        return
+
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_notifications_pending_due',
+            table_name='notifications',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,49 @@
+"""Track reminder scheduling on tasks and index the upcoming-deadline scan
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases built with create_all already have the column and index
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('tasks')}
+    if 'reminder_scheduled_at' not in columns:
+        op.add_column(
+            'tasks',
+            sa.Column('reminder_scheduled_at', sa.DateTime(timezone=True), nullable=True)
+        )
+
+    indexes = {index['name'] for index in inspector.get_indexes('tasks')}
+    if 'idx_tasks_status_deadline' not in indexes:
+        # CONCURRENTLY cannot run inside the migration transaction
+        with op.get_context().autocommit_block():
+            op.create_index(
+                'idx_tasks_status_deadline',
+                'tasks',
+                ['status', 'deadline'],
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'idx_tasks_status_deadline',
+            table_name='tasks',
+            postgresql_concurrently=True,
+        )
+    op.drop_column('tasks', 'reminder_scheduled_at')
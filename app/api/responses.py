@@ -0,0 +1,19 @@
+"""
+API response helpers
+"""
+from fastapi import Response
+from pydantic import BaseModel
+
+
+def json_response(model: BaseModel, status_code: int = 200) -> Response:
+    """
+    Serialize a response model straight to JSON bytes.
+
+    Returning a Response bypasses FastAPI's response_model re-validation and
+    jsonable_encoder pass; pydantic-core writes the body in a single call.
+    """
+    return Response(
+        content=model.model_dump_json(),
+        status_code=status_code,
+        media_type="application/json"
+    )
@@ -1,7 +1,7 @@
 """
 Authentication API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
@@ -436,7 +436,7 @@ async def link_clerk_account(
 
 
 @router.get("/clerk/providers")
-async def get_clerk_providers():
+async def get_clerk_providers(response: Response):
     """
     Get list of authentication providers supported by Clerk
 
@@ -455,6 +455,9 @@ async def get_clerk_providers():
 
         providers = clerk_auth_service.get_supported_providers()
 
+        # 列表是静态的，允许客户端缓存一天
+        response.headers["Cache-Control"] = "public, max-age=86400"
+
         return {
             "enabled": True,
             "providers": providers,
@@ -512,7 +515,7 @@ async def get_wallet_nonce(wallet_address: str):
         from app.services.web3_auth import web3_auth_service
 
         # Generate nonce
-        nonce = web3_auth_service.generate_auth_nonce(wallet_address)
+        nonce = await web3_auth_service.generate_auth_nonce(wallet_address)
 
         # Get authentication message
         message = web3_auth_service.get_auth_message(wallet_address, nonce)
@@ -1,10 +1,12 @@
 """
 通知管理API端点
 """
+import hmac
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.database import get_db
 from app.core.auth import get_current_user
 from app.models.user import User
@@ -18,6 +20,7 @@ from app.schemas.notification import (
     TelegramUnbindResponse
 )
 from app.schemas.base import SuccessResponse
+from app.api.responses import json_response
 from app.services.notification import (
     notification_service,
     user_notification_preference_service
@@ -57,14 +60,14 @@ async def get_my_notifications(
         db, current_user.id, page, size, notification_status
     )
 
-    return NotificationList(
+    return json_response(NotificationList(
         notifications=notifications,
         total=total,
         page=page,
         size=size,
         has_next=(page * size) < total,
         has_prev=page > 1
-    )
+    ))
 
 
 @router.get("/preferences", response_model=UserNotificationPreferenceSchema, summary="获取通知偏好设置")
@@ -200,6 +203,29 @@ async def get_telegram_status(
     }
 
 
+@router.post("/telegram/webhook", response_model=SuccessResponse, summary="Telegram Bot Webhook",
+             include_in_schema=False)
+async def telegram_webhook(
+    request: Request,
+    secret_token: Optional[str] = Header(None, alias="X-Telegram-Bot-Api-Secret-Token")
+):
+    """
+    接收Telegram推送的更新（TELEGRAM_WEBHOOK_URL 指向此端点）
+    """
+    from app.services.telegram_bot import telegram_bot_service
+
+    if not settings.TELEGRAM_WEBHOOK_SECRET:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Webhook未启用")
+
+    if not secret_token or not hmac.compare_digest(secret_token, settings.TELEGRAM_WEBHOOK_SECRET):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="无效的Webhook密钥")
+
+    if not await telegram_bot_service.process_webhook_update(await request.json()):
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Telegram Bot未运行")
+
+    return SuccessResponse(message="ok")
+
+
 @router.post("/test", response_model=SuccessResponse, summary="发送测试通知")
 async def send_test_notification(
     current_user: User = Depends(get_current_user),
@@ -229,6 +255,10 @@ async def send_test_notification(
         await db.commit()
         await db.refresh(test_notification)
 
+        # 通知立即到期，唤醒调度器而不是等待下一次轮询
+        from app.services.scheduler import scheduler_manager
+        scheduler_manager.notification_scheduler.wakeup()
+
         return SuccessResponse(message="测试通知已发送")
 
     except Exception as e:
@@ -1,7 +1,6 @@
 """
 任务管理API端点
 """
-import json
 import logging
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
@@ -25,10 +24,13 @@ from app.schemas.task import (
     TodoUpdate,
     Message as MessageSchema,
     MessageCreate,
-    MessageList
+    MessageList,
+    remind_flags_to_json
 )
 from app.schemas.organizer import OrganizerSummary
 from app.schemas.base import SuccessResponse
+from app.api.responses import json_response
+from app.services.notification import task_reminder_scheduler
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -175,14 +177,14 @@ async def get_tasks(
         )
         task_summaries.append(task_summary)
 
-    return TaskList(
+    return json_response(TaskList(
         tasks=task_summaries,
         total=total,
         page=page,
         size=size,
         has_next=offset + size < total,
         has_prev=page > 1
-    )
+    ))
 
 
 @router.post("/", response_model=TaskSchema, summary="创建新任务")
@@ -327,8 +329,8 @@ async def update_my_todo(
     update_data = todo_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         if field == "remind_flags" and value is not None:
-            # 将字典转换为JSON字符串
-            setattr(todo, field, json.dumps(value))
+            # 将位掩码转换为JSON字符串
+            setattr(todo, field, remind_flags_to_json(value))
         else:
             setattr(todo, field, value)
 
@@ -470,9 +472,14 @@ async def update_task(
 
     # 更新任务信息
     update_data = task_update.model_dump(exclude_unset=True, exclude={"tag_ids"})
+    deadline_changed = "deadline" in update_data and update_data["deadline"] != task.deadline
     for field, value in update_data.items():
         setattr(task, field, value)
 
+    # 截止时间变更：作废按旧时间排好的提醒，由下一次扫描重新安排
+    if deadline_changed:
+        await task_reminder_scheduler.reset_task_reminders(db, task)
+
     # 更新标签关联
     if task_update.tag_ids is not None:
         # 删除现有标签关联
@@ -584,9 +591,8 @@ async def join_task(
     # 设置task_id（覆盖可能存在的值）
     todo_dict["task_id"] = task_id
 
-    # 将remind_flags转换为JSON字符串
-    if todo_dict.get("remind_flags"):
-        todo_dict["remind_flags"] = json.dumps(todo_dict["remind_flags"])
+    # 将remind_flags位掩码转换为JSON字符串
+    todo_dict["remind_flags"] = remind_flags_to_json(todo_dict["remind_flags"])
 
     new_todo = Todo(
         user_id=current_user.id,
@@ -597,10 +603,18 @@ async def join_task(
 
     # 更新任务加入计数
     task.join_count += 1
+    # 扫描只处理 reminder_scheduled_at 为空的任务，需在提交前记下
+    already_scanned = task.reminder_scheduled_at is not None
 
     await db.commit()
     await db.refresh(new_todo)
 
+    # 任务已被提醒扫描过：扫描不会再次处理它，只为新加入的用户安排提醒
+    if already_scanned:
+        await task_reminder_scheduler.schedule_task_reminders(
+            db, task_id, user_id=current_user.id
+        )
+
     # 预加载task关系以避免序列化时的异步会话问题
     result = await db.execute(
         select(Todo)
@@ -613,14 +627,6 @@ async def join_task(
     )
     new_todo_with_task = result.scalar_one()
 
-    # 调度任务提醒 - 暂时禁用以避免数据库问题
-    # try:
-    #     from app.services.notification import task_reminder_scheduler
-    #     await task_reminder_scheduler.schedule_task_reminders(db, task_id)
-    # except Exception as e:
-    #     # 提醒调度失败不应该影响加入任务的操作
-    #     logger.warning(f"Failed to schedule reminders for task {task_id}: {e}")
-
     return new_todo_with_task
 
 
@@ -667,14 +673,14 @@ async def get_task_messages(
     )
     messages = result.scalars().all()
 
-    return MessageList(
+    return json_response(MessageList(
         messages=messages,
         total=total,
         page=page,
         size=size,
         has_next=offset + size < total,
         has_prev=page > 1
-    )
+    ))
 
 
 @router.post("/{task_id}/messages", response_model=MessageSchema, summary="发送讨论消息")
@@ -15,9 +15,11 @@ from app.models.task import Todo, Task
 from app.schemas.task import (
     Todo as TodoSchema,
     TodoCreate,
-    TodoUpdate
+    TodoUpdate,
+    remind_flags_to_json
 )
 from app.schemas.base import SuccessResponse
+from app.services.notification import task_reminder_scheduler
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -83,10 +85,10 @@ async def create_todo(
     # 如果是任务相关的todo，验证任务是否存在
     if todo_data.task_id:
         result = await db.execute(
-            select(Task).where(Task.id == todo_data.task_id)
+            select(Task.id, Task.reminder_scheduled_at).where(Task.id == todo_data.task_id)
         )
-        task = result.scalar_one_or_none()
-        if not task:
+        task_row = result.one_or_none()
+        if task_row is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="任务不存在"
@@ -95,10 +97,8 @@ async def create_todo(
     # 创建todo
     todo_dict = todo_data.model_dump()
 
-    # 将remind_flags转换为JSON字符串
-    if todo_dict.get("remind_flags"):
-        import json
-        todo_dict["remind_flags"] = json.dumps(todo_dict["remind_flags"])
+    # 将remind_flags位掩码转换为JSON字符串
+    todo_dict["remind_flags"] = remind_flags_to_json(todo_dict["remind_flags"])
 
     new_todo = Todo(
         user_id=current_user.id,
@@ -109,6 +109,12 @@ async def create_todo(
     await db.commit()
     await db.refresh(new_todo)
 
+    # 任务已被提醒扫描过：扫描不会再次处理它，只为新加入的用户安排提醒
+    if todo_data.task_id and task_row.reminder_scheduled_at is not None:
+        await task_reminder_scheduler.schedule_task_reminders(
+            db, todo_data.task_id, user_id=current_user.id
+        )
+
     # 重新查询以获取关联数据
     result = await db.execute(
         select(Todo).options(
@@ -152,10 +158,9 @@ async def update_todo(
     # 更新字段
     update_data = todo_data.model_dump(exclude_unset=True)
 
-    # 将remind_flags转换为JSON字符串
+    # 将remind_flags位掩码转换为JSON字符串
     if "remind_flags" in update_data and update_data["remind_flags"] is not None:
-        import json
-        update_data["remind_flags"] = json.dumps(update_data["remind_flags"])
+        update_data["remind_flags"] = remind_flags_to_json(update_data["remind_flags"])
 
     for field, value in update_data.items():
         setattr(todo, field, value)
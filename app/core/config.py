@@ -21,11 +21,14 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
     REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    # Key for refresh-token hashes at rest; falls back to SECRET_KEY
+    TOKEN_PEPPER: Optional[str] = None
 
     # Database
     DATABASE_URL: str
     DATABASE_POOL_SIZE: int = 10
     DATABASE_MAX_OVERFLOW: int = 20
+    DATABASE_STATEMENT_CACHE_SIZE: int = 1024  # asyncpg prepared statements per connection
 
     # PostgreSQL Configuration (for building DATABASE_URL if needed)
     POSTGRES_DB: Optional[str] = None
@@ -48,6 +51,7 @@ class Settings(BaseSettings):
     CLERK_SECRET_KEY: Optional[str] = None
     CLERK_JWKS_URL: Optional[str] = None
     CLERK_FRONTEND_API: Optional[str] = None
+    CLERK_ISSUER: Optional[str] = None  # Defaults to CLERK_FRONTEND_API
 
     # External Services
     AI_SERVICE_URL: Optional[str] = None
@@ -55,6 +59,11 @@ class Settings(BaseSettings):
 
     # Telegram Bot
     TELEGRAM_BOT_TOKEN: Optional[str] = None
+    # Public URL of /api/v1/notifications/telegram/webhook; when set, Telegram
+    # pushes updates there instead of the bot long-polling getUpdates.
+    # Requires TELEGRAM_WEBHOOK_SECRET, which Telegram echoes on every push
+    TELEGRAM_WEBHOOK_URL: Optional[str] = None
+    TELEGRAM_WEBHOOK_SECRET: Optional[str] = None
 
     # PPIO Model Configuration
     PPIO_API_KEY: str
@@ -340,6 +349,14 @@ class Settings(BaseSettings):
             return f"{self.CLERK_FRONTEND_API.rstrip('/')}/.well-known/jwks.json"
         return None
 
+    def get_clerk_issuer(self) -> Optional[str]:
+        """Get the expected Clerk token issuer (the Frontend API URL)"""
+        if self.CLERK_ISSUER:
+            return self.CLERK_ISSUER.rstrip('/')
+        elif self.CLERK_FRONTEND_API:
+            return self.CLERK_FRONTEND_API.rstrip('/')
+        return None
+
     def get_config_summary(self) -> dict:
         """Get a summary of current configuration for debugging"""
         return {
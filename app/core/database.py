@@ -20,6 +20,10 @@ def create_database_engine():
             pool_size=settings.DATABASE_POOL_SIZE,
             max_overflow=settings.DATABASE_MAX_OVERFLOW,
             poolclass=NullPool if "pytest" in str(settings.DATABASE_URL) else None,
+            connect_args=(
+                {"prepared_statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE}
+                if "asyncpg" in settings.DATABASE_URL else {}
+            ),
         )
         return engine
     except Exception as e:
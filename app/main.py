@@ -64,6 +64,13 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"⚠️ Background schedulers failed to start: {e}")
 
+    # Warm the Clerk JWKS so the first Clerk login does not pay the fetch
+    try:
+        from app.services.clerk_auth import clerk_auth_service
+        await clerk_auth_service.start_jwks_refresh()
+    except Exception as e:
+        logger.warning(f"⚠️ Clerk JWKS prefetch failed to start: {e}")
+
     yield
     # Shutdown
     try:
@@ -80,6 +87,18 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"⚠️ Error stopping Telegram Bot: {e}")
 
+    try:
+        from app.services.clerk_auth import clerk_auth_service
+        await clerk_auth_service.aclose()
+    except Exception as e:
+        logger.warning(f"⚠️ Error closing Clerk HTTP clients: {e}")
+
+    try:
+        from app.services.google_auth import google_auth_service
+        await google_auth_service.aclose()
+    except Exception as e:
+        logger.warning(f"⚠️ Error closing Google HTTP client: {e}")
+
     try:
         await close_db()
         logger.info("✅ Database connections closed")
@@ -3,7 +3,7 @@ Notification-related database models
 """
 from datetime import datetime
 from typing import List, Optional
-from sqlalchemy import String, Text, Integer, Boolean, ForeignKey, DateTime, Enum as SQLEnum
+from sqlalchemy import String, Text, Integer, Boolean, ForeignKey, DateTime, Index, text, Enum as SQLEnum
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from enum import Enum
 from .base import Base, TimestampMixin
@@ -65,6 +65,16 @@ class Notification(Base, TimestampMixin):
     user: Mapped["User"] = relationship("User", back_populates="notifications")
     task: Mapped[Optional["Task"]] = relationship("Task", back_populates="notifications")
 
+    # Indexes
+    __table_args__ = (
+        # Matches get_pending_notifications: due rows come back in scheduled order
+        Index(
+            "ix_notifications_pending_due",
+            "scheduled_at",
+            postgresql_where=text("status = 'pending' AND retry_count < max_retries"),
+        ),
+    )
+
 
 class NotificationTemplate(Base, TimestampMixin):
     """Notification template for different types and channels"""
@@ -4,7 +4,7 @@ Task-related database models
 from datetime import datetime
 from typing import List, Optional
 from enum import Enum
-from sqlalchemy import String, Text, DECIMAL, Integer, Boolean, ForeignKey, DateTime, UniqueConstraint, Enum as SQLEnum
+from sqlalchemy import String, Text, DECIMAL, Integer, Boolean, ForeignKey, DateTime, UniqueConstraint, Index, Enum as SQLEnum
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .base import Base, TimestampMixin
 
@@ -44,6 +44,8 @@ class Task(Base, TimestampMixin):
     status: Mapped[str] = mapped_column(String(20), default="active", nullable=False)
     view_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     join_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # Set once the reminder scheduler has created this task's reminders
+    reminder_scheduled_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
     # Relationships
     sponsor: Mapped["User"] = relationship("User", back_populates="sponsored_tasks")
@@ -64,6 +66,12 @@ class Task(Base, TimestampMixin):
         "Notification", back_populates="task", cascade="all, delete-orphan"
     )
 
+    # Indexes
+    __table_args__ = (
+        # Backs the hourly scan for active tasks with upcoming deadlines
+        Index("idx_tasks_status_deadline", "status", "deadline"),
+    )
+
 
 class TaskTag(Base, TimestampMixin):
     """Task-tag relationship"""
@@ -3,7 +3,7 @@ User-related database models
 """
 from datetime import datetime
 from typing import List, Optional
-from sqlalchemy import Boolean, String, Text, DECIMAL, Integer, ForeignKey, UniqueConstraint
+from sqlalchemy import Boolean, String, Text, DECIMAL, Integer, ForeignKey, UniqueConstraint, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .base import Base, TimestampMixin
 
@@ -76,8 +76,20 @@ class RefreshToken(Base, TimestampMixin):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     token_hash: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
+    jti: Mapped[Optional[str]] = mapped_column(String(32), nullable=True, comment="JWT ID of the refresh token")
     expires_at: Mapped[datetime] = mapped_column(nullable=False)
     is_revoked: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
 
     # Relationships
-    user: Mapped["User"] = relationship("User", back_populates="refresh_tokens")
\ No newline at end of file
+    user: Mapped["User"] = relationship("User", back_populates="refresh_tokens")
+
+    # Indexes
+    __table_args__ = (
+        Index("idx_refresh_tokens_jti", "jti", unique=True),
+        # Only active tokens are ever looked up by hash
+        Index(
+            "ix_refresh_tokens_hash_active",
+            "token_hash",
+            postgresql_where=text("is_revoked = false"),
+        ),
+    )
\ No newline at end of file
@@ -26,6 +26,8 @@ class PaginationParams(BaseSchema):
     """Pagination parameters"""
     page: int = 1
     size: int = 20
+    # Keyset cursor: when set, return rows with id > after_id instead of using page
+    after_id: Optional[int] = None
     
     @property
     def offset(self) -> int:
@@ -39,26 +41,30 @@ class PaginationParams(BaseSchema):
 class PaginatedResponse(BaseSchema):
     """Paginated response wrapper"""
     items: list[Any]
-    total: int
+    # Not counted for keyset pages: follow next_after until it is None
+    total: Optional[int] = None
     page: int
     size: int
-    pages: int
+    pages: Optional[int] = None
+    next_after: Optional[int] = None
     
     @classmethod
     def create(
         cls,
         items: list[Any],
-        total: int,
-        pagination: PaginationParams
+        total: Optional[int],
+        pagination: PaginationParams,
+        next_after: Optional[int] = None
     ) -> "PaginatedResponse":
         """Create paginated response"""
-        pages = (total + pagination.size - 1) // pagination.size
+        pages = None if total is None else (total + pagination.size - 1) // pagination.size
         return cls(
             items=items,
             total=total,
             page=pagination.page,
             size=pagination.size,
-            pages=pages
+            pages=pages,
+            next_after=next_after
         )
 
 
@@ -75,4 +81,4 @@ class SuccessResponse(BaseSchema):
     """Success response schema"""
     success: bool = True
     message: str
-    data: Optional[Any] = None
\ No newline at end of file
+    data: Optional[Any] = None
@@ -59,8 +59,13 @@ class NotificationUpdate(BaseModel):
     retry_count: Optional[int] = None
 
 
-class Notification(NotificationBase):
+class Notification(BaseModel):
     """Schema for notification response"""
+    type: str
+    channel: str
+    title: str = Field(..., min_length=1, max_length=255)
+    message: str = Field(..., min_length=1)
+    scheduled_at: datetime
     id: int
     user_id: int
     task_id: Optional[int] = None
@@ -173,9 +178,13 @@ class UserNotificationPreference(UserNotificationPreferenceBase):
 # Telegram integration schemas
 class TelegramBindRequest(BaseModel):
     """Schema for Telegram binding request"""
-    telegram_chat_id: str
+    # Stored in the canonical str(chat.id) form the bot handlers look up by;
+    # numeric JSON ids are accepted and converted once here
+    telegram_chat_id: str = Field(..., pattern=r"^-?\d+$", max_length=255)
     telegram_username: Optional[str] = None
 
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
 
 class TelegramBindResponse(BaseModel):
     """Schema for Telegram binding response"""
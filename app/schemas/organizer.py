@@ -22,8 +22,9 @@ class OrganizerUpdate(BaseModel):
     is_verified: Optional[bool] = None
 
 
-class Organizer(OrganizerBase):
+class Organizer(BaseModel):
     """Schema for organizer response"""
+    name: str = Field(..., min_length=1, max_length=255, description="主办方名称")
     id: int
     is_verified: bool
     created_at: datetime
@@ -34,8 +34,11 @@ class TagUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 
-class Tag(TagBase):
+class Tag(BaseModel):
     """Schema for tag response"""
+    name: str = Field(..., min_length=1, max_length=100)
+    category: TagCategory
+    description: Optional[str] = None
     id: int
     usage_count: int
     is_active: bool
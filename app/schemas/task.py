@@ -2,8 +2,8 @@
 Task-related Pydantic schemas
 """
 from datetime import datetime
-from typing import List, Optional, Dict, Any, Union
-from pydantic import BaseModel, Field, ConfigDict, field_validator
+from typing import List, Optional, Dict, Any, Tuple, Union
+from pydantic import BaseModel, Field, ConfigDict, field_validator, computed_field
 from enum import Enum
 import json
 
@@ -34,7 +34,7 @@ class TaskBase(BaseModel):
 
 class TaskCreate(TaskBase):
     """Schema for creating a task"""
-    tag_ids: List[int] = Field(default=[], max_items=20)
+    tag_ids: Tuple[int, ...] = Field(default=(), max_length=20)
 
 
 class TaskUpdate(BaseModel):
@@ -52,8 +52,16 @@ class TaskUpdate(BaseModel):
     organizer_name: Optional[str] = Field(None, description="主办方名称")
 
 
-class Task(TaskBase):
+class Task(BaseModel):
     """Schema for task response"""
+    title: str = Field(..., min_length=1, max_length=255)
+    summary: Optional[str] = Field(None, max_length=500, description="任务简介")
+    description: Optional[str] = None
+    category: Optional[str] = Field(None, description="任务分类")
+    reward_details: Optional[str] = Field(None, description="奖励详情")
+    reward_type: Optional[str] = Field(None, description="奖励分类")
+    deadline: Optional[int] = Field(None, description="截止日期时间戳")
+    external_link: Optional[str] = Field(None, description="活动原始链接")
     id: int
     sponsor_id: int
     organizer_id: Optional[int] = None
@@ -62,7 +70,7 @@ class Task(TaskBase):
     join_count: int
     created_at: datetime
     updated_at: datetime
-    tags: List[Tag] = []
+    tags: List[Tag] = Field(default_factory=list)
     sponsor: Optional[User] = None
     organizer: Optional[OrganizerSummary] = None
 
@@ -85,7 +93,7 @@ class TaskSummary(BaseModel):
     view_count: int
     join_count: int
     created_at: datetime
-    tags: List[Tag] = []
+    tags: List[Tag] = Field(default_factory=list)
     organizer: Optional[OrganizerSummary] = None
 
     # 用户todo状态字段（仅在用户登录时返回）
@@ -122,14 +130,47 @@ class Pagination(BaseModel):
     sort_order: str = Field(default="desc", pattern="^(asc|desc)$")
 
 
+# Todo remind flags (bitmask)
+REMIND_T_3D = 0b001
+REMIND_T_1D = 0b010
+REMIND_DDL_2H = 0b100
+REMIND_ALL = REMIND_T_3D | REMIND_T_1D | REMIND_DDL_2H
+
+REMIND_FLAG_BITS = {
+    "t_3d": REMIND_T_3D,
+    "t_1d": REMIND_T_1D,
+    "ddl_2h": REMIND_DDL_2H,
+}
+
+
+def remind_flags_to_dict(mask: int) -> Dict[str, bool]:
+    """Expand a remind_flags bitmask into its {"t_3d": ..., ...} form"""
+    return {name: bool(mask & bit) for name, bit in REMIND_FLAG_BITS.items()}
+
+
+def remind_flags_from_dict(flags: Dict[str, bool]) -> int:
+    """Pack a {"t_3d": ..., ...} dict into a bitmask; missing keys default to on"""
+    mask = 0
+    for name, bit in REMIND_FLAG_BITS.items():
+        if flags.get(name, True):
+            mask |= bit
+    return mask
+
+
+def remind_flags_to_json(mask: int) -> str:
+    """Serialize a remind_flags bitmask for the todos.remind_flags text column"""
+    return json.dumps(remind_flags_to_dict(mask))
+
+
 # Todo schemas
 class TodoBase(BaseModel):
     """Base todo schema"""
     title: Optional[str] = Field(None, max_length=255, description="自定义todo标题")
     description: Optional[str] = Field(None, description="自定义todo描述")
     deadline: Optional[int] = Field(None, description="自定义截止时间戳")
-    remind_flags: Optional[Dict[str, bool]] = Field(
-        default={"t_3d": True, "t_1d": True, "ddl_2h": True}
+    remind_flags: int = Field(
+        default=REMIND_ALL, ge=0, lt=8,
+        description="提醒设置位掩码: 1=提前3天, 2=提前1天, 4=截止前2小时"
     )
     is_active: bool = True
 
@@ -144,13 +185,21 @@ class TodoUpdate(BaseModel):
     title: Optional[str] = Field(None, max_length=255)
     description: Optional[str] = None
     deadline: Optional[int] = None
-    remind_flags: Optional[Dict[str, bool]] = None
+    remind_flags: Optional[int] = Field(None, ge=0, lt=8)
     is_active: Optional[bool] = None
     is_completed: Optional[bool] = None
 
 
-class Todo(TodoBase):
+class Todo(BaseModel):
     """Schema for todo response"""
+    title: Optional[str] = Field(None, max_length=255, description="自定义todo标题")
+    description: Optional[str] = Field(None, description="自定义todo描述")
+    deadline: Optional[int] = Field(None, description="自定义截止时间戳")
+    remind_flags: int = Field(
+        default=REMIND_ALL, ge=0, lt=8,
+        description="提醒设置位掩码: 1=提前3天, 2=提前1天, 4=截止前2小时"
+    )
+    is_active: bool = True
     id: int
     user_id: int
     task_id: Optional[int] = None
@@ -165,14 +214,24 @@ class Todo(TodoBase):
     @field_validator('remind_flags', mode='before')
     @classmethod
     def parse_remind_flags(cls, v):
-        """Parse remind_flags from JSON string to dict"""
+        """Parse remind_flags from the stored JSON string into a bitmask"""
+        if v is None:
+            return REMIND_ALL
         if isinstance(v, str):
             try:
-                return json.loads(v)
+                v = json.loads(v)
             except (json.JSONDecodeError, TypeError):
-                return {"t_3d": True, "t_1d": True, "ddl_2h": True}
+                return REMIND_ALL
+        if isinstance(v, dict):
+            return remind_flags_from_dict(v)
         return v
 
+    @computed_field
+    @property
+    def remind_settings(self) -> Dict[str, bool]:
+        """Dict view of remind_flags"""
+        return remind_flags_to_dict(self.remind_flags)
+
 
 # Message schemas
 class MessageBase(BaseModel):
@@ -190,8 +249,9 @@ class MessageUpdate(BaseModel):
     content: str = Field(..., min_length=1, max_length=10000)
 
 
-class Message(MessageBase):
+class Message(BaseModel):
     """Schema for message response"""
+    content: str = Field(..., min_length=1, max_length=10000)
     id: int
     task_id: int
     user_id: int
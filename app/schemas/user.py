@@ -71,8 +71,11 @@ class RefreshToken(RefreshTokenBase):
     model_config = ConfigDict(from_attributes=True)
 
 
-class User(UserBase):
+class User(BaseModel):
     """Schema for user response"""
+    email: EmailStr
+    nickname: str = Field(..., min_length=1, max_length=100)
+    avatar_url: Optional[str] = None
     id: int
     is_active: bool
     telegram_chat_id: Optional[str] = None
@@ -86,7 +89,7 @@ class User(UserBase):
 
 class UserWithWallets(User):
     """User schema with wallets included"""
-    wallets: List[UserWallet] = []
+    wallets: List[UserWallet] = Field(default_factory=list)
 
 
 class UserProfile(User):
@@ -2,19 +2,26 @@
 Authentication service for JWT token management and user session handling
 """
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional, Union
-from jose import JWTError, jwt
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple, Union
+import jwt
+import asyncio
 import hashlib
-import secrets
+import os
+import time
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, delete, bindparam
 
 from app.core.config import settings
 from app.core.exceptions import AuthenticationError, AuthorizationError
+from app.core.performance import LRUCache
 from app.models.user import User, RefreshToken
 from app.schemas.user import TokenResponse, UserInDB
 from app.services.base import BaseService
 
+# Runs on every authenticated request; built once so each call reuses the
+# compiled SQL and, on asyncpg, the same prepared statement
+_GET_ACTIVE_USER = select(User).where(User.id == bindparam("uid"), User.is_active == True)
+
 
 class AuthBaseService:
     """Base service class for authentication services"""
@@ -24,67 +31,99 @@ class AuthBaseService:
 class JWTService(AuthBaseService):
     """JWT token management service"""
     
+    # Successful verifications are cached briefly so back-to-back requests
+    # carrying the same token skip signature verification and JSON decoding
+    VERIFY_CACHE_SIZE = 10_000
+    VERIFY_CACHE_TTL_SECONDS = 5
+    
+    def __init__(self):
+        # Bind settings once instead of resolving them on every token operation
+        self._secret = settings.SECRET_KEY
+        self._alg = settings.JWT_ALGORITHM
+        self._algs = [self._alg]
+        self._decode_options = {"require": ["exp", "sub", "type"]}
+        # JWT claims are integer Unix timestamps, so lifetimes are kept in seconds
+        self._access_ttl = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        self._refresh_ttl = settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
+        self._verify_cache: LRUCache[Dict[str, Any]] = LRUCache(
+            max_size=self.VERIFY_CACHE_SIZE,
+            ttl_seconds=self.VERIFY_CACHE_TTL_SECONDS
+        )
+    
     def create_access_token(
         self, 
         user_id: int, 
         expires_delta: Optional[timedelta] = None
     ) -> str:
         """Create JWT access token"""
-        if expires_delta:
-            expire = datetime.utcnow() + expires_delta
-        else:
-            expire = datetime.utcnow() + timedelta(
-                minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
-            )
+        ttl = int(expires_delta.total_seconds()) if expires_delta else self._access_ttl
+        issued_at = int(time.time())
         
         to_encode = {
-            "exp": expire,
+            "exp": issued_at + ttl,
             "sub": str(user_id),
             "type": "access",
-            "iat": datetime.utcnow()
+            "iat": issued_at
         }
         
-        encoded_jwt = jwt.encode(
-            to_encode, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM
-        )
+        encoded_jwt = jwt.encode(to_encode, self._secret, algorithm=self._alg)
         return encoded_jwt
     
-    def create_refresh_token(self, user_id: int) -> str:
+    def create_refresh_token(self, user_id: int, jti: Optional[str] = None) -> str:
         """Create JWT refresh token"""
-        expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        issued_at = int(time.time())
         
         to_encode = {
-            "exp": expire,
+            "exp": issued_at + self._refresh_ttl,
             "sub": str(user_id),
             "type": "refresh",
-            "iat": datetime.utcnow(),
-            "jti": secrets.token_hex(16)  # JWT ID for token tracking
+            "iat": issued_at,
+            "jti": jti or os.urandom(16).hex()  # JWT ID for token tracking
         }
         
-        encoded_jwt = jwt.encode(
-            to_encode, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM
-        )
+        encoded_jwt = jwt.encode(to_encode, self._secret, algorithm=self._alg)
         return encoded_jwt
     
+    @staticmethod
+    def _verify_cache_key(token: str, token_type: str) -> str:
+        """Build the verification cache key without retaining the raw token"""
+        digest = hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+        return f"{token_type}:{digest}"
+    
     def verify_token(self, token: str, token_type: str = "access") -> Dict[str, Any]:
         """Verify and decode JWT token"""
+        cache_key = self._verify_cache_key(token, token_type)
+        payload = self._verify_cache.get(cache_key)
+        if payload is not None:
+            if payload["exp"] > time.time():
+                return payload
+            self._verify_cache.delete(cache_key)
+        
+        payload = self._decode_token(token, token_type)
+        
+        # Only successful verifications are cached, and never past token expiry
+        ttl = min(self.VERIFY_CACHE_TTL_SECONDS, int(payload["exp"] - time.time()))
+        if ttl > 0:
+            self._verify_cache.put(cache_key, payload, ttl)
+        
+        return payload
+    
+    def _decode_token(self, token: str, token_type: str) -> Dict[str, Any]:
+        """Decode JWT token and check its type; PyJWT enforces exp"""
         try:
             payload = jwt.decode(
-                token, settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
+                token, self._secret, algorithms=self._algs, options=self._decode_options
             )
             
             # Check token type
             if payload.get("type") != token_type:
                 raise AuthenticationError(f"Invalid token type. Expected {token_type}")
             
-            # Check expiration
-            exp = payload.get("exp")
-            if exp and datetime.utcnow() > datetime.fromtimestamp(exp):
-                raise AuthenticationError("Token has expired")
-            
             return payload
             
-        except JWTError as e:
+        except jwt.ExpiredSignatureError:
+            raise AuthenticationError("Token has expired")
+        except jwt.InvalidTokenError as e:
             raise AuthenticationError(f"Invalid token: {str(e)}")
     
     def extract_user_id(self, token: str) -> int:
@@ -111,43 +150,150 @@ class JWTService(AuthBaseService):
 class RefreshTokenService(AuthBaseService):
     """Refresh token management service"""
     
+    # Prefix marking keyed BLAKE2b hashes; unprefixed rows are legacy SHA-256
+    HASH_PREFIX = "b2$"
+    
+    # Rows removed per transaction by cleanup_expired_tokens
+    CLEANUP_BATCH_SIZE = 10_000
+    
+    # Batches at least this large are written with COPY on asyncpg
+    BULK_COPY_THRESHOLD = 100
+    
+    def __init__(self):
+        # BLAKE2b accepts keys of up to 64 bytes
+        self._hash_key = (settings.TOKEN_PEPPER or settings.SECRET_KEY).encode()[:64]
+        self._refresh_ttl = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    
     def _hash_token(self, token: str) -> str:
         """Hash refresh token for storage"""
+        digest = hashlib.blake2b(
+            token.encode(), key=self._hash_key, digest_size=32
+        ).hexdigest()
+        return self.HASH_PREFIX + digest
+    
+    def hash_tokens_bulk(self, tokens: Iterable[str]) -> list[str]:
+        """Hash many refresh tokens, keying BLAKE2b once for the whole batch"""
+        keyed = hashlib.blake2b(key=self._hash_key, digest_size=32)
+        hashes = []
+        for token in tokens:
+            hasher = keyed.copy()
+            hasher.update(token.encode())
+            hashes.append(self.HASH_PREFIX + hasher.hexdigest())
+        return hashes
+    
+    def _legacy_hash_token(self, token: str) -> str:
+        """Hash refresh token the way rows stored before BLAKE2b were hashed"""
         return hashlib.sha256(token.encode()).hexdigest()
     
+    def _token_hash_candidates(self, token: str) -> list[str]:
+        """Hashes a stored refresh token may have been written under"""
+        return [self._hash_token(token), self._legacy_hash_token(token)]
+    
     async def store_refresh_token(
         self, 
         db: AsyncSession, 
         user_id: int, 
-        token: str
+        token: str,
+        commit: bool = True,
+        jti: Optional[str] = None
     ) -> RefreshToken:
-        """Store refresh token in database"""
+        """
+        Store refresh token in database.
+        
+        The row is not refreshed after commit: callers only need the token
+        string. Pass commit=False to leave the insert in the caller's
+        transaction.
+        """
         token_hash = self._hash_token(token)
-        expires_at = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        expires_at = datetime.utcnow() + self._refresh_ttl
         
         # Create new refresh token record
         refresh_token = RefreshToken(
             user_id=user_id,
             token_hash=token_hash,
+            jti=jti,
             expires_at=expires_at
         )
         
         db.add(refresh_token)
-        await db.commit()
-        await db.refresh(refresh_token)
+        if commit:
+            await db.commit()
         
         return refresh_token
     
+    async def store_refresh_tokens_bulk(
+        self, 
+        db: AsyncSession, 
+        tokens: Sequence[Tuple[int, str]]
+    ) -> int:
+        """
+        Store many (user_id, token) refresh tokens in one go.
+        
+        Large batches on PostgreSQL go through asyncpg's COPY protocol;
+        smaller batches, and other drivers, use a plain ORM insert.
+        """
+        if not tokens:
+            return 0
+        
+        expires_at = datetime.utcnow() + self._refresh_ttl
+        token_hashes = self.hash_tokens_bulk(token for _, token in tokens)
+        records = [
+            (user_id, token_hash, expires_at, False)
+            for (user_id, _), token_hash in zip(tokens, token_hashes)
+        ]
+        
+        if (
+            len(records) >= self.BULK_COPY_THRESHOLD
+            and db.get_bind().dialect.driver == "asyncpg"
+        ):
+            conn = await db.connection()
+            raw_conn = await conn.get_raw_connection()
+            await raw_conn.driver_connection.copy_records_to_table(
+                RefreshToken.__tablename__,
+                records=records,
+                columns=["user_id", "token_hash", "expires_at", "is_revoked"]
+            )
+        else:
+            db.add_all([
+                RefreshToken(
+                    user_id=user_id,
+                    token_hash=token_hash,
+                    expires_at=token_expires_at,
+                    is_revoked=is_revoked
+                )
+                for user_id, token_hash, token_expires_at, is_revoked in records
+            ])
+        
+        await db.commit()
+        return len(records)
+    
     async def verify_refresh_token(
         self, 
         db: AsyncSession, 
-        token: str
+        token: str,
+        jti: Optional[str] = None
     ) -> Optional[RefreshToken]:
-        """Verify refresh token exists and is valid"""
-        token_hash = self._hash_token(token)
+        """
+        Verify refresh token exists and is valid.
+        
+        jti must come from an already signature-verified payload; it lets the
+        row be found by its indexed JWT ID without hashing the token. Rows
+        stored before jti was recorded are still matched by token hash.
+        """
+        if jti:
+            result = await db.execute(
+                select(RefreshToken).where(
+                    RefreshToken.jti == jti,
+                    RefreshToken.is_revoked == False,
+                    RefreshToken.expires_at > datetime.utcnow()
+                )
+            )
+            stored_token = result.scalar_one_or_none()
+            if stored_token:
+                return stored_token
         
         stmt = select(RefreshToken).where(
-            RefreshToken.token_hash == token_hash,
+            RefreshToken.token_hash.in_(self._token_hash_candidates(token)),
             RefreshToken.is_revoked == False,
             RefreshToken.expires_at > datetime.utcnow()
         )
@@ -155,16 +301,55 @@ class RefreshTokenService(AuthBaseService):
         result = await db.execute(stmt)
         return result.scalar_one_or_none()
     
+    async def rotate_refresh_token(
+        self, 
+        db: AsyncSession, 
+        token: str,
+        jti: Optional[str] = None
+    ) -> Optional[int]:
+        """
+        Atomically revoke an active refresh token and return its user ID.
+        
+        A single UPDATE ... RETURNING both checks that the token is live and
+        marks it used, so a replayed refresh token finds nothing to rotate.
+        The change is left uncommitted for the caller to commit together
+        with the replacement token. jti follows the same rules as in
+        verify_refresh_token.
+        """
+        active = (
+            RefreshToken.is_revoked == False,
+            RefreshToken.expires_at > datetime.utcnow()
+        )
+        
+        if jti:
+            result = await db.execute(
+                update(RefreshToken)
+                .where(RefreshToken.jti == jti, *active)
+                .values(is_revoked=True)
+                .returning(RefreshToken.user_id)
+                .execution_options(synchronize_session=False)
+            )
+            user_id = result.scalar_one_or_none()
+            if user_id is not None:
+                return user_id
+        
+        result = await db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.token_hash.in_(self._token_hash_candidates(token)), *active)
+            .values(is_revoked=True)
+            .returning(RefreshToken.user_id)
+            .execution_options(synchronize_session=False)
+        )
+        return result.scalar_one_or_none()
+    
     async def revoke_refresh_token(
         self, 
         db: AsyncSession, 
         token: str
     ) -> bool:
         """Revoke a refresh token"""
-        token_hash = self._hash_token(token)
-        
         stmt = update(RefreshToken).where(
-            RefreshToken.token_hash == token_hash
+            RefreshToken.token_hash.in_(self._token_hash_candidates(token))
         ).values(is_revoked=True)
         
         result = await db.execute(stmt)
@@ -188,26 +373,53 @@ class RefreshTokenService(AuthBaseService):
         
         return result.rowcount
     
-    async def cleanup_expired_tokens(self, db: AsyncSession) -> int:
-        """Clean up expired refresh tokens"""
-        from sqlalchemy import delete
+    async def cleanup_expired_tokens(
+        self, 
+        db: AsyncSession, 
+        batch_size: Optional[int] = None
+    ) -> int:
+        """
+        Clean up expired refresh tokens.
         
-        stmt = delete(RefreshToken).where(
-            RefreshToken.expires_at < datetime.utcnow()
-        )
+        Rows are deleted in id-ordered batches, committing after each one, so
+        no single statement holds locks over the whole expired set.
+        """
+        batch_size = batch_size or self.CLEANUP_BATCH_SIZE
+        now = datetime.utcnow()
+        total = 0
         
-        result = await db.execute(stmt)
-        await db.commit()
+        while True:
+            expired_ids = (
+                select(RefreshToken.id)
+                .where(RefreshToken.expires_at < now)
+                .order_by(RefreshToken.id)
+                .limit(batch_size)
+            )
+            result = await db.execute(
+                delete(RefreshToken).where(RefreshToken.id.in_(expired_ids))
+            )
+            await db.commit()
+            
+            total += result.rowcount
+            if result.rowcount < batch_size:
+                break
+            
+            # Let other coroutines use the connection pool between batches
+            await asyncio.sleep(0)
         
-        return result.rowcount
+        return total
 
 
 class AuthenticationService(AuthBaseService):
     """Main authentication service combining JWT and refresh token services"""
     
-    def __init__(self):
-        self.jwt_service = JWTService()
-        self.refresh_service = RefreshTokenService()
+    def __init__(
+        self,
+        jwt_service: Optional[JWTService] = None,
+        refresh_service: Optional[RefreshTokenService] = None
+    ):
+        self.jwt_service = jwt_service or JWTService()
+        self.refresh_service = refresh_service or RefreshTokenService()
     
     async def create_token_pair(
         self, 
@@ -216,11 +428,12 @@ class AuthenticationService(AuthBaseService):
     ) -> TokenResponse:
         """Create access and refresh token pair"""
         # Create tokens
+        jti = os.urandom(16).hex()
         access_token = self.jwt_service.create_access_token(user_id)
-        refresh_token = self.jwt_service.create_refresh_token(user_id)
+        refresh_token = self.jwt_service.create_refresh_token(user_id, jti=jti)
         
         # Store refresh token
-        await self.refresh_service.store_refresh_token(db, user_id, refresh_token)
+        await self.refresh_service.store_refresh_token(db, user_id, refresh_token, jti=jti)
         
         return TokenResponse(
             access_token=access_token,
@@ -242,17 +455,21 @@ class AuthenticationService(AuthBaseService):
         except (AuthenticationError, ValueError):
             raise AuthenticationError("Invalid refresh token")
         
-        # Verify refresh token in database
-        stored_token = await self.refresh_service.verify_refresh_token(db, refresh_token)
-        if not stored_token:
+        # Consume the stored refresh token, keyed by the payload's jti
+        stored_user_id = await self.refresh_service.rotate_refresh_token(
+            db, refresh_token, jti=payload.get("jti")
+        )
+        if stored_user_id is None:
             raise AuthenticationError("Refresh token not found or expired")
+        if stored_user_id != user_id:
+            raise AuthenticationError("Invalid refresh token")
         
         # Verify user still exists and is active
         user = await self.get_user_by_id(db, user_id)
         if not user or not user.is_active:
             raise AuthenticationError("User not found or inactive")
         
-        # Create new token pair
+        # Create new token pair; this commits the rotation with the new token
         return await self.create_token_pair(db, user_id)
     
     async def revoke_tokens(
@@ -272,8 +489,7 @@ class AuthenticationService(AuthBaseService):
     
     async def get_user_by_id(self, db: AsyncSession, user_id: int) -> Optional[User]:
         """Get user by ID"""
-        stmt = select(User).where(User.id == user_id, User.is_active == True)
-        result = await db.execute(stmt)
+        result = await db.execute(_GET_ACTIVE_USER, {"uid": user_id})
         return result.scalar_one_or_none()
     
     async def validate_user_session(
@@ -301,4 +517,4 @@ class AuthenticationService(AuthBaseService):
 # Service instances
 jwt_service = JWTService()
 refresh_token_service = RefreshTokenService()
-auth_service = AuthenticationService()
\ No newline at end of file
+auth_service = AuthenticationService(jwt_service, refresh_token_service)
\ No newline at end of file
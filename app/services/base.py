@@ -3,7 +3,7 @@ Base service classes and utilities
 """
 from typing import Any, Dict, Generic, List, Optional, Type, TypeVar
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, inspect, exists, bindparam
 from sqlalchemy.orm import DeclarativeBase
 
 from app.schemas.base import PaginationParams, PaginatedResponse
@@ -18,10 +18,18 @@ class BaseService(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     
     def __init__(self, model: Type[ModelType]):
         self.model = model
+        # Filterable column attributes, resolved once instead of per request
+        self._columns: Dict[str, Any] = {
+            attr.key: getattr(model, attr.key)
+            for attr in inspect(model).column_attrs
+        }
+        # Lookup statements built once; the id is bound per call
+        self._get_stmt = select(model).where(model.id == bindparam("id"))
+        self._exists_stmt = select(exists().where(model.id == bindparam("id")))
     
     async def get(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
         """Get a single record by ID"""
-        result = await db.execute(select(self.model).where(self.model.id == id))
+        result = await db.execute(self._get_stmt, {"id": id})
         return result.scalar_one_or_none()
     
     async def get_multi(
@@ -30,29 +38,60 @@ class BaseService(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         pagination: PaginationParams,
         filters: Optional[Dict[str, Any]] = None
     ) -> PaginatedResponse:
-        """Get multiple records with pagination"""
+        """
+        Get multiple records with pagination
+        
+        Uses keyset pagination (id > after_id, ordered by id) when
+        pagination.after_id is set, otherwise OFFSET/LIMIT by page. Keyset
+        pages carry no total; callers follow next_after until it is None.
+        """
         query = select(self.model)
         
         # Apply filters if provided
         if filters:
             for key, value in filters.items():
-                if hasattr(self.model, key) and value is not None:
-                    query = query.where(getattr(self.model, key) == value)
+                column = self._columns.get(key)
+                if column is not None and value is not None:
+                    query = query.where(column == value)
         
-        # Get total count
-        count_query = select(func.count()).select_from(query.subquery())
-        total_result = await db.execute(count_query)
-        total = total_result.scalar()
+        if pagination.after_id is not None:
+            page_query = (
+                query.where(self.model.id > pagination.after_id)
+                .order_by(self.model.id)
+                .limit(pagination.limit)
+            )
+            items = list((await db.execute(page_query)).scalars().all())
+            next_after = items[-1].id if len(items) == pagination.limit else None
+            return PaginatedResponse.create(
+                items=items,
+                total=None,
+                pagination=pagination,
+                next_after=next_after
+            )
         
-        # Apply pagination
-        query = query.offset(pagination.offset).limit(pagination.limit)
+        # Total count rides along with the page via a window function
+        page_query = (
+            query.add_columns(func.count().over().label("_total"))
+            .offset(pagination.offset)
+            .limit(pagination.limit)
+        )
         
         # Execute query
-        result = await db.execute(query)
-        items = result.scalars().all()
+        result = await db.execute(page_query)
+        rows = result.all()
+        items = [row[0] for row in rows]
+        
+        if rows:
+            total = rows[0]._total
+        elif pagination.offset:
+            # Page past the end: no row to carry the count, so ask for it
+            count_query = select(func.count()).select_from(query.subquery())
+            total = (await db.execute(count_query)).scalar()
+        else:
+            total = 0
         
         return PaginatedResponse.create(
-            items=list(items),
+            items=items,
             total=total,
             pagination=pagination
         )
@@ -98,7 +137,5 @@ class BaseService(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     
     async def exists(self, db: AsyncSession, id: Any) -> bool:
         """Check if record exists by ID"""
-        result = await db.execute(
-            select(func.count()).where(self.model.id == id)
-        )
-        return result.scalar() > 0
\ No newline at end of file
+        result = await db.execute(self._exists_stmt, {"id": id})
+        return bool(result.scalar())
\ No newline at end of file
@@ -4,31 +4,80 @@ Clerk Authentication Service for BountyGo
 This service integrates Clerk authentication with the existing BountyGo authentication system,
 supporting multiple login methods including Google, GitHub, wallet authentication, and more.
 """
-from typing import Optional, Dict, Any, List
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Tuple, List, Callable, Awaitable
+
+import httpx
+import jwt
+import orjson
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
-try:
-    from fastapi_clerk_auth import ClerkConfig, ClerkHTTPBearer
-    from fastapi.security import HTTPAuthorizationCredentials
-    CLERK_AVAILABLE = True
-except ImportError:
-    CLERK_AVAILABLE = False
-    ClerkConfig = None
-    ClerkHTTPBearer = None
-    HTTPAuthorizationCredentials = None
 import logging
 
 from app.core.config import settings
 from app.core.exceptions import AuthenticationError, AuthorizationError
+from app.core.performance import LRUCache
 from app.models.user import User, RefreshToken
 from app.schemas.user import TokenResponse, UserCreate, UserInDB
 from app.services.base import BaseService
-from app.services.auth import AuthenticationService
+from app.services.auth import AuthenticationService, auth_service
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(slots=True)
+class ClerkUserPayload:
+    """Profile fields a BountyGo user is created or refreshed from"""
+    clerk_user_id: str
+    email: str
+    nickname: str
+    avatar_url: Optional[str] = None
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "ClerkUserPayload":
+        """
+        Parse combined Clerk token claims and user info
+
+        Raises:
+            AuthenticationError: If the email or user ID is missing
+        """
+        email = payload.get("email")
+        clerk_user_id = payload.get("sub")
+
+        if not email:
+            logger.warning("Clerk payload missing email; fields: %s", list(payload))
+            raise AuthenticationError("Clerk token missing email information")
+
+        if not clerk_user_id:
+            logger.warning("Clerk payload missing user ID; fields: %s", list(payload))
+            raise AuthenticationError("Unable to retrieve user ID from Clerk")
+
+        # Build nickname from available fields
+        first_name = payload.get("first_name")
+        last_name = payload.get("last_name")
+
+        if first_name and last_name:
+            nickname = f"{first_name} {last_name}"
+        elif first_name:
+            nickname = first_name
+        elif payload.get("username"):
+            nickname = payload["username"]
+        else:
+            nickname = email.split("@")[0] if "@" in email else "Clerk User"
+
+        return cls(
+            clerk_user_id=clerk_user_id,
+            email=email,
+            nickname=nickname,
+            avatar_url=payload.get("image_url") or payload.get("profile_image_url")
+        )
+
+
 class ClerkAuthService(BaseService):
     """
     Clerk Authentication Service
@@ -38,18 +87,53 @@ class ClerkAuthService(BaseService):
     existing JWT-based authentication.
     """
 
-    def __init__(self):
-        self.auth_service = AuthenticationService()
-        self._clerk_config = None
-        self._clerk_guard = None
+    JWKS_CACHE_TTL_SECONDS = 3600
+    JWKS_MIN_REFRESH_SECONDS = 60
+    JWKS_REFRESH_INTERVAL_SECONDS = 600
+    CLOCK_SKEW_LEEWAY_SECONDS = 30
+    USER_INFO_CACHE_SIZE = 10_000
+    SUPPORTED_PROVIDERS: Tuple[str, ...] = (
+        "google",
+        "github",
+        "microsoft",
+        "apple",
+        "facebook",
+        "twitter",
+        "linkedin",
+        "discord",
+        "twitch",
+        "wallet",  # Web3 wallet authentication
+        "email",   # Email/password
+        "phone",   # SMS authentication
+    )
+    USER_INFO_CACHE_TTL_SECONDS = 300
+
+    def __init__(self, auth: AuthenticationService = auth_service):
+        self.auth_service = auth
+        # Settings read on every request, resolved once
+        self._is_dev = settings.is_development()
+        self._clerk_secret = settings.CLERK_SECRET_KEY
+        self._issuer = settings.get_clerk_issuer()
+        self._jwks_url: Optional[str] = None
+        # (fetched_at, key set) - refreshed after the TTL or on an unknown kid
+        self._jwks_cache: Tuple[float, Optional[jwt.PyJWKSet]] = (0.0, None)
+        self._jwks_refresh_task: Optional[asyncio.Task] = None
+        # Single-flight JWKS fetches: concurrent kid misses share one request
+        self._jwks_lock = asyncio.Lock()
+        self._http = httpx.AsyncClient(timeout=5.0)
+        # Keep-alive client for the Clerk Backend API, created on first use
+        self._api_client: Optional[httpx.AsyncClient] = None
+        # Clerk profiles by user id, plus lookups in flight so concurrent
+        # logins for the same uncached user share one API call
+        self._user_info_cache = LRUCache(
+            max_size=self.USER_INFO_CACHE_SIZE,
+            ttl_seconds=self.USER_INFO_CACHE_TTL_SECONDS
+        )
+        self._user_info_inflight: Dict[str, asyncio.Future] = {}
         self._initialize_clerk()
 
     def _initialize_clerk(self):
-        """Initialize Clerk configuration and authentication guard"""
-        if not CLERK_AVAILABLE:
-            logger.warning("fastapi-clerk-auth package is not available")
-            return
-
+        """Resolve the Clerk JWKS URL tokens are verified against"""
         if not settings.is_clerk_enabled():
             logger.warning("Clerk authentication is not configured")
             return
@@ -59,20 +143,131 @@ class ClerkAuthService(BaseService):
             logger.error("Clerk JWKS URL is not available")
             return
 
-        try:
-            self._clerk_config = ClerkConfig(
-                jwks_url=jwks_url,
-                auto_error=False  # We'll handle errors manually
+        self._jwks_url = jwks_url
+        logger.info(f"Clerk authentication initialized with JWKS URL: {jwks_url}")
+
+    def _get_api_client(self) -> httpx.AsyncClient:
+        """Return the pooled Clerk Backend API client"""
+        if self._api_client is None:
+            self._api_client = httpx.AsyncClient(
+                base_url="https://api.clerk.com",
+                timeout=10.0,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                headers={
+                    "Authorization": f"Bearer {self._clerk_secret}",
+                    "Content-Type": "application/json"
+                }
             )
-            self._clerk_guard = ClerkHTTPBearer(config=self._clerk_config)
-            logger.info(f"Clerk authentication initialized with JWKS URL: {jwks_url}")
+        return self._api_client
+
+    async def start_jwks_refresh(self) -> None:
+        """Prefetch the JWKS and keep it fresh in the background"""
+        if not self.is_enabled or self._jwks_refresh_task is not None:
+            return
+
+        try:
+            await self._get_jwks(refresh=True)
         except Exception as e:
-            logger.error(f"Failed to initialize Clerk authentication: {e}")
+            logger.warning(f"Clerk JWKS prefetch failed: {e}")
+
+        self._jwks_refresh_task = asyncio.create_task(self._refresh_jwks_periodically())
+
+    async def _refresh_jwks_periodically(self) -> None:
+        """Refetch the JWKS every JWKS_REFRESH_INTERVAL_SECONDS"""
+        while True:
+            try:
+                await asyncio.sleep(self.JWKS_REFRESH_INTERVAL_SECONDS)
+                await self._get_jwks(refresh=True)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.warning(f"Clerk JWKS refresh failed: {e}")
+
+    async def aclose(self) -> None:
+        """Stop the JWKS refresher and close the HTTP clients' pooled connections"""
+        if self._jwks_refresh_task is not None:
+            self._jwks_refresh_task.cancel()
+            try:
+                await self._jwks_refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._jwks_refresh_task = None
+
+        await self._http.aclose()
+        if self._api_client is not None:
+            await self._api_client.aclose()
+            self._api_client = None
 
     @property
     def is_enabled(self) -> bool:
         """Check if Clerk authentication is enabled and properly configured"""
-        return CLERK_AVAILABLE and self._clerk_config is not None and self._clerk_guard is not None
+        return self._jwks_url is not None
+
+    async def _get_jwks(self, refresh: bool = False) -> jwt.PyJWKSet:
+        """Return the Clerk JWKS, fetching it when the cached copy is stale"""
+        fetched_at, jwks = self._jwks_cache
+        if (
+            not refresh
+            and jwks is not None
+            and time.monotonic() - fetched_at < self.JWKS_CACHE_TTL_SECONDS
+        ):
+            return jwks
+
+        async with self._jwks_lock:
+            # Another caller fetched (or gave up) while we waited: use its result
+            if self._jwks_cache[0] != fetched_at and self._jwks_cache[1] is not None:
+                return self._jwks_cache[1]
+
+            try:
+                response = await self._http.get(self._jwks_url)
+                response.raise_for_status()
+                fetched = jwt.PyJWKSet.from_dict(response.json())
+            except Exception as e:
+                if jwks is None:
+                    raise
+                # Clerk unreachable: keep verifying with the last known keys and
+                # wait a full TTL before the request path retries
+                logger.warning(f"Clerk JWKS fetch failed, keeping cached keys: {e}")
+                self._jwks_cache = (time.monotonic(), jwks)
+                return jwks
+
+            self._jwks_cache = (time.monotonic(), fetched)
+            return fetched
+
+    @staticmethod
+    def _find_key(jwks: jwt.PyJWKSet, kid: Optional[str]) -> Optional[jwt.PyJWK]:
+        """Return the key with the given kid, if the set has one"""
+        for key in jwks.keys:
+            if key.key_id == kid:
+                return key
+        return None
+
+    async def _get_signing_key(self, token: str) -> jwt.PyJWK:
+        """Select the JWKS key matching the token's kid header"""
+        return await self._get_signing_key_for_kid(jwt.get_unverified_header(token).get("kid"))
+
+    async def _get_signing_key_for_kid(self, kid: Optional[str]) -> jwt.PyJWK:
+        """Select the JWKS key with the given kid, refetching on rotation"""
+        key = self._find_key(await self._get_jwks(), kid)
+        if key is None and time.monotonic() - self._jwks_cache[0] >= self.JWKS_MIN_REFRESH_SECONDS:
+            # Unknown kid: Clerk may have rotated keys. Refetch at most once per
+            # interval so tokens with made-up kids cannot hammer the JWKS endpoint
+            key = self._find_key(await self._get_jwks(refresh=True), kid)
+
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unable to find a signing key that matches: {kid}")
+        return key
+
+    def _decode_clerk_token(self, token: str, signing_key: jwt.PyJWK) -> Dict[str, Any]:
+        """Verify the token signature and claims (blocking)"""
+        return jwt.decode(
+            token,
+            signing_key.key,
+            algorithms=["RS256"],
+            issuer=self._issuer,
+            leeway=self.CLOCK_SKEW_LEEWAY_SECONDS,
+            options={"require": ["exp", "iat", "iss", "sub"], "verify_aud": False}
+        )
 
     async def verify_clerk_token(self, token: str) -> Optional[Dict[str, Any]]:
         """
@@ -87,11 +282,45 @@ class ClerkAuthService(BaseService):
         if not self.is_enabled:
             raise AuthenticationError("Clerk authentication is not enabled")
 
-        logger.info(f"🔍 Starting Clerk token verification for token: {token[:50]}...")
+        return await self._verify_clerk_token(token, self._get_signing_key)
+
+    async def verify_clerk_tokens_batch(self, tokens: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Verify many Clerk JWT tokens at once
+
+        Signing keys are resolved once per distinct kid and the signature
+        checks run concurrently in the thread pool.
+
+        Args:
+            tokens: Clerk JWT tokens
+
+        Returns:
+            Decoded payloads (None for invalid tokens), in input order
+        """
+        if not self.is_enabled:
+            raise AuthenticationError("Clerk authentication is not enabled")
+
+        key_lookups: Dict[Optional[str], asyncio.Future] = {}
+
+        def get_signing_key(token: str) -> Awaitable[jwt.PyJWK]:
+            kid = jwt.get_unverified_header(token).get("kid")
+            if kid not in key_lookups:
+                key_lookups[kid] = asyncio.ensure_future(self._get_signing_key_for_kid(kid))
+            return key_lookups[kid]
+
+        return list(await asyncio.gather(
+            *(self._verify_clerk_token(token, get_signing_key) for token in tokens)
+        ))
 
+    async def _verify_clerk_token(
+        self,
+        token: str,
+        get_signing_key: Callable[[str], Awaitable[jwt.PyJWK]]
+    ) -> Optional[Dict[str, Any]]:
+        """Verify one token, resolving its signing key with get_signing_key"""
         # Development mode: allow mock tokens for testing
-        if settings.is_development() and token.startswith("mock_"):
-            logger.info("Using mock Clerk token for development")
+        if self._is_dev and token.startswith("mock_"):
+            logger.debug("Using mock Clerk token for development")
             return {
                 "sub": "user_mock_123",
                 "email": "test@example.com",
@@ -104,47 +333,33 @@ class ClerkAuthService(BaseService):
             }
 
         try:
-            import jwt
-            from jwt import PyJWKClient
-
-            # Get JWKS URL
-            jwks_url = settings.get_clerk_jwks_url()
-            logger.info(f"📡 Using JWKS URL: {jwks_url}")
-            if not jwks_url:
-                logger.error("JWKS URL not available")
-                return None
+            # Reject tokens from other issuers before paying for an RSA verify
+            if self._issuer:
+                unverified = jwt.decode(token, options={"verify_signature": False})
+                if unverified.get("iss") != self._issuer:
+                    raise jwt.InvalidIssuerError("Invalid issuer")
 
-            # Create JWKS client
-            logger.info("🔑 Creating JWKS client...")
-            jwks_client = PyJWKClient(jwks_url)
-
-            # Get signing key
-            logger.info("🔐 Getting signing key from JWT...")
-            signing_key = jwks_client.get_signing_key_from_jwt(token)
-            logger.info(f"✅ Signing key obtained: {signing_key.key_id}")
-
-            # Verify and decode token
-            logger.info("🔓 Decoding and verifying JWT...")
-            payload = jwt.decode(
-                token,
-                signing_key.key,
-                algorithms=["RS256"],
-                options={"verify_exp": True, "verify_aud": False}
-            )
+            # Get signing key from the cached JWKS
+            signing_key = await get_signing_key(token)
 
-            logger.info(f"✅ JWT verification successful. Payload: {payload}")
+            # Verify and decode token; RSA verification is CPU-bound, so keep
+            # it off the event loop
+            payload = await asyncio.to_thread(self._decode_clerk_token, token, signing_key)
+
+            logger.debug("Clerk token verified (kid=%s)", signing_key.key_id)
             return payload
 
         except jwt.ExpiredSignatureError:
-            logger.warning("❌ Clerk token has expired")
+            logger.warning("Clerk token has expired")
             return None
         except jwt.InvalidTokenError as e:
-            logger.warning(f"❌ Invalid Clerk token: {e}")
+            logger.warning("Invalid Clerk token: %s", e)
             return None
         except Exception as e:
-            logger.error(f"💥 Clerk token verification failed: {e}")
-            import traceback
-            logger.error(f"Full traceback: {traceback.format_exc()}")
+            logger.error(
+                "Clerk token verification failed: %s", e,
+                exc_info=logger.isEnabledFor(logging.DEBUG)
+            )
             return None
 
     async def authenticate_with_clerk(
@@ -165,205 +380,128 @@ class ClerkAuthService(BaseService):
         # Verify Clerk token
         clerk_payload = await self.verify_clerk_token(clerk_token)
         if not clerk_payload:
-            # Enhanced error message for debugging
-            logger.error(f"Clerk token verification failed for token: {clerk_token[:50]}...")
-            logger.error(f"Token length: {len(clerk_token)}")
-            logger.error(f"JWKS URL: {settings.get_clerk_jwks_url()}")
-
-            # Try alternative approach: decode without verification to get user ID
-            logger.info("Attempting fallback: decode token without verification to extract user ID")
-            try:
-                import jwt
-                # Decode without verification to get the user ID
-                unverified_payload = jwt.decode(clerk_token, options={"verify_signature": False})
-                logger.info(f"Unverified payload: {unverified_payload}")
-
-                user_id = unverified_payload.get("sub")
-                if user_id and user_id.startswith("user_"):
-                    logger.info(f"Found user ID in unverified token: {user_id}")
-                    # Use the unverified payload but validate the user exists in Clerk
-                    try:
-                        user_info = await self._get_clerk_user_info(user_id)
-                        logger.info(f"Successfully validated user via Clerk API: {user_info.get('email')}")
-                        # Create a minimal payload with the user ID
-                        clerk_payload = {
-                            "sub": user_id,
-                            "iat": unverified_payload.get("iat"),
-                            "exp": unverified_payload.get("exp"),
-                            "iss": unverified_payload.get("iss")
-                        }
-                        logger.info("Using fallback authentication method")
-                    except Exception as api_e:
-                        logger.error(f"Fallback API validation failed: {api_e}")
-                        raise AuthenticationError("Invalid Clerk token - verification and fallback failed")
-                else:
-                    logger.error("No valid user ID found in unverified token")
-                    raise AuthenticationError("Invalid Clerk token - no user ID found")
-            except Exception as fallback_e:
-                logger.error(f"Fallback token decode failed: {fallback_e}")
-                raise AuthenticationError("Invalid Clerk token - verification failed")
-
-        logger.info(f"Clerk token payload: {clerk_payload}")
+            raise AuthenticationError("Invalid Clerk token - verification failed")
 
         # Extract user ID from token
         clerk_user_id = clerk_payload.get("sub")
         if not clerk_user_id:
-            logger.error(f"Missing 'sub' field in Clerk token. Available fields: {list(clerk_payload.keys())}")
+            logger.warning("Clerk token missing 'sub'; claims: %s", list(clerk_payload))
             raise AuthenticationError("Clerk token missing user ID (sub field)")
 
-        logger.info(f"Processing Clerk authentication for user_id: {clerk_user_id}")
-
-        # Get user information from Clerk API (skip for mock tokens)
-        if clerk_user_id.startswith("user_mock_"):
-            # For mock tokens, use the payload directly
-            user_info = {
-                "email": clerk_payload.get("email"),
-                "first_name": clerk_payload.get("first_name"),
-                "last_name": clerk_payload.get("last_name"),
-                "username": clerk_payload.get("username"),
-                "image_url": clerk_payload.get("picture"),
-                "profile_image_url": clerk_payload.get("picture")
-            }
-            logger.info(f"Using mock user info: {user_info}")
+        # Get user information from Clerk API, unless the token already
+        # carries the profile claims (custom session claims or mock tokens)
+        if clerk_user_id.startswith("user_mock_") or clerk_payload.get("email"):
+            user_info = self._user_info_from_claims(clerk_payload)
         else:
             try:
-                logger.info(f"Attempting to get user info from Clerk API for user_id: {clerk_user_id}")
                 user_info = await self._get_clerk_user_info(clerk_user_id)
-                logger.info(f"Retrieved user info from Clerk API: {user_info}")
 
                 # Validate that we got email information
                 if not user_info.get("email"):
-                    logger.error(f"Clerk API returned user info without email: {user_info}")
                     raise AuthenticationError("Clerk API did not return email information")
 
             except Exception as e:
-                logger.error(f"Failed to get user info from Clerk API: {e}")
-                import traceback
-                logger.error(f"Full traceback: {traceback.format_exc()}")
+                logger.error(
+                    "Failed to get user info from Clerk API: %s", e,
+                    exc_info=logger.isEnabledFor(logging.DEBUG)
+                )
                 raise AuthenticationError(f"Failed to retrieve user information from Clerk: {str(e)}")
 
         # Combine token payload with user info
-        combined_payload = {**clerk_payload, **user_info}
+        profile = ClerkUserPayload.from_payload({**clerk_payload, **user_info})
 
         # Find or create user in BountyGo database
-        user = await self._find_or_create_clerk_user(db, combined_payload)
+        user = await self._find_or_create_clerk_user(db, profile)
 
         # Generate BountyGo JWT tokens
         token_response = await self.auth_service.create_token_pair(db, user.id)
 
-        logger.info(f"User authenticated via Clerk: {user.email}")
+        logger.info("User authenticated via Clerk: %s", user.email)
         return token_response
 
+    @staticmethod
+    def _user_info_from_claims(clerk_payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the user info dict from verified token claims"""
+        picture = clerk_payload.get("image_url") or clerk_payload.get("picture")
+        return {
+            "email": clerk_payload.get("email"),
+            "first_name": clerk_payload.get("first_name"),
+            "last_name": clerk_payload.get("last_name"),
+            "username": clerk_payload.get("username"),
+            "image_url": picture,
+            "profile_image_url": picture
+        }
+
     async def _find_or_create_clerk_user(
         self,
         db: AsyncSession,
-        clerk_payload: Dict[str, Any]
+        clerk_user: ClerkUserPayload
     ) -> User:
         """
-        Find existing user or create new user from Clerk payload
+        Find existing user or create new user from a Clerk profile
 
         Args:
             db: Database session
-            clerk_payload: Combined Clerk JWT payload and user info from API
+            clerk_user: Profile parsed from the Clerk token and user info
 
         Returns:
             User object
         """
-        # Extract email from API response
-        email = clerk_payload.get("email")
-        clerk_user_id = clerk_payload.get("sub")
+        email = clerk_user.email
 
-        if not email:
-            logger.error(f"Missing email field in Clerk token. Available fields: {list(clerk_payload.keys())}")
-            raise AuthenticationError("Clerk token missing email information")
-
-        if not clerk_user_id:
-            logger.error(f"No user ID found in Clerk payload: {clerk_payload}")
-            raise AuthenticationError("Unable to retrieve user ID from Clerk")
-
-        # Try to find existing user by email or clerk_id
-        stmt = select(User).where(
-            (User.email == email) | (User.clerk_id == clerk_user_id)
+        # Insert, or refresh the user already linked to this Clerk account,
+        # in a single round trip
+        insert_stmt = pg_insert(User).values(
+            email=email,
+            nickname=clerk_user.nickname,
+            avatar_url=clerk_user.avatar_url,
+            is_active=True,
+            clerk_id=clerk_user.clerk_user_id
         )
-        result = await db.execute(stmt)
-        user = result.scalar_one_or_none()
-
-        if user:
-            # Update user with latest Clerk information
-            updated = False
-            if user.clerk_id != clerk_user_id:
-                user.clerk_id = clerk_user_id
-                updated = True
-            if user.email != email:
-                user.email = email
-                updated = True
-
-            # Update other fields if they've changed
-            first_name = clerk_payload.get("first_name")
-            last_name = clerk_payload.get("last_name")
-
-            if first_name and last_name:
-                new_nickname = f"{first_name} {last_name}"
-            elif first_name:
-                new_nickname = first_name
-            elif clerk_payload.get("username"):
-                new_nickname = clerk_payload.get("username")
-            else:
-                new_nickname = email.split("@")[0]
-
-            if user.nickname != new_nickname:
-                user.nickname = new_nickname
-                updated = True
-
-            # Update avatar if available
-            avatar_url = (
-                clerk_payload.get("image_url") or
-                clerk_payload.get("profile_image_url")
+        profile = {
+            "nickname": clerk_user.nickname,
+            # Keep the stored avatar when Clerk has none
+            "avatar_url": func.coalesce(insert_stmt.excluded.avatar_url, User.avatar_url),
+            "updated_at": func.now(),
+        }
+        stmt = (
+            insert_stmt
+            .on_conflict_do_update(
+                index_elements=[User.clerk_id],
+                set_={"email": email, **profile}
             )
-            if avatar_url and user.avatar_url != avatar_url:
-                user.avatar_url = avatar_url
-                updated = True
-
-            if updated:
-                await db.commit()
-                await db.refresh(user)
-
-            logger.info(f"Found existing user for Clerk authentication: {email}")
-            return user
-
-        # Create new user
-        first_name = clerk_payload.get("first_name")
-        last_name = clerk_payload.get("last_name")
-
-        # Build nickname from available fields
-        if first_name and last_name:
-            nickname = f"{first_name} {last_name}"
-        elif first_name:
-            nickname = first_name
-        elif clerk_payload.get("username"):
-            nickname = clerk_payload.get("username")
-        else:
-            nickname = email.split("@")[0] if "@" in email else "Clerk User"
-
-        # Extract avatar URL
-        avatar_url = (
-            clerk_payload.get("image_url") or
-            clerk_payload.get("profile_image_url")
+            .returning(User)
+            .execution_options(populate_existing=True)
         )
 
-        user = User(
-            email=email,
-            nickname=nickname,
-            avatar_url=avatar_url,
-            is_active=True,
-            clerk_id=clerk_user_id
-        )
+        # Each attempt runs in a savepoint so a conflict undoes only that
+        # statement, not the caller's transaction
+        try:
+            async with db.begin_nested():
+                user = (await db.execute(stmt)).scalar_one()
+        except IntegrityError:
+            # The email belongs to an existing account (e.g. a Google login):
+            # link it, unless another Clerk account already claimed it
+            stmt = (
+                update(User)
+                .where(User.email == email, User.clerk_id.is_(None))
+                .values(clerk_id=clerk_user.clerk_user_id, **profile)
+                .returning(User)
+                .execution_options(populate_existing=True)
+            )
+            try:
+                async with db.begin_nested():
+                    user = (await db.execute(stmt)).scalar_one_or_none()
+            except IntegrityError:
+                # This Clerk account is already linked to another user and its
+                # new email belongs to a different, unlinked account
+                raise AuthenticationError("Email is already used by another account")
+            if user is None:
+                raise AuthenticationError("Email is already linked to another Clerk account")
 
-        db.add(user)
         await db.commit()
-        await db.refresh(user)
 
-        logger.info(f"Created new user from Clerk authentication: {email} (nickname: {nickname})")
+        logger.debug("Upserted user from Clerk authentication: %s", email)
         return user
 
     async def link_clerk_to_existing_user(
@@ -388,48 +526,36 @@ class ClerkAuthService(BaseService):
         if not clerk_payload:
             raise AuthenticationError("Invalid Clerk token")
 
-        # Get existing user
-        stmt = select(User).where(User.id == user_id)
-        result = await db.execute(stmt)
-        user = result.scalar_one_or_none()
+        # Update user with Clerk information
+        stmt = (
+            update(User)
+            .where(User.id == user_id)
+            .values(clerk_id=clerk_payload.get("sub"))
+            .returning(User.email)
+            .execution_options(synchronize_session=False)
+        )
+        email = (await db.execute(stmt)).scalar_one_or_none()
 
-        if not user:
+        if email is None:
             raise AuthenticationError("User not found")
 
-        # Update user with Clerk information
-        clerk_user_id = clerk_payload.get("sub")
-        user.clerk_id = clerk_user_id
-
         await db.commit()
 
-        logger.info(f"Linked Clerk account to existing user: {user.email}")
+        logger.info(f"Linked Clerk account to existing user: {email}")
         return True
 
-    def get_supported_providers(self) -> List[str]:
+    def get_supported_providers(self) -> Tuple[str, ...]:
         """
         Get list of authentication providers supported by Clerk
 
         Returns:
-            List of provider names
+            Tuple of provider names
         """
-        return [
-            "google",
-            "github",
-            "microsoft",
-            "apple",
-            "facebook",
-            "twitter",
-            "linkedin",
-            "discord",
-            "twitch",
-            "wallet",  # Web3 wallet authentication
-            "email",   # Email/password
-            "phone",   # SMS authentication
-        ]
+        return self.SUPPORTED_PROVIDERS
 
     async def _get_clerk_user_info(self, user_id: str) -> Dict[str, Any]:
         """
-        Get user information from Clerk API
+        Get user information from Clerk API, cached for a few minutes
 
         Args:
             user_id: Clerk user ID
@@ -437,53 +563,67 @@ class ClerkAuthService(BaseService):
         Returns:
             User information dictionary
         """
-        import httpx
+        user_info = self._user_info_cache.get(user_id)
+        if user_info is not None:
+            return user_info
+
+        inflight = self._user_info_inflight.get(user_id)
+        if inflight is None:
+            inflight = asyncio.ensure_future(self._fetch_clerk_user_info(user_id))
+            self._user_info_inflight[user_id] = inflight
+            # Failed lookups (e.g. 401/404) are never cached
+            inflight.add_done_callback(lambda _: self._user_info_inflight.pop(user_id, None))
+
+        # Shielded so one cancelled caller does not cancel the shared lookup
+        user_info = await asyncio.shield(inflight)
+        self._user_info_cache.put(user_id, user_info)
+        return user_info
+
+    async def _fetch_clerk_user_info(self, user_id: str) -> Dict[str, Any]:
+        """
+        Fetch user information from Clerk API
 
-        if not settings.CLERK_SECRET_KEY:
+        Args:
+            user_id: Clerk user ID
+
+        Returns:
+            User information dictionary
+        """
+        if not self._clerk_secret:
             raise AuthenticationError("Clerk secret key not configured")
 
-        headers = {
-            "Authorization": f"Bearer {settings.CLERK_SECRET_KEY}",
-            "Content-Type": "application/json"
-        }
+        response = await self._get_api_client().get(f"/v1/users/{user_id}")
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://api.clerk.com/v1/users/{user_id}",
-                headers=headers,
-                timeout=10.0
-            )
+        if response.status_code == 200:
+            user_data = orjson.loads(response.content)
 
-            if response.status_code == 200:
-                user_data = response.json()
-
-                # Extract relevant information
-                email_addresses = user_data.get("email_addresses", [])
-                primary_email = None
-
-                # Find primary email
-                for email_obj in email_addresses:
-                    if email_obj.get("id") == user_data.get("primary_email_address_id"):
-                        primary_email = email_obj.get("email_address")
-                        break
-
-                # Fallback to first email if no primary found
-                if not primary_email and email_addresses:
-                    primary_email = email_addresses[0].get("email_address")
-
-                return {
-                    "email": primary_email,
-                    "first_name": user_data.get("first_name"),
-                    "last_name": user_data.get("last_name"),
-                    "username": user_data.get("username"),
-                    "image_url": user_data.get("image_url"),
-                    "profile_image_url": user_data.get("profile_image_url"),
-                    "created_at": user_data.get("created_at"),
-                    "updated_at": user_data.get("updated_at")
-                }
-            else:
-                logger.error(f"Failed to get user info from Clerk API: {response.status_code} - {response.text}")
-                raise AuthenticationError(f"Clerk API error: {response.status_code}")
+            # Extract relevant information
+            email_addresses = user_data.get("email_addresses", [])
+            primary_email = None
+
+            # Find primary email
+            for email_obj in email_addresses:
+                if email_obj.get("id") == user_data.get("primary_email_address_id"):
+                    primary_email = email_obj.get("email_address")
+                    break
+
+            # Fallback to first email if no primary found
+            if not primary_email and email_addresses:
+                primary_email = email_addresses[0].get("email_address")
+
+            return {
+                "email": primary_email,
+                "first_name": user_data.get("first_name"),
+                "last_name": user_data.get("last_name"),
+                "username": user_data.get("username"),
+                "image_url": user_data.get("image_url"),
+                "profile_image_url": user_data.get("profile_image_url"),
+                "created_at": user_data.get("created_at"),
+                "updated_at": user_data.get("updated_at")
+            }
+        else:
+            logger.error(f"Failed to get user info from Clerk API: {response.status_code} - {response.text}")
+            raise AuthenticationError(f"Clerk API error: {response.status_code}")
 
     async def get_user_from_clerk_token(
         self,
@@ -509,20 +649,24 @@ class ClerkAuthService(BaseService):
             if not clerk_user_id:
                 return None
 
-            # Try to get user info from Clerk API
-            try:
+            # Returning users are linked by clerk_id: one unique-index lookup
+            stmt = select(User).where(User.clerk_id == clerk_user_id).limit(1)
+            result = await db.execute(stmt)
+            user = result.scalar_one_or_none()
+            if user:
+                return user
+
+            # Not linked yet (pre-Clerk accounts): match by email, taken from
+            # the token when present so only bare tokens hit the Clerk API
+            email = clerk_payload.get("email")
+            if not email:
                 user_info = await self._get_clerk_user_info(clerk_user_id)
                 email = user_info.get("email")
-            except:
-                # Fallback: try to find user by clerk_id
-                stmt = select(User).where(User.clerk_id == clerk_user_id)
-                result = await db.execute(stmt)
-                return result.scalar_one_or_none()
 
             if not email:
                 return None
 
-            stmt = select(User).where(User.email == email)
+            stmt = select(User).where(User.email == email).limit(1)
             result = await db.execute(stmt)
             return result.scalar_one_or_none()
 
@@ -1,60 +1,158 @@
 """
 Google OAuth authentication service
 """
+import asyncio
+import hashlib
+import logging
+import threading
+import time
 import httpx
+import jwt
 from typing import Optional, Dict, Any
-from google.auth.transport import requests
-from google.oauth2 import id_token
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from datetime import datetime, timedelta
 
 from app.core.config import settings
 from app.core.exceptions import GoogleAuthenticationError, ValidationError
+from app.core.performance import LRUCache
 from app.models.user import User
 from app.schemas.user import GoogleUserInfo, UserCreate, TokenResponse
 from app.services.auth import AuthBaseService, auth_service
 
+logger = logging.getLogger(__name__)
+
 
 class GoogleAuthService(AuthBaseService):
     """Google OAuth authentication service"""
+
+    # Verified ID token claims are reused for at most this long (and never
+    # past the token's exp), which bounds the revocation window
+    ID_TOKEN_CACHE_SIZE = 10_000
+    ID_TOKEN_CACHE_TTL_SECONDS = 30
+    # Google rotates its signing keys rarely and serves them with a ~6h max-age
+    GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v3/certs'
+    GOOGLE_CERTS_CACHE_SECONDS = 6 * 3600
+    # An unknown kid refetches the certs at most once per interval
+    GOOGLE_CERTS_MIN_REFRESH_SECONDS = 60
+    GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+    # Cap on in-flight calls to Google's OAuth endpoints during fan-out spikes
+    GOOGLE_MAX_CONCURRENT_REQUESTS = 20
     
     def __init__(self):
         self.client_id = settings.GOOGLE_CLIENT_ID
         self.client_secret = settings.GOOGLE_CLIENT_SECRET
+        # Keyed by SHA-256 of the token so raw tokens are never held in memory
+        self._id_token_cache = LRUCache(
+            max_size=self.ID_TOKEN_CACHE_SIZE,
+            ttl_seconds=self.ID_TOKEN_CACHE_TTL_SECONDS
+        )
+        # Google's JWKS, fetched once and refetched on expiry or an unknown kid
+        self._jwks_client = jwt.PyJWKClient(
+            self.GOOGLE_CERTS_URL,
+            cache_jwk_set=True,
+            lifespan=self.GOOGLE_CERTS_CACHE_SECONDS,
+            timeout=10
+        )
+        # Lookups run in worker threads, so the kid-miss refresh is locked
+        self._jwks_refresh_lock = threading.Lock()
+        self._jwks_refreshed_at = float('-inf')
+        # Keep-alive client shared by all calls to Google's OAuth endpoints
+        self._http = httpx.AsyncClient(
+            timeout=10.0,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+        self._google_semaphore = asyncio.Semaphore(self.GOOGLE_MAX_CONCURRENT_REQUESTS)
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP connections"""
+        await self._http.aclose()
         
+    def _get_signing_key(self, token: str) -> jwt.PyJWK:
+        """Select the cached JWKS key for the token's kid (blocking)"""
+        kid = jwt.get_unverified_header(token).get('kid')
+        key = self._jwks_client.match_kid(self._jwks_client.get_signing_keys(), kid)
+        if key is None:
+            with self._jwks_refresh_lock:
+                key = self._jwks_client.match_kid(self._jwks_client.get_signing_keys(), kid)
+                # Unknown kid: Google may have rotated keys. Refetch at most once per
+                # interval so tokens with made-up kids cannot hammer the certs endpoint
+                if key is None and time.monotonic() - self._jwks_refreshed_at >= self.GOOGLE_CERTS_MIN_REFRESH_SECONDS:
+                    self._jwks_refreshed_at = time.monotonic()
+                    key = self._jwks_client.match_kid(self._jwks_client.get_signing_keys(refresh=True), kid)
+
+        if key is None:
+            raise jwt.PyJWKClientError(f'Unable to find a signing key that matches: "{kid}"')
+        return key
+
+    def _decode_id_token(self, token: str) -> Dict[str, Any]:
+        """Verify a Google ID token against the cached JWKS (blocking)"""
+        signing_key = self._get_signing_key(token)
+        idinfo = jwt.decode(
+            token,
+            signing_key.key,
+            algorithms=['RS256'],
+            audience=self.client_id,
+            options={"require": ["iss", "aud", "exp"]}
+        )
+        # Checked here rather than via issuer=: PyJWT before 2.10 only
+        # accepts a single issuer string
+        if idinfo['iss'] not in self.GOOGLE_ISSUERS:
+            raise jwt.InvalidIssuerError("Invalid issuer")
+        return idinfo
+
+    async def _verify_id_token(self, token: str) -> Dict[str, Any]:
+        """
+        Verify a Google ID token signature, reusing recent results
+
+        Raises:
+            jwt.InvalidTokenError: If the token is rejected
+        """
+        key = hashlib.sha256(token.encode()).hexdigest()
+        idinfo = self._id_token_cache.get(key)
+        if idinfo is not None and int(idinfo.get('exp', 0)) > time.time():
+            return idinfo
+
+        # JWKS refetch and RSA verify are blocking: keep them off the event loop
+        idinfo = await asyncio.to_thread(self._decode_id_token, token)
+
+        ttl = min(self.ID_TOKEN_CACHE_TTL_SECONDS, int(idinfo.get('exp', 0) - time.time()))
+        if ttl > 0:
+            self._id_token_cache.put(key, idinfo, ttl)
+        return idinfo
+
+
     async def verify_google_token(self, token: str) -> GoogleUserInfo:
         """
         验证Google ID token并提取用户信息
         """
         try:
             # 验证Google ID token
-            idinfo = id_token.verify_oauth2_token(
-                token, 
-                requests.Request(), 
-                self.client_id
-            )
+            idinfo = await self._verify_id_token(token)
             
             # 检查token发行者
-            if idinfo['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
+            if idinfo['iss'] not in self.GOOGLE_ISSUERS:
                 raise GoogleAuthenticationError('Invalid token issuer')
             
             # 提取用户信息
-            google_user_info = GoogleUserInfo(
-                google_id=idinfo['sub'],
-                email=idinfo['email'],
-                nickname=idinfo.get('name', ''),
-                avatar_url=idinfo.get('picture'),
-                verified_email=idinfo.get('email_verified', False)
-            )
-            
-            return google_user_info
+            return self._user_info_from_idinfo(idinfo)
             
-        except ValueError as e:
+        except (ValueError, jwt.InvalidTokenError) as e:
             raise GoogleAuthenticationError(f'Invalid Google token: {str(e)}')
         except Exception as e:
             raise GoogleAuthenticationError(f'Google token verification failed: {str(e)}')
     
+    @staticmethod
+    def _user_info_from_idinfo(idinfo: Dict[str, Any]) -> GoogleUserInfo:
+        """从已验证的ID token声明构建GoogleUserInfo"""
+        return GoogleUserInfo(
+            google_id=idinfo['sub'],
+            email=idinfo['email'],
+            nickname=idinfo.get('name', ''),
+            avatar_url=idinfo.get('picture'),
+            verified_email=idinfo.get('email_verified', False)
+        )
+    
     async def get_user_by_google_id(self, db: AsyncSession, google_id: str) -> Optional[User]:
         """
         通过Google ID查找用户
@@ -150,20 +248,11 @@ class GoogleAuthService(AuthBaseService):
         """
         使用Google token进行认证
         """
-        # 1. 验证Google token并获取用户信息
+        # 1. 验证Google token（含邮箱验证检查）并获取用户信息
         token_info = await self.verify_and_get_user_info(google_token)
         
         # 2. 创建GoogleUserInfo对象
-        google_user_info = GoogleUserInfo(
-            google_id=token_info['sub'],
-            email=token_info['email'],
-            nickname=token_info.get('name', ''),
-            avatar_url=token_info.get('picture'),
-            verified_email=token_info.get('email_verified', False)
-        )
-        
-        if not google_user_info.verified_email:
-            raise GoogleAuthenticationError('Email not verified by Google')
+        google_user_info = self._user_info_from_idinfo(token_info)
         
         # 3. 获取或创建用户
         from app.services.user import user_service
@@ -179,16 +268,16 @@ class GoogleAuthService(AuthBaseService):
         撤销Google访问权限
         """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
+            async with self._google_semaphore:
+                response = await self._http.post(
                     'https://oauth2.googleapis.com/revoke',
                     params={'token': access_token},
                     headers={'Content-Type': 'application/x-www-form-urlencoded'}
                 )
-                return response.status_code == 200
+            return response.status_code == 200
         except Exception as e:
             # 记录错误但不抛出异常，因为本地token仍然可以被撤销
-            print(f"Failed to revoke Google access: {str(e)}")
+            logger.warning("Failed to revoke Google access: %s", e)
             return False
     
     async def get_google_user_info(self, access_token: str) -> Optional[Dict[str, Any]]:
@@ -196,45 +285,39 @@ class GoogleAuthService(AuthBaseService):
         使用access token获取Google用户信息
         """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
+            async with self._google_semaphore:
+                response = await self._http.get(
                     'https://www.googleapis.com/oauth2/v2/userinfo',
                     headers={'Authorization': f'Bearer {access_token}'}
                 )
-                
-                if response.status_code == 200:
-                    return response.json()
-                return None
+            
+            if response.status_code == 200:
+                return response.json()
+            return None
                 
         except Exception as e:
-            print(f"Failed to get Google user info: {str(e)}")
+            logger.warning("Failed to get Google user info: %s", e)
             return None
     
     def validate_google_token_format(self, token: str) -> bool:
         """
         验证Google token格式
         """
-        if not token or not isinstance(token, str):
-            return False
-        
-        # Google ID token是JWT格式
-        parts = token.split('.')
-        if len(parts) != 3:
-            return False
-        
-        # 检查token长度（Google ID token通常很长）
-        if len(token) < 100:
-            return False
-        
-        return True
+        # Google ID token是JWT格式（三段，两个点），且通常很长；
+        # 用count代替split，避免每次请求分配列表
+        return (
+            isinstance(token, str)
+            and len(token) >= 100
+            and token.count('.') == 2
+        )
     
     async def refresh_google_token(self, refresh_token: str) -> Optional[Dict[str, Any]]:
         """
         刷新Google access token
         """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
+            async with self._google_semaphore:
+                response = await self._http.post(
                     'https://oauth2.googleapis.com/token',
                     data={
                         'client_id': self.client_id,
@@ -244,13 +327,13 @@ class GoogleAuthService(AuthBaseService):
                     },
                     headers={'Content-Type': 'application/x-www-form-urlencoded'}
                 )
-                
-                if response.status_code == 200:
-                    return response.json()
-                return None
+            
+            if response.status_code == 200:
+                return response.json()
+            return None
                 
         except Exception as e:
-            print(f"Failed to refresh Google token: {str(e)}")
+            logger.warning("Failed to refresh Google token: %s", e)
             return None
     
     async def verify_and_get_user_info(self, google_token: str) -> Dict[str, Any]:
@@ -263,11 +346,7 @@ class GoogleAuthService(AuthBaseService):
         
         try:
             # Verify Google ID token
-            idinfo = id_token.verify_oauth2_token(
-                google_token, 
-                requests.Request(), 
-                self.client_id
-            )
+            idinfo = await self._verify_id_token(google_token)
             
             # Validate token claims
             self._validate_token_claims(idinfo)
@@ -278,7 +357,7 @@ class GoogleAuthService(AuthBaseService):
             
             return idinfo
             
-        except ValueError as e:
+        except (ValueError, jwt.InvalidTokenError) as e:
             raise GoogleAuthenticationError(f'Invalid Google token: {str(e)}')
         except Exception as e:
             raise GoogleAuthenticationError(f'Google token verification failed: {str(e)}')
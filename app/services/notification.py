@@ -1,13 +1,14 @@
 """
 Notification service for managing notifications and reminders
 """
-import json
+import orjson
 import asyncio
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Dict, Any, Iterable, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_, update, delete
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, and_, or_, update, delete, func, insert, case, exists
+from sqlalchemy.orm import selectinload, joinedload, contains_eager
 
 from app.models.notification import (
     Notification,
@@ -19,6 +20,13 @@ from app.models.notification import (
 )
 from app.models.user import User
 from app.models.task import Task, Todo
+from app.schemas.task import (
+    REMIND_T_3D,
+    REMIND_T_1D,
+    REMIND_DDL_2H,
+    REMIND_ALL,
+    remind_flags_from_dict
+)
 from app.schemas.notification import (
     NotificationCreate,
     NotificationUpdate,
@@ -27,13 +35,97 @@ from app.schemas.notification import (
 )
 from app.services.base import BaseService
 from app.core.exceptions import NotFoundError, ValidationError
+from app.core.performance import LRUCache
+
+
+# Built-in templates, created on first use of each (type, channel)
+_DEFAULT_TEMPLATES = {
+    NotificationType.TASK_REMINDER_3D: {
+        "title": "Task Reminder - 3 Days Left",
+        "message": "Task '{task_title}' is due in 3 days (Deadline: {deadline}). Don't forget to complete it!"
+    },
+    NotificationType.TASK_REMINDER_1D: {
+        "title": "Task Reminder - 1 Day Left",
+        "message": "Task '{task_title}' is due tomorrow (Deadline: {deadline}). Time to finish up!"
+    },
+    NotificationType.TASK_REMINDER_2H: {
+        "title": "Task Reminder - 2 Hours Left",
+        "message": "Task '{task_title}' is due in 2 hours (Deadline: {deadline}). Final reminder!"
+    },
+    NotificationType.TASK_COMPLETED: {
+        "title": "Task Completed",
+        "message": "Task '{task_title}' has been marked as completed. Great job!"
+    },
+    NotificationType.TASK_CANCELLED: {
+        "title": "Task Cancelled",
+        "message": "Task '{task_title}' has been cancelled by the sponsor."
+    },
+    NotificationType.NEW_MESSAGE: {
+        "title": "New Message",
+        "message": "New message in task '{task_title}' from {sender_name}: {message_preview}"
+    }
+}
+
+_DEFAULT_TEMPLATE_VARIABLES_JSON = orjson.dumps(
+    ["task_title", "deadline", "sender_name", "message_preview"]
+).decode()
+
+# (remind_flags bit, seconds before deadline, reminder type, preference toggle)
+_REMINDER_SPECS = (
+    (REMIND_T_3D, 3 * 24 * 3600, NotificationType.TASK_REMINDER_3D, "task_reminder_3d_enabled"),
+    (REMIND_T_1D, 24 * 3600, NotificationType.TASK_REMINDER_1D, "task_reminder_1d_enabled"),
+    (REMIND_DDL_2H, 2 * 3600, NotificationType.TASK_REMINDER_2H, "task_reminder_2h_enabled"),
+)
+
+
+@lru_cache(maxsize=64)
+def _flags_mask(remind_flags_json: Optional[str]) -> int:
+    """Bitmask for a stored todos.remind_flags value; missing or malformed means all on"""
+    if not remind_flags_json:
+        return REMIND_ALL
+    try:
+        flags = orjson.loads(remind_flags_json)
+    except orjson.JSONDecodeError:
+        return REMIND_ALL
+    if not isinstance(flags, dict):
+        return REMIND_ALL
+    return remind_flags_from_dict(flags)
+
+
+def _wake_scheduler_if_due(scheduled_at: datetime) -> None:
+    """Nudge the delivery loop when a new notification is already due"""
+    if scheduled_at.tzinfo is not None:
+        scheduled_at = scheduled_at.astimezone(timezone.utc).replace(tzinfo=None)
+    if scheduled_at > datetime.utcnow():
+        # Future reminders are picked up by the periodic poll
+        return
+
+    # Imported lazily: the scheduler module imports this one
+    from app.services.scheduler import scheduler_manager
+    scheduler_manager.notification_scheduler.wakeup()
 
 
 class NotificationService(BaseService[Notification, NotificationCreate, NotificationUpdate]):
     """Service for managing notifications"""
 
+    # Templates are effectively configuration: keep them in-process briefly
+    TEMPLATE_CACHE_SIZE = 256
+    TEMPLATE_CACHE_TTL_SECONDS = 300
+
     def __init__(self):
         super().__init__(Notification)
+        self._template_cache = LRUCache(
+            max_size=self.TEMPLATE_CACHE_SIZE,
+            ttl_seconds=self.TEMPLATE_CACHE_TTL_SECONDS
+        )
+
+    @staticmethod
+    def _template_key(notification_type: NotificationType, channel: str) -> str:
+        return f"{notification_type.value}:{channel}"
+
+    def invalidate_template_cache(self) -> None:
+        """Drop cached templates; call after editing notification_templates"""
+        self._template_cache.clear()
 
     async def create_task_reminder(
         self,
@@ -42,17 +134,19 @@ class NotificationService(BaseService[Notification, NotificationCreate, Notifica
         task_id: int,
         reminder_type: NotificationType,
         scheduled_at: datetime,
-        channel: str = "websocket"
+        channel: str = "websocket",
+        task: Optional[Task] = None
     ) -> Notification:
-        """Create a task reminder notification"""
+        """Create a task reminder notification; pass task if the caller already loaded it"""
 
         # Get task details
-        task_result = await db.execute(
-            select(Task).where(Task.id == task_id)
-        )
-        task = task_result.scalar_one_or_none()
-        if not task:
-            raise NotFoundError("Task not found")
+        if task is None:
+            task_result = await db.execute(
+                select(Task).where(Task.id == task_id)
+            )
+            task = task_result.scalar_one_or_none()
+            if not task:
+                raise NotFoundError("Task not found")
 
         # Get notification template
         template = await self.get_notification_template(db, reminder_type, channel)
@@ -73,7 +167,9 @@ class NotificationService(BaseService[Notification, NotificationCreate, Notifica
             scheduled_at=scheduled_at
         )
 
-        return await self.create(db, notification_data)
+        notification = await self.create(db, notification_data)
+        _wake_scheduler_if_due(scheduled_at)
+        return notification
 
     async def get_notification_template(
         self,
@@ -83,6 +179,11 @@ class NotificationService(BaseService[Notification, NotificationCreate, Notifica
     ) -> NotificationTemplate:
         """Get notification template for type and channel"""
 
+        key = self._template_key(notification_type, channel)
+        template = self._template_cache.get(key)
+        if template is not None:
+            return template
+
         result = await db.execute(
             select(NotificationTemplate)
             .where(
@@ -99,8 +200,50 @@ class NotificationService(BaseService[Notification, NotificationCreate, Notifica
             # Create default template if not exists
             template = await self._create_default_template(db, notification_type, channel)
 
+        self._template_cache.put(key, template)
         return template
 
+    async def get_notification_templates(
+        self,
+        db: AsyncSession,
+        pairs: Iterable[Tuple[NotificationType, str]]
+    ) -> Dict[Tuple[NotificationType, str], NotificationTemplate]:
+        """Get the templates for several (type, channel) pairs in one query"""
+        # Read twice below: a one-shot iterator would come back empty
+        pairs = set(pairs)
+
+        templates = {}
+        for notification_type, channel in pairs:
+            template = self._template_cache.get(self._template_key(notification_type, channel))
+            if template is not None:
+                templates[(notification_type, channel)] = template
+
+        missing = pairs - templates.keys()
+        if not missing:
+            return templates
+
+        result = await db.execute(
+            select(NotificationTemplate)
+            .where(
+                and_(
+                    NotificationTemplate.type.in_({t.value for t, _ in missing}),
+                    NotificationTemplate.channel.in_({c for _, c in missing}),
+                    NotificationTemplate.is_active == True
+                )
+            )
+        )
+        by_key = {(t.type, t.channel): t for t in result.scalars().all()}
+
+        for notification_type, channel in missing:
+            template = by_key.get((notification_type.value, channel))
+            if not template:
+                # Create default template if not exists
+                template = await self._create_default_template(db, notification_type, channel)
+            self._template_cache.put(self._template_key(notification_type, channel), template)
+            templates[(notification_type, channel)] = template
+
+        return templates
+
     async def _create_default_template(
         self,
         db: AsyncSession,
@@ -109,34 +252,7 @@ class NotificationService(BaseService[Notification, NotificationCreate, Notifica
     ) -> NotificationTemplate:
         """Create default notification template"""
 
-        templates = {
-            NotificationType.TASK_REMINDER_3D: {
-                "title": "Task Reminder - 3 Days Left",
-                "message": "Task '{task_title}' is due in 3 days (Deadline: {deadline}). Don't forget to complete it!"
-            },
-            NotificationType.TASK_REMINDER_1D: {
-                "title": "Task Reminder - 1 Day Left",
-                "message": "Task '{task_title}' is due tomorrow (Deadline: {deadline}). Time to finish up!"
-            },
-            NotificationType.TASK_REMINDER_2H: {
-                "title": "Task Reminder - 2 Hours Left",
-                "message": "Task '{task_title}' is due in 2 hours (Deadline: {deadline}). Final reminder!"
-            },
-            NotificationType.TASK_COMPLETED: {
-                "title": "Task Completed",
-                "message": "Task '{task_title}' has been marked as completed. Great job!"
-            },
-            NotificationType.TASK_CANCELLED: {
-                "title": "Task Cancelled",
-                "message": "Task '{task_title}' has been cancelled by the sponsor."
-            },
-            NotificationType.NEW_MESSAGE: {
-                "title": "New Message",
-                "message": "New message in task '{task_title}' from {sender_name}: {message_preview}"
-            }
-        }
-
-        template_data = templates.get(notification_type)
+        template_data = _DEFAULT_TEMPLATES.get(notification_type)
         if not template_data:
             raise ValidationError(f"No default template for {notification_type}")
 
@@ -145,7 +261,7 @@ class NotificationService(BaseService[Notification, NotificationCreate, Notifica
             channel=channel,
             title_template=template_data["title"],
             message_template=template_data["message"],
-            variables=json.dumps(["task_title", "deadline", "sender_name", "message_preview"]),
+            variables=_DEFAULT_TEMPLATE_VARIABLES_JSON,
             is_active=True
         )
 
@@ -164,41 +280,66 @@ class NotificationService(BaseService[Notification, NotificationCreate, Notifica
     ) -> tuple[str, str]:
         """Generate notification title and message from template"""
 
-        # Prepare template variables
+        # Prepare template variables (task deadlines are Unix timestamps)
+        deadline = task.deadline
+        if isinstance(deadline, int):
+            deadline = datetime.fromtimestamp(deadline)
         variables = {
             "task_title": task.title,
-            "deadline": task.deadline.strftime("%Y-%m-%d %H:%M") if task.deadline else "No deadline",
+            "deadline": deadline.strftime("%Y-%m-%d %H:%M") if deadline else "No deadline",
             "task_id": task.id,
             **kwargs
         }
 
         # Format title and message
-        title = template.title_template.format(**variables)
-        message = template.message_template.format(**variables)
+        title = template.title_template.format_map(variables)
+        message = template.message_template.format_map(variables)
 
         return title, message
 
+    @staticmethod
+    def _due_clause():
+        """Pending rows ready to send; matches the ix_notifications_pending_due index"""
+        return and_(
+            Notification.status == "pending",
+            Notification.scheduled_at <= datetime.utcnow(),
+            Notification.retry_count < Notification.max_retries
+        )
+
+    async def has_due_notifications(self, db: AsyncSession) -> bool:
+        """Cheap probe for any notification ready to be sent"""
+        result = await db.execute(select(exists().where(self._due_clause())))
+        return bool(result.scalar())
+
     async def get_pending_notifications(
         self,
         db: AsyncSession,
         channel: Optional[str] = None,
         limit: int = 100
     ) -> List[Notification]:
-        """Get pending notifications ready to be sent"""
-
-        query = select(Notification).options(
-            selectinload(Notification.user),
-            selectinload(Notification.task)
-        ).where(
-            and_(
-                Notification.status == "pending",
-                Notification.scheduled_at <= datetime.utcnow(),
-                Notification.retry_count < Notification.max_retries
-            )
+        """Get pending notifications ready to be sent
+
+        For the Telegram channel only rows whose user has a bound chat with
+        notifications enabled are returned.
+        """
+
+        # Many-to-one: join user and task into the same query
+        query = (
+            select(Notification)
+            .join(Notification.user)
+            .options(contains_eager(Notification.user), joinedload(Notification.task))
+            .where(self._due_clause())
         )
 
         if channel:
             query = query.where(Notification.channel == channel)
+        if channel == NotificationChannel.TELEGRAM:
+            # Rows for users who cannot receive them are never loaded;
+            # fail_undeliverable_telegram_notifications records those in bulk
+            query = query.where(
+                User.telegram_chat_id.isnot(None),
+                User.telegram_notifications_enabled.is_(True)
+            )
 
         query = query.limit(limit).order_by(Notification.scheduled_at)
 
@@ -225,10 +366,36 @@ class NotificationService(BaseService[Notification, NotificationCreate, Notifica
             update(Notification)
             .where(Notification.id == notification_id)
             .values(**update_data)
+            .returning(Notification.id)
         )
+        updated = result.scalar_one_or_none() is not None
 
         await db.commit()
-        return result.rowcount > 0
+        return updated
+
+    async def mark_notifications_sent(
+        self,
+        db: AsyncSession,
+        delivery_ids: Dict[int, str]
+    ) -> int:
+        """Mark several notifications sent in one UPDATE; maps notification id to delivery id"""
+        if not delivery_ids:
+            return 0
+
+        result = await db.execute(
+            update(Notification)
+            .where(Notification.id.in_(list(delivery_ids)))
+            .values(
+                status="sent",
+                sent_at=datetime.utcnow(),
+                delivery_id=case(delivery_ids, value=Notification.id)
+            )
+            .returning(Notification.id)
+        )
+        updated = len(result.scalars().all())
+
+        await db.commit()
+        return updated
 
     async def mark_notification_failed(
         self,
@@ -236,20 +403,85 @@ class NotificationService(BaseService[Notification, NotificationCreate, Notifica
         notification_id: int,
         error_message: str
     ) -> bool:
-        """Mark notification as failed and increment retry count"""
+        """Record a failed delivery; the notification stays pending until retries run out"""
+
+        return await self.mark_notifications_failed(db, [notification_id], error_message) == 1
+
+    async def mark_notifications_failed(
+        self,
+        db: AsyncSession,
+        notification_ids: Iterable[int],
+        error_message: str
+    ) -> int:
+        """Record the same failed delivery for several notifications in one UPDATE"""
+        notification_ids = list(notification_ids)
+        if not notification_ids:
+            return 0
 
         result = await db.execute(
             update(Notification)
-            .where(Notification.id == notification_id)
-            .values(
-                status="failed",
-                error_message=error_message,
-                retry_count=Notification.retry_count + 1
+            .where(Notification.id.in_(notification_ids))
+            .values(self._failed_attempt_values(error_message))
+            .returning(Notification.id)
+        )
+        updated = len(result.scalars().all())
+
+        await db.commit()
+        return updated
+
+    async def fail_undeliverable_telegram_notifications(self, db: AsyncSession) -> int:
+        """Record a failed attempt for due Telegram rows whose user cannot receive them
+
+        Done in one UPDATE instead of loading the rows; retries count exactly
+        as in mark_notifications_failed, so a user who binds or re-enables
+        Telegram before max_retries still gets the message.
+        """
+        chat_id = (
+            select(User.telegram_chat_id)
+            .where(User.id == Notification.user_id)
+            .scalar_subquery()
+        )
+        values = self._failed_attempt_values(
+            case(
+                (chat_id.is_(None), "User has no Telegram chat ID"),
+                else_="User has Telegram notifications disabled"
             )
         )
 
+        result = await db.execute(
+            update(Notification)
+            .where(
+                self._due_clause(),
+                Notification.channel == NotificationChannel.TELEGRAM,
+                Notification.user_id.in_(
+                    select(User.id).where(
+                        or_(
+                            User.telegram_chat_id.is_(None),
+                            User.telegram_notifications_enabled.is_(False)
+                        )
+                    )
+                )
+            )
+            .values(values)
+            .returning(Notification.id)
+        )
+        updated = len(result.scalars().all())
+
         await db.commit()
-        return result.rowcount > 0
+        return updated
+
+    @staticmethod
+    def _failed_attempt_values(error_message: Any) -> Dict[str, Any]:
+        """UPDATE values recording one failed delivery attempt"""
+        return {
+            # Decided in the UPDATE itself so concurrent failures cannot race
+            "status": case(
+                (Notification.retry_count + 1 >= Notification.max_retries, "failed"),
+                else_="pending"
+            ),
+            "error_message": error_message,
+            "retry_count": Notification.retry_count + 1
+        }
 
     async def get_user_notifications(
         self,
@@ -261,24 +493,29 @@ class NotificationService(BaseService[Notification, NotificationCreate, Notifica
     ) -> tuple[List[Notification], int]:
         """Get user notifications with pagination"""
 
-        query = select(Notification).options(
-            selectinload(Notification.task)
-        ).where(Notification.user_id == user_id)
+        filters = [Notification.user_id == user_id]
 
         if status:
             # Convert enum to string value if needed
             status_value = status.value if hasattr(status, 'value') else status
-            query = query.where(Notification.status == status_value)
+            filters.append(Notification.status == status_value)
 
         # Count total
         count_result = await db.execute(
-            select(Notification).where(Notification.user_id == user_id)
+            select(func.count()).select_from(Notification).where(*filters)
         )
-        total = len(count_result.scalars().all())
+        total = count_result.scalar_one()
 
         # Get paginated results
         offset = (page - 1) * size
-        query = query.offset(offset).limit(size).order_by(Notification.created_at.desc())
+        query = (
+            select(Notification)
+            .options(selectinload(Notification.task))
+            .where(*filters)
+            .order_by(Notification.created_at.desc())
+            .offset(offset)
+            .limit(size)
+        )
 
         result = await db.execute(query)
         notifications = result.scalars().all()
@@ -306,12 +543,40 @@ class UserNotificationPreferenceService(BaseService[UserNotificationPreference,
         preferences = result.scalar_one_or_none()
 
         if not preferences:
-            # Create default preferences
-            preferences_data = UserNotificationPreferenceCreate(user_id=user_id)
+            # Create default preferences (internal path, defaults need no validation)
+            preferences_data = UserNotificationPreferenceCreate.model_construct(user_id=user_id)
             preferences = await self.create(db, preferences_data)
 
         return preferences
 
+    async def get_users_preferences(
+        self,
+        db: AsyncSession,
+        user_ids: Iterable[int]
+    ) -> Dict[int, UserNotificationPreference]:
+        """Get preferences for several users in one query, creating missing defaults"""
+
+        user_ids = set(user_ids)
+        if not user_ids:
+            return {}
+
+        result = await db.execute(
+            select(UserNotificationPreference)
+            .where(UserNotificationPreference.user_id.in_(user_ids))
+        )
+        preferences = {p.user_id: p for p in result.scalars().all()}
+
+        missing = [
+            UserNotificationPreference(user_id=user_id)
+            for user_id in user_ids - preferences.keys()
+        ]
+        if missing:
+            db.add_all(missing)
+            await db.commit()
+            preferences.update((p.user_id, p) for p in missing)
+
+        return preferences
+
     async def update_user_preferences(
         self,
         db: AsyncSession,
@@ -320,23 +585,41 @@ class UserNotificationPreferenceService(BaseService[UserNotificationPreference,
     ) -> UserNotificationPreference:
         """Update user notification preferences"""
 
-        preferences = await self.get_user_preferences(db, user_id)
-
         update_data = preferences_update.model_dump(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(preferences, field, value)
+        if not update_data:
+            return await self.get_user_preferences(db, user_id)
 
-        await db.commit()
-        await db.refresh(preferences)
+        # Update and read back the row in one round trip
+        result = await db.execute(
+            update(UserNotificationPreference)
+            .where(UserNotificationPreference.user_id == user_id)
+            .values(**update_data)
+            .returning(UserNotificationPreference)
+            .execution_options(populate_existing=True)
+        )
+        preferences = result.scalar_one_or_none()
 
+        if preferences is None:
+            # No stored preferences yet: create the defaults with the update applied
+            preferences = UserNotificationPreference(user_id=user_id, **update_data)
+            db.add(preferences)
+            await db.commit()
+            await db.refresh(preferences)
+            return preferences
+
+        await db.commit()
         return preferences
 
 
 class TaskReminderScheduler:
     """Service for scheduling task reminders"""
 
-    async def schedule_task_reminders(self, db: AsyncSession, task_id: int):
-        """Schedule all reminders for a task"""
+    async def schedule_task_reminders(self, db: AsyncSession, task_id: int, user_id: Optional[int] = None):
+        """Schedule all reminders for a task, or only one user's when user_id is given
+
+        The single-user form is for someone joining a task that was already
+        scanned; it leaves reminder_scheduled_at untouched.
+        """
         # Get task with todos
         task_result = await db.execute(
             select(Task).options(
@@ -348,103 +631,132 @@ class TaskReminderScheduler:
         if not task or not task.deadline:
             return
 
-        # Schedule reminders for each user who joined the task
-        for todo in task.todos:
-            if not todo.is_active:
-                continue
+        todos = [
+            todo for todo in task.todos
+            if todo.is_active and (user_id is None or todo.user_id == user_id)
+        ]
+        if not todos:
+            # Nobody to remind yet: leave the task for a later scan
+            return
 
-            await self._schedule_user_task_reminders(db, todo.user, task, todo)
+        # Preferences for every user who joined the task, in one query
+        preferences = await user_notification_preference_service.get_users_preferences(
+            db, {todo.user_id for todo in todos}
+        )
 
-    async def _schedule_user_task_reminders(
-        self,
-        db: AsyncSession,
-        user: User,
-        task: Task,
-        todo: Todo
-    ):
-        """Schedule reminders for a specific user and task"""
-        if not task.deadline:
+        # Collect (user_id, type, scheduled_at, channel) for each user who joined the task
+        reminders = []
+        for todo in todos:
+            reminders.extend(
+                self._schedule_user_task_reminders(todo.user, task, todo, preferences[todo.user_id])
+            )
+
+        if not reminders:
+            if user_id is None:
+                task.reminder_scheduled_at = datetime.utcnow()
+                await db.commit()
             return
 
-        # Get user preferences
-        preferences = await user_notification_preference_service.get_user_preferences(db, user.id)
+        # One template query, then a single multi-row INSERT
+        templates = await notification_service.get_notification_templates(
+            db, {(reminder_type, channel) for _, reminder_type, _, channel in reminders}
+        )
 
-        # Parse remind_flags from todo
-        remind_flags = json.loads(todo.remind_flags) if todo.remind_flags else {}
+        # Content depends only on the task and template: render each pair once
+        contents = {
+            key: notification_service._generate_notification_content(template, task, key[0])
+            for key, template in templates.items()
+        }
 
-        # Schedule 3-day reminder
-        if (remind_flags.get("t_3d", True) and
-            preferences.task_reminder_3d_enabled):
+        rows = []
+        for recipient_id, reminder_type, scheduled_at, channel in reminders:
+            title, message = contents[(reminder_type, channel)]
+            rows.append({
+                "user_id": recipient_id,
+                "task_id": task.id,
+                "type": reminder_type.value,
+                "channel": channel,
+                "title": title,
+                "message": message,
+                "scheduled_at": scheduled_at
+            })
+
+        # Committed with the reminders so a task is never marked without them
+        if user_id is None:
+            task.reminder_scheduled_at = datetime.utcnow()
+        await db.execute(insert(Notification), rows)
+        await db.commit()
+        _wake_scheduler_if_due(min(row["scheduled_at"] for row in rows))
+
+    async def reset_task_reminders(self, db: AsyncSession, task: Task):
+        """Drop a task's pending reminders and queue it for the next scan
+
+        Used when the deadline moves. Nothing is committed here, so the
+        reset lands in the caller's transaction with the deadline change.
+        """
+        await db.execute(
+            delete(Notification).where(
+                Notification.task_id == task.id,
+                Notification.status == NotificationStatus.PENDING.value,
+                Notification.type.in_([spec[2].value for spec in _REMINDER_SPECS])
+            )
+        )
+        task.reminder_scheduled_at = None
 
-            reminder_timestamp = task.deadline - (3 * 24 * 3600)  # 3 days in seconds
-            current_timestamp = int(datetime.utcnow().timestamp())
-            if reminder_timestamp > current_timestamp:
-                reminder_time = datetime.fromtimestamp(reminder_timestamp)
-                await self._create_reminder(
-                    db, user.id, task.id,
-                    NotificationType.TASK_REMINDER_3D,
-                    reminder_time, preferences
-                )
+    def _schedule_user_task_reminders(
+        self,
+        user: User,
+        task: Task,
+        todo: Todo,
+        preferences: UserNotificationPreference
+    ) -> List[Tuple[int, NotificationType, datetime, str]]:
+        """Work out the reminders due for a specific user and task"""
+        if not task.deadline:
+            return []
 
-        # Schedule 1-day reminder
-        if (remind_flags.get("t_1d", True) and
-            preferences.task_reminder_1d_enabled):
+        # Stored flags only take a handful of distinct values: parse each once
+        mask = _flags_mask(todo.remind_flags)
 
-            reminder_timestamp = task.deadline - (1 * 24 * 3600)  # 1 day in seconds
-            current_timestamp = int(datetime.utcnow().timestamp())
-            if reminder_timestamp > current_timestamp:
-                reminder_time = datetime.fromtimestamp(reminder_timestamp)
-                await self._create_reminder(
-                    db, user.id, task.id,
-                    NotificationType.TASK_REMINDER_1D,
-                    reminder_time, preferences
-                )
+        reminders = []
+        current_timestamp = int(datetime.utcnow().timestamp())
 
-        # Schedule 2-hour reminder
-        if (remind_flags.get("ddl_2h", True) and
-            preferences.task_reminder_2h_enabled):
+        for bit, offset, reminder_type, pref_attr in _REMINDER_SPECS:
+            if not (mask & bit and getattr(preferences, pref_attr)):
+                continue
 
-            reminder_timestamp = task.deadline - (2 * 3600)  # 2 hours in seconds
-            current_timestamp = int(datetime.utcnow().timestamp())
+            reminder_timestamp = task.deadline - offset
             if reminder_timestamp > current_timestamp:
-                reminder_time = datetime.fromtimestamp(reminder_timestamp)
-                await self._create_reminder(
-                    db, user.id, task.id,
-                    NotificationType.TASK_REMINDER_2H,
-                    reminder_time, preferences
-                )
+                reminders.extend(self._create_reminder(
+                    user.id, reminder_type,
+                    datetime.fromtimestamp(reminder_timestamp), preferences
+                ))
+
+        return reminders
 
-    async def _create_reminder(
+    def _create_reminder(
         self,
-        db: AsyncSession,
         user_id: int,
-        task_id: int,
         reminder_type: NotificationType,
         scheduled_at: datetime,
         preferences: UserNotificationPreference
-    ):
-        """Create reminder notifications for enabled channels"""
+    ) -> List[Tuple[int, NotificationType, datetime, str]]:
+        """List the reminder notifications for enabled channels"""
 
-        # Create Telegram reminder if enabled
+        channels = []
+
+        # Telegram reminder if enabled
         if preferences.telegram_enabled:
-            await notification_service.create_task_reminder(
-                db, user_id, task_id, reminder_type, scheduled_at,
-                "telegram"
-            )
+            channels.append("telegram")
 
-        # Create WebSocket reminder if enabled
+        # WebSocket reminder if enabled
         if preferences.websocket_enabled:
-            await notification_service.create_task_reminder(
-                db, user_id, task_id, reminder_type, scheduled_at,
-                "websocket"
-            )
+            channels.append("websocket")
 
-        # Create Email reminder if enabled
+        # Email reminder if enabled
         if preferences.email_enabled:
-            await notification_service.create_task_reminder(
-                db, user_id, task_id, reminder_type, scheduled_at,
-                "email"
-            )
+            channels.append("email")
+
+        return [(user_id, reminder_type, scheduled_at, channel) for channel in channels]
 
 
 # Service instances
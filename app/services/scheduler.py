@@ -3,6 +3,7 @@
 """
 import asyncio
 import logging
+import random
 from datetime import datetime, timedelta
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -15,89 +16,153 @@ from app.services.websocket import websocket_notification_sender
 logger = logging.getLogger(__name__)
 
 
-class NotificationScheduler:
-    """通知调度器"""
-
-    def __init__(self):
-        self.running = False
-        self.task: Optional[asyncio.Task] = None
+class _ScheduledJob:
+    """调度任务基类：跨轮询复用同一个会话对象"""
 
-    async def start(self):
-        """启动调度器"""
-        if self.running:
-            logger.warning("Notification scheduler is already running")
-            return
-
-        self.running = True
-        self.task = asyncio.create_task(self._run_scheduler())
-        logger.info("Notification scheduler started")
+    POLL_INTERVAL_SECONDS: float
+    # 连续出错时的退避上限
+    ERROR_BACKOFF_SECONDS: float
+    # 出错后首次重试的间隔，之后每次翻倍
+    RETRY_INITIAL_SECONDS = 1.0
 
-    async def stop(self):
-        """停止调度器"""
-        if not self.running:
-            return
+    def __init__(self):
+        self._session: Optional[AsyncSession] = None
+        self._backoff = self.RETRY_INITIAL_SECONDS
+
+    def _next_delay(self, failed: bool) -> float:
+        """下次运行前的等待时间：成功按轮询间隔，连续失败按指数退避（±20%抖动）"""
+        if not failed:
+            self._backoff = self.RETRY_INITIAL_SECONDS
+            return self.POLL_INTERVAL_SECONDS
+
+        delay = self._backoff * random.uniform(0.8, 1.2)
+        self._backoff = min(self._backoff * 2, self.ERROR_BACKOFF_SECONDS)
+        return delay
+
+    def _get_session(self) -> AsyncSession:
+        """获取本任务的会话，首次使用时创建"""
+        if self._session is None:
+            from app.core.database import AsyncSessionLocal
+            self._session = AsyncSessionLocal()
+        return self._session
+
+    async def aclose(self):
+        """关闭复用的会话"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class NotificationScheduler(_ScheduledJob):
+    """通知调度器"""
 
-        self.running = False
-        if self.task:
-            self.task.cancel()
-            try:
-                await self.task
-            except asyncio.CancelledError:
-                pass
+    # 兜底轮询间隔；新的到期通知通过wakeup()立即触发处理
+    POLL_INTERVAL_SECONDS = 30
+    # 出错时最长等待1分钟
+    ERROR_BACKOFF_SECONDS = 60
 
-        logger.info("Notification scheduler stopped")
+    def __init__(self):
+        super().__init__()
+        self._wakeup = asyncio.Event()
 
-    async def _run_scheduler(self):
-        """运行调度器主循环"""
-        while self.running:
-            try:
-                await self._process_notifications()
-                # 每30秒检查一次
-                await asyncio.sleep(30)
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.error(f"Error in notification scheduler: {e}")
-                await asyncio.sleep(60)  # 出错时等待更长时间
+    def wakeup(self):
+        """唤醒调度器立即处理待发送通知"""
+        self._wakeup.set()
 
     async def _process_notifications(self):
         """处理待发送的通知"""
-        from app.core.database import AsyncSessionLocal
+        db = self._get_session()
+        try:
+            # 空闲时只做一次轻量探测，不再逐个通道拉取
+            if not await notification_service.has_due_notifications(db):
+                return
 
-        async with AsyncSessionLocal() as db:
-            try:
-                # 发送Telegram通知
-                await telegram_notification_sender.send_pending_notifications(db)
+            # 发送Telegram通知
+            await telegram_notification_sender.send_pending_notifications(db)
 
-                # 发送WebSocket通知
-                await websocket_notification_sender.send_pending_notifications(db)
+            # 发送WebSocket通知
+            await websocket_notification_sender.send_pending_notifications(db)
 
-                # logger.debug("Processed pending notifications")  # 减少日志输出
+            # logger.debug("Processed pending notifications")  # 减少日志输出
 
-            except Exception as e:
-                logger.error(f"Error processing notifications: {e}")
-                await db.rollback()
+        except Exception:
+            # 由调度循环记录错误并退避
+            await db.rollback()
+            raise
+        finally:
+            # 归还连接并清空身份映射（expire_on_commit=False），下次轮询读到最新数据
+            await db.close()
 
 
-class TaskReminderSchedulerService:
+class TaskReminderSchedulerService(_ScheduledJob):
     """任务提醒调度服务"""
 
+    # 每小时检查一次
+    POLL_INTERVAL_SECONDS = 3600
+    # 出错时最长等待30分钟
+    ERROR_BACKOFF_SECONDS = 1800
+
+    async def _schedule_upcoming_reminders(self):
+        """为即将到期的任务安排提醒"""
+        from sqlalchemy import select, exists
+        from app.models.task import Task, Todo
+
+        db = self._get_session()
+        try:
+            # 查找未来7天内到期且尚未安排提醒的任务，只取ID（走 status, deadline 索引）
+            now_timestamp = int(datetime.utcnow().timestamp())
+            future_timestamp = now_timestamp + (7 * 24 * 3600)  # 7 days in seconds
+
+            # 没有参与者的任务不会被标记，在SQL中直接排除，避免每小时逐个加载后空跑
+            has_active_todo = exists().where(Todo.task_id == Task.id, Todo.is_active.is_(True))
+            result = await db.execute(
+                select(Task.id).where(
+                    Task.status == "active",
+                    Task.deadline.between(now_timestamp, future_timestamp),
+                    Task.reminder_scheduled_at.is_(None),
+                    has_active_todo
+                ).order_by(Task.deadline)
+            )
+            task_ids = result.scalars().all()
+
+            # 共用一个会话且每个任务单独提交，因此逐个处理
+            for task_id in task_ids:
+                await task_reminder_scheduler.schedule_task_reminders(db, task_id)
+
+            # 只在有任务时才记录日志
+            if task_ids:
+                logger.info(f"Scheduled reminders for {len(task_ids)} upcoming tasks")
+
+        except Exception:
+            # 由调度循环记录错误并退避
+            await db.rollback()
+            raise
+        finally:
+            # 归还连接并清空身份映射（expire_on_commit=False），下次轮询读到最新数据
+            await db.close()
+
+
+class SchedulerManager:
+    """调度器管理器：一个协程按各自的到期时间驱动所有调度任务"""
+
     def __init__(self):
+        self.notification_scheduler = NotificationScheduler()
+        self.task_reminder_scheduler = TaskReminderSchedulerService()
         self.running = False
         self.task: Optional[asyncio.Task] = None
 
-    async def start(self):
-        """启动任务提醒调度器"""
+    async def start_all(self):
+        """启动所有调度器"""
         if self.running:
-            logger.warning("Task reminder scheduler is already running")
+            logger.warning("Schedulers are already running")
             return
 
         self.running = True
-        self.task = asyncio.create_task(self._run_scheduler())
-        logger.info("Task reminder scheduler started")
+        self.task = asyncio.create_task(self._tick_loop())
+        logger.info("All schedulers started")
 
-    async def stop(self):
-        """停止任务提醒调度器"""
+    async def stop_all(self):
+        """停止所有调度器"""
         if not self.running:
             return
 
@@ -109,71 +174,49 @@ class TaskReminderSchedulerService:
             except asyncio.CancelledError:
                 pass
 
-        logger.info("Task reminder scheduler stopped")
+        await self.notification_scheduler.aclose()
+        await self.task_reminder_scheduler.aclose()
+        logger.info("All schedulers stopped")
 
-    async def _run_scheduler(self):
+    async def _tick_loop(self):
         """运行调度器主循环"""
+        loop = asyncio.get_running_loop()
+        notifications = self.notification_scheduler
+        reminders = self.task_reminder_scheduler
+        wakeup = notifications._wakeup
+        # 各任务的下一次到期时间（单调时钟）
+        next_notification_due = next_reminder_due = loop.time()
+
         while self.running:
             try:
-                await self._schedule_upcoming_reminders()
-                # 每小时检查一次
-                await asyncio.sleep(3600)
+                if wakeup.is_set() or loop.time() >= next_notification_due:
+                    # 先清除再处理，处理期间到来的唤醒不会丢失
+                    wakeup.clear()
+                    failed = False
+                    try:
+                        await notifications._process_notifications()
+                    except Exception as e:
+                        logger.error(f"Error processing notifications: {e}")
+                        failed = True
+                    next_notification_due = loop.time() + notifications._next_delay(failed)
+
+                if loop.time() >= next_reminder_due:
+                    failed = False
+                    try:
+                        await reminders._schedule_upcoming_reminders()
+                    except Exception as e:
+                        logger.error(f"Error scheduling task reminders: {e}")
+                        failed = True
+                    next_reminder_due = loop.time() + reminders._next_delay(failed)
+
+                timeout = min(next_notification_due, next_reminder_due) - loop.time()
+                if timeout > 0 and not wakeup.is_set():
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        pass
             except asyncio.CancelledError:
                 break
-            except Exception as e:
-                logger.error(f"Error in task reminder scheduler: {e}")
-                await asyncio.sleep(1800)  # 出错时等待30分钟
-
-    async def _schedule_upcoming_reminders(self):
-        """为即将到期的任务安排提醒"""
-        from app.core.database import AsyncSessionLocal
-        from sqlalchemy import select
-        from app.models.task import Task
-
-        async with AsyncSessionLocal() as db:
-            try:
-                # 查找未来7天内到期的任务
-                future_timestamp = int(datetime.utcnow().timestamp()) + (7 * 24 * 3600)  # 7 days in seconds
-
-                result = await db.execute(
-                    select(Task).where(
-                        Task.deadline.isnot(None),
-                        Task.deadline <= future_timestamp,
-                        Task.status == "active"
-                    )
-                )
-                tasks = result.scalars().all()
-
-                for task in tasks:
-                    await task_reminder_scheduler.schedule_task_reminders(db, task.id)
-
-                # 只在有任务时才记录日志
-                if tasks:
-                    logger.info(f"Scheduled reminders for {len(tasks)} upcoming tasks")
-
-            except Exception as e:
-                logger.error(f"Error scheduling task reminders: {e}")
-                await db.rollback()
-
-
-class SchedulerManager:
-    """调度器管理器"""
-
-    def __init__(self):
-        self.notification_scheduler = NotificationScheduler()
-        self.task_reminder_scheduler = TaskReminderSchedulerService()
-
-    async def start_all(self):
-        """启动所有调度器"""
-        await self.notification_scheduler.start()
-        await self.task_reminder_scheduler.start()
-        logger.info("All schedulers started")
-
-    async def stop_all(self):
-        """停止所有调度器"""
-        await self.notification_scheduler.stop()
-        await self.task_reminder_scheduler.stop()
-        logger.info("All schedulers stopped")
 
 
 # 全局调度器实例
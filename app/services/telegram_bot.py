@@ -1,30 +1,105 @@
 """
-Telegram Bot service for sending notifications
+Telegram Bot service: account binding commands and notification delivery
 """
 import asyncio
 import logging
-from typing import Optional, Dict, Any
+import time
+import httpx
+from collections import defaultdict
+from typing import Optional, Dict, Any, List, Tuple
 from telegram import Bot, Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
-from telegram.error import TelegramError
 from sqlalchemy.ext.asyncio import AsyncSession
+# Aliased: the command handlers' `update` parameter shadows the SQL construct
+from sqlalchemy import update as sql_update, select
 
 from app.core.config import settings
 from app.models.user import User
-from app.models.notification import Notification, NotificationChannel
+from app.models.notification import Notification
 from app.services.notification import notification_service
-from app.core.database import get_db
+from app.core.performance import LRUCache
 
 logger = logging.getLogger(__name__)
 
 
+class _RetryAfter(Exception):
+    """Telegram answered 429 and asked us to wait"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _TokenBucket:
+    """Paces callers to `rate` acquisitions per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        """Take a token, sleeping until it has been refilled if the bucket is empty"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        # A negative balance reserves a future token; each caller waits for its own
+        self._tokens -= 1
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+
+
 class TelegramBotService:
     """Service for managing Telegram Bot interactions"""
 
+    # Bot API endpoint used for notification delivery; PTB handles only commands
+    API_URL = "https://api.telegram.org/bot{token}/sendMessage"
+    # In-flight sendMessage calls
+    MAX_CONCURRENT_SENDS = 20
+    # Telegram allows ~30 messages/s per bot and ~1 message/s per chat
+    GLOBAL_SENDS_PER_SECOND = 30
+    CHAT_SEND_INTERVAL_SECONDS = 1.0
+    # Bound account per chat for /status; bindings changed through the API
+    # are picked up once the entry expires
+    CHAT_CACHE_SIZE = 10_000
+    CHAT_CACHE_TTL_SECONDS = 60
+
     def __init__(self):
         self.bot: Optional[Bot] = None
         self.application: Optional[Application] = None
         self._initialized = False
+        # Keep-alive client reused by every notification send
+        self._http: Optional[httpx.AsyncClient] = None
+        self._send_message_url: Optional[str] = None
+        self._send_semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_SENDS)
+        self._rate_bucket = _TokenBucket(self.GLOBAL_SENDS_PER_SECOND, self.GLOBAL_SENDS_PER_SECOND)
+        # chat_id -> earliest monotonic time the next message to that chat may go out
+        self._chat_slots = LRUCache(max_size=10_000, ttl_seconds=60)
+        # chat_id -> (user_id, nickname, notifications_enabled)
+        self._chat_cache = LRUCache(
+            max_size=self.CHAT_CACHE_SIZE,
+            ttl_seconds=self.CHAT_CACHE_TTL_SECONDS
+        )
+
+    async def _get_bound_user(self, db: AsyncSession, chat_id: str) -> Optional[Tuple[int, str, bool]]:
+        """Look up the account bound to a chat, reusing recent lookups"""
+        cached = self._chat_cache.get(chat_id)
+        if cached is not None:
+            return cached
+
+        result = await db.execute(
+            select(User.id, User.nickname, User.telegram_notifications_enabled)
+            .where(User.telegram_chat_id == chat_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            # Unbound chats are not cached so a bind elsewhere shows up at once
+            return None
+
+        bound = (row.id, row.nickname, row.telegram_notifications_enabled)
+        self._chat_cache.put(chat_id, bound)
+        return bound
 
     async def initialize(self):
         """Initialize Telegram Bot"""
@@ -35,6 +110,13 @@ class TelegramBotService:
         try:
             self.bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
             self.application = Application.builder().token(settings.TELEGRAM_BOT_TOKEN).build()
+            self._send_message_url = self.API_URL.format(token=settings.TELEGRAM_BOT_TOKEN)
+            self._http = httpx.AsyncClient(
+                timeout=10.0,
+                limits=httpx.Limits(
+                    max_connections=30, max_keepalive_connections=30, keepalive_expiry=75
+                )
+            )
 
             # Add command handlers
             self.application.add_handler(CommandHandler("start", self.start_command))
@@ -61,6 +143,19 @@ class TelegramBotService:
         if self.application:
             await self.application.initialize()
             await self.application.start()
+
+            if settings.TELEGRAM_WEBHOOK_URL and not settings.TELEGRAM_WEBHOOK_SECRET:
+                logger.warning("TELEGRAM_WEBHOOK_SECRET not configured, falling back to polling")
+            elif settings.TELEGRAM_WEBHOOK_URL:
+                # Telegram pushes updates to the webhook route; no polling task
+                await self.bot.set_webhook(
+                    url=settings.TELEGRAM_WEBHOOK_URL,
+                    secret_token=settings.TELEGRAM_WEBHOOK_SECRET,
+                    drop_pending_updates=True
+                )
+                logger.info("Telegram Bot started with webhook")
+                return
+
             # Clear any pending updates first
             try:
                 await self.bot.get_updates(offset=-1, limit=1)
@@ -73,14 +168,28 @@ class TelegramBotService:
             )
             logger.info("Telegram Bot started with polling")
 
+    async def process_webhook_update(self, data: Dict[str, Any]) -> bool:
+        """Queue an update pushed to the webhook; False if the bot is not running"""
+        if not self.application or not self.application.running:
+            return False
+
+        await self.application.update_queue.put(Update.de_json(data, self.application.bot))
+        return True
+
     async def stop_bot(self):
         """Stop the Telegram Bot"""
         if self.application:
-            # Stop polling
-            await self.application.updater.stop()
+            # Stop polling (not running in webhook mode)
+            if self.application.updater and self.application.updater.running:
+                await self.application.updater.stop()
             await self.application.stop()
             await self.application.shutdown()
             logger.info("Telegram Bot stopped")
+        if self._http:
+            await self._http.aclose()
+            self._http = None
+        # The sender checks this once per pass instead of per message
+        self._initialized = False
 
     async def send_notification(
         self,
@@ -90,42 +199,109 @@ class TelegramBotService:
         notification_id: Optional[int] = None
     ) -> Optional[str]:
         """Send notification message to Telegram chat"""
-        if not self.bot:
+        if not self._http:
             logger.error("Telegram Bot not initialized")
             return None
 
+        return await self._send_text(chat_id, self._format_notification(title, message))
+
+    async def send_notification_broadcast(
+        self,
+        chat_ids: List[str],
+        title: str,
+        message: str
+    ) -> List[Optional[str]]:
+        """Send one notification to many chats; returns delivery ids in chat_ids order"""
+        if not self._http:
+            logger.error("Telegram Bot not initialized")
+            return [None] * len(chat_ids)
+
+        # Formatted once for the whole group
+        full_message = self._format_notification(title, message)
+        return list(await asyncio.gather(
+            *(self._send_text(chat_id, full_message) for chat_id in chat_ids)
+        ))
+
+    @staticmethod
+    def _format_notification(title: str, message: str) -> str:
+        """Plain-text body for a notification
+
+        Sent without parse_mode: user-supplied titles containing `_`, `*` or
+        `[` would otherwise be rejected by Telegram's Markdown parser.
+        """
+        return f"🔔 {title}\n\n{message}"
+
+    async def _send_text(self, chat_id: str, text: str) -> Optional[str]:
+        """Send a formatted message within Telegram's rate limits; returns the message_id"""
         try:
-            # Format message
-            full_message = f"🔔 *{title}*\n\n{message}"
-
-            # Send message
-            telegram_message = await self.bot.send_message(
-                chat_id=chat_id,
-                text=full_message,
-                parse_mode='Markdown'
-            )
+            try:
+                message_id = await self._send_paced(chat_id, text)
+            except _RetryAfter as e:
+                # Back off for as long as Telegram asked, then retry once
+                logger.warning(f"Telegram rate limit for chat {chat_id}, retrying in {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+                message_id = await self._send_paced(chat_id, text)
+
+            if message_id is None:
+                return None
 
-            logger.info(f"Notification sent to chat {chat_id}, message_id: {telegram_message.message_id}")
-            return str(telegram_message.message_id)
+            logger.info(f"Notification sent to chat {chat_id}, message_id: {message_id}")
+            return message_id
 
-        except TelegramError as e:
+        except _RetryAfter as e:
+            logger.error(f"Failed to send Telegram notification to {chat_id}: still rate limited ({e})")
+            return None
+        except httpx.HTTPError as e:
             logger.error(f"Failed to send Telegram notification to {chat_id}: {e}")
             return None
         except Exception as e:
             logger.error(f"Unexpected error sending Telegram notification: {e}")
             return None
 
+    async def _send_paced(self, chat_id: str, text: str) -> Optional[str]:
+        """Wait for the chat's next slot and a global token, then send"""
+        await self._wait_for_chat_slot(chat_id)
+        await self._rate_bucket.acquire()
+        async with self._send_semaphore:
+            return await self._send_raw(chat_id, text)
+
+    async def _wait_for_chat_slot(self, chat_id: str) -> None:
+        """Space consecutive messages to one chat by CHAT_SEND_INTERVAL_SECONDS"""
+        now = time.monotonic()
+        slot = max(now, self._chat_slots.get(chat_id) or 0.0)
+        # Reserved before sleeping so concurrent sends to the chat queue up behind it
+        self._chat_slots.put(chat_id, slot + self.CHAT_SEND_INTERVAL_SECONDS)
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _send_raw(self, chat_id: str, text: str) -> Optional[str]:
+        """POST sendMessage on the pooled client; returns the message_id"""
+        response = await self._http.post(
+            self._send_message_url,
+            json={"chat_id": chat_id, "text": text}
+        )
+        body = response.json()
+        if not body.get("ok"):
+            retry_after = (body.get("parameters") or {}).get("retry_after")
+            if retry_after is not None:
+                raise _RetryAfter(retry_after)
+            logger.error(
+                f"Failed to send Telegram notification to {chat_id}: {body.get('description')}"
+            )
+            return None
+        return str(body["result"]["message_id"])
+
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
         welcome_message = (
-            "🎯 Welcome to BoutyGo Notification Bot!\n\n"
+            "🎯 Welcome to BountyGo Notification Bot!\n\n"
             "This bot will send you task reminders and updates.\n\n"
             "Available commands:\n"
             "/bind <user_id> - Bind your account\n"
             "/unbind - Unbind your account\n"
             "/status - Check binding status\n"
             "/help - Show this help message\n\n"
-            "To get started, use /bind command with your user ID from the BoutyGo app."
+            "To get started, use /bind command with your user ID from the BountyGo app."
         )
 
         await update.message.reply_text(welcome_message)
@@ -134,66 +310,181 @@ class TelegramBotService:
         """Handle /bind command"""
         if not context.args:
             await update.message.reply_text(
-                "❌ Please provide your user token.\n"
-                "Usage: /bind <user_token>\n\n"
-                "You can find your user token in the BoutyGo app settings."
+                "❌ Please provide your user ID.\n"
+                "Usage: /bind <user_id>\n\n"
+                "You can find your user ID in the BountyGo app profile."
             )
             return
 
-        user_token = context.args[0]
+        try:
+            user_id = int(context.args[0])
+        except ValueError:
+            await update.message.reply_text(
+                "❌ Invalid user ID format.\n"
+                "Please provide a valid numeric user ID.\n\n"
+                "Example: /bind 123"
+            )
+            return
         chat_id = str(update.effective_chat.id)
         username = update.effective_user.username
 
-        # Here you would validate the user token and bind the account
-        # For now, we'll just show a placeholder response
-        await update.message.reply_text(
-            f"🔗 Binding request received!\n\n"
-            f"Chat ID: {chat_id}\n"
-            f"Username: @{username}\n"
-            f"Token: {user_token[:8]}...\n\n"
-            "Please complete the binding process in the BoutyGo app."
-        )
+        # 验证token并绑定账号
+        from app.core.database import AsyncSessionLocal
+        async with AsyncSessionLocal() as db:
+            try:
+                # 查找用户
+                result = await db.execute(
+                    select(User).where(User.id == user_id)
+                )
+                user = result.scalar_one_or_none()
+                if not user:
+                    await update.message.reply_text(
+                        "❌ User ID not found.\n\n"
+                        "Please check your user ID and try again.\n"
+                        "You can find your user ID in the BountyGo app profile."
+                    )
+                    return
+
+                # 检查是否已经绑定了其他账号
+                if user.telegram_chat_id and user.telegram_chat_id != chat_id:
+                    await update.message.reply_text(
+                        "⚠️ This account is already bound to another Telegram account.\n\n"
+                        "Please unbind the previous account first or contact support."
+                    )
+                    return
+
+                # 绑定账号
+                await db.execute(
+                    sql_update(User)
+                    .where(User.id == user.id)
+                    .values(
+                        telegram_chat_id=chat_id,
+                        telegram_username=username,
+                        telegram_notifications_enabled=True
+                    )
+                )
+                await db.commit()
+                self._chat_cache.put(chat_id, (user.id, user.nickname, True))
+
+                await update.message.reply_text(
+                    f"✅ Account bound successfully!\n\n"
+                    f"👤 User: {user.nickname}\n"
+                    f"🆔 User ID: {user_id}\n"
+                    f"📱 Chat ID: {chat_id}\n"
+                    f"🔔 Notifications: Enabled\n\n"
+                    "You will now receive task reminders and updates from BountyGo!"
+                )
+
+            except Exception as e:
+                logger.error(f"Error binding Telegram account: {e}")
+                await update.message.reply_text(
+                    "❌ An error occurred while binding your account.\n\n"
+                    "Please try again later or contact support."
+                )
+                await db.rollback()
 
     async def unbind_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /unbind command"""
         chat_id = str(update.effective_chat.id)
 
-        # Here you would unbind the account
-        # For now, we'll just show a placeholder response
-        await update.message.reply_text(
-            "🔓 Account unbound successfully!\n\n"
-            "You will no longer receive notifications from BoutyGo.\n"
-            "Use /bind to reconnect your account anytime."
-        )
+        from app.core.database import AsyncSessionLocal
+        async with AsyncSessionLocal() as db:
+            try:
+                # 解绑账号：一条UPDATE ... RETURNING 同时完成查找与解绑
+                result = await db.execute(
+                    sql_update(User)
+                    .where(User.telegram_chat_id == chat_id)
+                    .values(
+                        telegram_chat_id=None,
+                        telegram_username=None,
+                        telegram_notifications_enabled=False
+                    )
+                    .returning(User.nickname)
+                )
+                nickname = result.scalar_one_or_none()
+                self._chat_cache.delete(chat_id)
+
+                if nickname is None:
+                    await update.message.reply_text(
+                        "❌ No account is bound to this Telegram chat.\n\n"
+                        "Use /bind <user_token> to bind your account."
+                    )
+                    return
+
+                await db.commit()
+
+                await update.message.reply_text(
+                    f"🔓 Account unbound successfully!\n\n"
+                    f"👤 User: {nickname}\n"
+                    f"🔔 Notifications: Disabled\n\n"
+                    "You will no longer receive notifications from BountyGo.\n"
+                    "Use /bind to reconnect your account anytime."
+                )
+
+            except Exception as e:
+                logger.error(f"Error unbinding Telegram account: {e}")
+                await update.message.reply_text(
+                    "❌ An error occurred while unbinding your account.\n\n"
+                    "Please try again later or contact support."
+                )
+                await db.rollback()
 
     async def status_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /status command"""
         chat_id = str(update.effective_chat.id)
 
-        # Here you would check the binding status
-        # For now, we'll just show a placeholder response
-        await update.message.reply_text(
-            f"📊 Status Information\n\n"
-            f"Chat ID: {chat_id}\n"
-            f"Status: Not bound\n\n"
-            "Use /bind <user_token> to connect your account."
-        )
+        from app.core.database import AsyncSessionLocal
+        async with AsyncSessionLocal() as db:
+            try:
+                # 查找绑定的用户（短时缓存）
+                bound = await self._get_bound_user(db, chat_id)
+
+                if not bound:
+                    await update.message.reply_text(
+                        "❌ No account is bound to this Telegram chat.\n\n"
+                        "📱 Chat ID: {chat_id}\n"
+                        "🔗 Status: Not bound\n\n"
+                        "Use /bind <user_token> to bind your account."
+                    )
+                    return
+
+                _, nickname, notifications_enabled = bound
+                await update.message.reply_text(
+                    f"✅ Account Status\n\n"
+                    f"👤 User: {nickname}\n"
+                    f"📱 Chat ID: {chat_id}\n"
+                    f"🔗 Status: Bound\n"
+                    f"🔔 Notifications: {'Enabled' if notifications_enabled else 'Disabled'}\n\n"
+                    "Use /unbind to disconnect your account."
+                )
+
+            except Exception as e:
+                logger.error(f"Error checking Telegram account status: {e}")
+                await update.message.reply_text(
+                    "❌ An error occurred while checking your account status.\n\n"
+                    "Please try again later or contact support."
+                )
+                await db.rollback()
 
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /help command"""
         help_message = (
-            "🤖 BoutyGo Notification Bot Help\n\n"
-            "Available commands:\n"
-            "/start - Welcome message and setup\n"
-            "/bind <token> - Bind your BoutyGo account\n"
-            "/unbind - Unbind your account\n"
-            "/status - Check your binding status\n"
-            "/help - Show this help message\n\n"
-            "📱 How to use:\n"
-            "1. Get your user token from BoutyGo app\n"
-            "2. Use /bind <token> to connect\n"
-            "3. Start receiving task reminders!\n\n"
-            "Need help? Contact support in the BoutyGo app."
+            "🎯 BountyGo Notification Bot Help\n\n"
+            "Available commands:\n\n"
+            "🔗 /bind <user_id>\n"
+            "   Bind your BountyGo account to receive notifications\n\n"
+            "🔓 /unbind\n"
+            "   Unbind your account and stop notifications\n\n"
+            "📊 /status\n"
+            "   Check your account binding status\n\n"
+            "❓ /help\n"
+            "   Show this help message\n\n"
+            "💡 To get your user ID:\n"
+            "1. Open BountyGo app\n"
+            "2. Go to Profile or Settings\n"
+            "3. Copy your user ID (numeric)\n"
+            "4. Use /bind <your_user_id> here\n\n"
+            "Need help? Contact support in the BountyGo app."
         )
 
         await update.message.reply_text(help_message)
@@ -201,7 +492,7 @@ class TelegramBotService:
     async def unknown_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle unknown messages"""
         await update.message.reply_text(
-            "❓ I don't understand that command.\n"
+            "❓ I don't understand that command.\n\n"
             "Use /help to see available commands."
         )
 
@@ -218,6 +509,10 @@ class TelegramNotificationSender:
             # logger.warning("Telegram Bot not initialized, skipping notifications")  # 减少日志输出
             return
 
+        # Users who cannot receive anything are rejected in bulk, without
+        # loading their rows
+        await notification_service.fail_undeliverable_telegram_notifications(db)
+
         # Get pending Telegram notifications
         notifications = await notification_service.get_pending_notifications(
             db, channel="telegram"
@@ -227,51 +522,49 @@ class TelegramNotificationSender:
         if notifications:
             logger.info(f"Found {len(notifications)} pending Telegram notifications")
 
-        for notification in notifications:
-            await self._send_notification(db, notification)
-
-    async def _send_notification(self, db: AsyncSession, notification: Notification):
-        """Send a single notification"""
-        try:
-            # Check if user has Telegram enabled
-            if not notification.user.telegram_chat_id:
-                logger.warning(f"User {notification.user_id} has no Telegram chat ID")
-                await notification_service.mark_notification_failed(
-                    db, notification.id, "User has no Telegram chat ID"
-                )
-                return
-
-            if not notification.user.telegram_notifications_enabled:
-                logger.info(f"User {notification.user_id} has Telegram notifications disabled")
-                await notification_service.mark_notification_failed(
-                    db, notification.id, "User has Telegram notifications disabled"
-                )
-                return
-
-            # Send notification
-            delivery_id = await self.bot_service.send_notification(
-                chat_id=notification.user.telegram_chat_id,
-                title=notification.title,
-                message=notification.message,
-                notification_id=notification.id
-            )
+        # Outcomes are collected and written in bulk: one UPDATE for every
+        # sent row and one per distinct failure reason
+        sent: Dict[int, str] = {}
+        failed: Dict[str, List[int]] = defaultdict(list)
 
-            if delivery_id:
-                await notification_service.mark_notification_sent(
-                    db, notification.id, delivery_id
-                )
-                logger.info(f"Notification {notification.id} sent successfully")
-            else:
-                await notification_service.mark_notification_failed(
-                    db, notification.id, "Failed to send Telegram message"
+        # Broadcasts share a title and message: send each group as one
+        # broadcast so the body is built once, all groups concurrently
+        groups: Dict[Tuple[str, str], List[Notification]] = defaultdict(list)
+        for notification in notifications:
+            groups[(notification.title, notification.message)].append(notification)
+
+        # Readiness was checked above for the whole pass
+        broadcast = self.bot_service.send_notification_broadcast
+        outcomes = await asyncio.gather(
+            *(
+                broadcast(
+                    [notification.user.telegram_chat_id for notification in group],
+                    title,
+                    message
                 )
-                logger.error(f"Failed to send notification {notification.id}")
+                for (title, message), group in groups.items()
+            ),
+            return_exceptions=True
+        )
 
-        except Exception as e:
-            logger.error(f"Error sending notification {notification.id}: {e}")
-            await notification_service.mark_notification_failed(
-                db, notification.id, str(e)
-            )
+        for group, outcome in zip(groups.values(), outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error(f"Error sending {len(group)} Telegram notifications: {outcome}")
+                failed[str(outcome)].extend(notification.id for notification in group)
+                continue
+
+            for notification, delivery_id in zip(group, outcome):
+                if delivery_id:
+                    sent[notification.id] = delivery_id
+                else:
+                    logger.error(f"Failed to send notification {notification.id}")
+                    failed["Failed to send Telegram message"].append(notification.id)
+
+        if sent:
+            await notification_service.mark_notifications_sent(db, sent)
+            logger.info(f"Sent {len(sent)} Telegram notifications")
+        for error, ids in failed.items():
+            await notification_service.mark_notifications_failed(db, ids, error)
 
 
 # Global instances
@@ -3,13 +3,15 @@ User management service
 """
 from typing import Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
 
 from app.models.user import User, UserWallet
 from app.schemas.user import UserCreate, UserUpdate, GoogleUserInfo, UserWalletCreate
 from app.services.base import BaseService
-from app.core.exceptions import NotFoundError, ValidationError
+from app.core.exceptions import NotFoundError, ValidationError, InactiveUserError
 
 
 class UserService(BaseService[User, UserCreate, UserUpdate]):
@@ -68,32 +70,51 @@ class UserService(BaseService[User, UserCreate, UserUpdate]):
         google_user_info: GoogleUserInfo
     ) -> User:
         """Get existing user or create new user from Google OAuth"""
-        # First try to find by Google ID
-        user = await self.get_by_google_id(db, google_user_info.google_id)
-        
-        if user:
-            # Update existing user with latest Google info
-            if user.nickname != google_user_info.nickname or user.avatar_url != google_user_info.avatar_url:
-                update_data = UserUpdate(
-                    nickname=google_user_info.nickname,
-                    avatar_url=google_user_info.avatar_url
-                )
-                user = await self.update(db, user.id, update_data)
-            return user
-        
-        # Try to find by email (existing user linking Google account)
-        user = await self.get_by_email(db, google_user_info.email)
-        
-        if user:
-            # Link Google ID to existing user
-            if not user.google_id:
-                user.google_id = google_user_info.google_id
-                await db.commit()
-                await db.refresh(user)
-            return user
-        
-        # Create new user
-        return await self.create_from_google(db, google_user_info)
+        # Insert, or refresh the profile of the user already linked to this
+        # Google ID, in a single round trip
+        insert_stmt = pg_insert(User).values(
+            google_id=google_user_info.google_id,
+            email=google_user_info.email,
+            nickname=google_user_info.nickname,
+            avatar_url=google_user_info.avatar_url,
+            is_active=True
+        )
+        stmt = (
+            insert_stmt
+            .on_conflict_do_update(
+                index_elements=[User.google_id],
+                set_={
+                    "nickname": insert_stmt.excluded.nickname,
+                    "avatar_url": insert_stmt.excluded.avatar_url,
+                    "updated_at": func.now(),
+                },
+                # Inactive accounts are left untouched (and not returned)
+                where=User.is_active == True
+            )
+            .returning(User)
+            .execution_options(populate_existing=True)
+        )
+
+        # A savepoint keeps a conflict from rolling back the caller's transaction
+        try:
+            async with db.begin_nested():
+                user = (await db.execute(stmt)).scalar_one_or_none()
+        except IntegrityError:
+            # The email belongs to an existing user: link the Google ID to it
+            stmt = (
+                update(User)
+                .where(User.email == google_user_info.email, User.is_active == True)
+                .values(google_id=func.coalesce(User.google_id, google_user_info.google_id))
+                .returning(User)
+                .execution_options(populate_existing=True)
+            )
+            user = (await db.execute(stmt)).scalar_one_or_none()
+
+        if user is None:
+            raise InactiveUserError()
+
+        await db.commit()
+        return user
     
     async def add_wallet(
         self, 
@@ -233,17 +254,30 @@ class UserService(BaseService[User, UserCreate, UserUpdate]):
     async def get_user_stats(self, db: AsyncSession, user_id: int) -> dict:
         """Get user statistics"""
         # This would typically include task counts, completion rates, etc.
-        # For now, return basic info
-        user = await self.get(db, user_id)
-        if not user:
+        # For now, return basic info: one row, wallets counted in SQL
+        wallet_count = (
+            select(func.count())
+            .select_from(UserWallet)
+            .where(UserWallet.user_id == User.id)
+            .scalar_subquery()
+        )
+        stmt = select(
+            User.created_at,
+            User.is_active,
+            User.google_id,
+            wallet_count.label("wallet_count")
+        ).where(User.id == user_id)
+
+        row = (await db.execute(stmt)).one_or_none()
+        if not row:
             raise NotFoundError("User not found")
         
         return {
             "user_id": user_id,
-            "created_at": user.created_at,
-            "is_active": user.is_active,
-            "has_google_auth": bool(user.google_id),
-            "wallet_count": len(await self.get_user_wallets(db, user_id))
+            "created_at": row.created_at,
+            "is_active": row.is_active,
+            "has_google_auth": bool(row.google_id),
+            "wallet_count": row.wallet_count
         }
 
 
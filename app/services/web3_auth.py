@@ -2,8 +2,8 @@
 Web3 wallet authentication service for signature verification and wallet linking
 """
 import re
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+import logging
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from eth_account.messages import encode_defunct
@@ -12,6 +12,8 @@ import secrets
 
 from app.core.config import settings
 from app.core.exceptions import Web3AuthenticationError, ValidationError, NotFoundError
+from app.core.performance import LRUCache
+from app.core.redis import get_redis
 from app.core.security import (
     validate_ethereum_address, 
     normalize_ethereum_address,
@@ -24,28 +26,38 @@ from app.services.base import BaseService
 from app.services.auth import auth_service
 from app.services.user import user_service
 
+logger = logging.getLogger(__name__)
+
+# Generated nonces are hex only
+_NONCE_RE = re.compile(r'Nonce:\s*([a-fA-F0-9]+)')
+
 
 class Web3AuthService(BaseService):
     """Web3 wallet authentication service"""
     
+    # Nonces awaiting a signature when Redis is not available (single process)
+    LOCAL_NONCE_CACHE_SIZE = 10_000
+
     def __init__(self):
-        # Store nonces temporarily (in production, use Redis)
-        self._nonces: Dict[str, Dict[str, Any]] = {}
         self._nonce_ttl = 300  # 5 minutes
+        self._local_nonces = LRUCache(
+            max_size=self.LOCAL_NONCE_CACHE_SIZE,
+            ttl_seconds=self._nonce_ttl
+        )
+
+    @staticmethod
+    def _nonce_key(normalized_address: str) -> str:
+        return f"w3nonce:{normalized_address}"
+
+    @staticmethod
+    async def _get_redis_client():
+        """Shared Redis client, or None to fall back to the in-process store"""
+        try:
+            return await get_redis()
+        except RuntimeError:
+            return None
     
-    def _cleanup_expired_nonces(self):
-        """Clean up expired nonces"""
-        current_time = datetime.utcnow()
-        expired_keys = []
-        
-        for key, data in self._nonces.items():
-            if current_time > data['expires_at']:
-                expired_keys.append(key)
-        
-        for key in expired_keys:
-            del self._nonces[key]
-    
-    def generate_auth_nonce(self, wallet_address: str) -> str:
+    async def generate_auth_nonce(self, wallet_address: str) -> str:
         """Generate authentication nonce for wallet"""
         # Validate wallet address
         if not validate_ethereum_address(wallet_address):
@@ -53,21 +65,22 @@ class Web3AuthService(BaseService):
         
         # Normalize address
         normalized_address = normalize_ethereum_address(wallet_address)
-        
-        # Clean up expired nonces
-        self._cleanup_expired_nonces()
+        key = self._nonce_key(normalized_address)
         
         # Generate new nonce
         nonce = generate_nonce()
-        expires_at = datetime.utcnow() + timedelta(seconds=self._nonce_ttl)
-        
-        # Store nonce
-        self._nonces[normalized_address] = {
-            'nonce': nonce,
-            'expires_at': expires_at,
-            'used': False
-        }
         
+        # Store nonce; expiry is handled by the store's TTL, shared across
+        # workers when Redis is available
+        redis_client = await self._get_redis_client()
+        if redis_client is not None:
+            try:
+                await redis_client.setex(key, self._nonce_ttl, nonce)
+                return nonce
+            except Exception as e:
+                logger.warning("Failed to store wallet nonce in Redis: %s", e)
+        
+        self._local_nonces.put(key, nonce)
         return nonce
     
     def get_auth_message(self, wallet_address: str, nonce: str) -> str:
@@ -104,29 +117,23 @@ class Web3AuthService(BaseService):
         except Exception as e:
             raise Web3AuthenticationError(f"Signature verification failed: {str(e)}")
     
-    def _validate_nonce(self, wallet_address: str, nonce: str) -> bool:
-        """Validate nonce for wallet address"""
-        normalized_address = normalize_ethereum_address(wallet_address)
-        
-        # Clean up expired nonces
-        self._cleanup_expired_nonces()
-        
-        nonce_data = self._nonces.get(normalized_address)
-        if not nonce_data:
-            return False
-        
-        # Check if nonce matches and hasn't been used
-        if nonce_data['nonce'] != nonce or nonce_data['used']:
-            return False
-        
-        # Check if nonce hasn't expired
-        if datetime.utcnow() > nonce_data['expires_at']:
-            return False
-        
-        # Mark nonce as used
-        nonce_data['used'] = True
-        
-        return True
+    async def _validate_nonce(self, wallet_address: str, nonce: str) -> bool:
+        """Validate nonce for wallet address, consuming it"""
+        key = self._nonce_key(normalize_ethereum_address(wallet_address))
+        
+        # Read and delete in one step so a nonce can never be replayed
+        stored = None
+        redis_client = await self._get_redis_client()
+        if redis_client is not None:
+            try:
+                stored = await redis_client.getdel(key)
+            except Exception as e:
+                logger.warning("Failed to read wallet nonce from Redis: %s", e)
+        if stored is None:
+            stored = self._local_nonces.get(key)
+            self._local_nonces.delete(key)
+        
+        return stored is not None and secrets.compare_digest(stored, nonce)
     
     async def authenticate_wallet(
         self, 
@@ -148,7 +155,7 @@ class Web3AuthService(BaseService):
             raise Web3AuthenticationError("Invalid authentication message format")
         
         # Validate nonce
-        if not self._validate_nonce(wallet_address, nonce):
+        if not await self._validate_nonce(wallet_address, nonce):
             raise Web3AuthenticationError("Invalid or expired nonce")
         
         # Verify signature
@@ -191,7 +198,7 @@ class Web3AuthService(BaseService):
             raise Web3AuthenticationError("Invalid authentication message format")
         
         # Validate nonce
-        if not self._validate_nonce(wallet_address, nonce):
+        if not await self._validate_nonce(wallet_address, nonce):
             raise Web3AuthenticationError("Invalid or expired nonce")
         
         # Verify signature
@@ -223,9 +230,7 @@ class Web3AuthService(BaseService):
     
     def _extract_nonce_from_message(self, message: str) -> Optional[str]:
         """Extract nonce from authentication message"""
-        # Look for nonce pattern in message (hex characters only for generated nonces)
-        nonce_pattern = r'Nonce:\s*([a-fA-F0-9]+)'
-        match = re.search(nonce_pattern, message)
+        match = _NONCE_RE.search(message)
         return match.group(1) if match else None
     
     async def _get_user_by_wallet(
@@ -1,7 +1,7 @@
 """
 WebSocket service for real-time notifications
 """
-import json
+import orjson
 import asyncio
 import logging
 from typing import Dict, Set, Optional, Any
@@ -66,11 +66,12 @@ class ConnectionManager:
     async def send_personal_message(self, user_id: int, message: Dict[str, Any]):
         """Send message to a specific user"""
         if user_id in self.active_connections:
+            payload = orjson.dumps(message).decode()
             disconnected_websockets = []
 
             for websocket in self.active_connections[user_id].copy():
                 try:
-                    await websocket.send_text(json.dumps(message))
+                    await websocket.send_text(payload)
                 except Exception as e:
                     logger.error(f"Error sending message to user {user_id}: {e}")
                     disconnected_websockets.append(websocket)
@@ -81,12 +82,13 @@ class ConnectionManager:
 
     async def send_broadcast(self, message: Dict[str, Any]):
         """Send message to all connected users"""
+        payload = orjson.dumps(message).decode()
         disconnected_websockets = []
 
         for user_id, websockets in self.active_connections.items():
             for websocket in websockets.copy():
                 try:
-                    await websocket.send_text(json.dumps(message))
+                    await websocket.send_text(payload)
                 except Exception as e:
                     logger.error(f"Error broadcasting to user {user_id}: {e}")
                     disconnected_websockets.append(websocket)
@@ -264,14 +266,14 @@ class WebSocketService:
 
                 # Parse incoming message
                 try:
-                    message = json.loads(data)
+                    message = orjson.loads(data)
                     await self._handle_incoming_message(websocket, user, message)
-                except json.JSONDecodeError:
-                    await websocket.send_text(json.dumps({
+                except orjson.JSONDecodeError:
+                    await websocket.send_text(orjson.dumps({
                         "type": "error",
                         "message": "Invalid JSON format",
                         "timestamp": datetime.utcnow().isoformat()
-                    }))
+                    }).decode())
 
         except WebSocketDisconnect:
             logger.info(f"User {user.id} disconnected")
@@ -286,29 +288,29 @@ class WebSocketService:
 
         if message_type == "ping":
             # Respond to ping with pong
-            await websocket.send_text(json.dumps({
+            await websocket.send_text(orjson.dumps({
                 "type": "pong",
                 "timestamp": datetime.utcnow().isoformat()
-            }))
+            }).decode())
 
         elif message_type == "mark_read":
             # Mark notification as read
             notification_id = message.get("notification_id")
             if notification_id:
                 # Here you could implement marking notifications as read
-                await websocket.send_text(json.dumps({
+                await websocket.send_text(orjson.dumps({
                     "type": "notification_marked_read",
                     "notification_id": notification_id,
                     "timestamp": datetime.utcnow().isoformat()
-                }))
+                }).decode())
 
         else:
             # Unknown message type
-            await websocket.send_text(json.dumps({
+            await websocket.send_text(orjson.dumps({
                 "type": "error",
                 "message": f"Unknown message type: {message_type}",
                 "timestamp": datetime.utcnow().isoformat()
-            }))
+            }).decode())
 
 
 # Global instances
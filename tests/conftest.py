@@ -61,6 +61,35 @@ async def db_session(test_engine) -> AsyncGenerator[AsyncSession, None]:
         await session.rollback()
 
 
+@pytest.fixture
+async def fresh_engine():
+    """Per-test in-memory database with the application schema"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False}
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    yield engine
+
+    await engine.dispose()
+
+
+@pytest.fixture
+async def fresh_db_session(fresh_engine) -> AsyncGenerator[AsyncSession, None]:
+    """Session on the per-test database; nothing is shared with other tests"""
+    async_session = async_sessionmaker(
+        bind=fresh_engine,
+        class_=AsyncSession,
+        expire_on_commit=False
+    )
+
+    async with async_session() as session:
+        yield session
+
+
 @pytest.fixture
 async def test_user(db_session: AsyncSession) -> User:
     """Create a test user"""
@@ -93,6 +93,48 @@ class TestJWTService:
         assert isinstance(expiry, datetime)
         assert expiry > datetime.utcnow()
 
+    def test_token_claims_are_unix_timestamps(self):
+        """Test iat/exp claims are integer seconds with the configured lifetime"""
+        token = self.jwt_service.create_access_token(123, expires_delta=timedelta(minutes=5))
+
+        payload = self.jwt_service.verify_token(token, "access")
+
+        assert isinstance(payload["iat"], int)
+        assert payload["exp"] - payload["iat"] == 300
+
+    def test_verify_expired_token(self):
+        """Test expired tokens are rejected"""
+        token = self.jwt_service.create_access_token(123, expires_delta=timedelta(seconds=-10))
+
+        with pytest.raises(AuthenticationError, match="Token has expired"):
+            self.jwt_service.verify_token(token, "access")
+
+    def test_verify_token_cached(self):
+        """Test repeated verification of the same token skips decoding"""
+        token = self.jwt_service.create_access_token(123)
+
+        first = self.jwt_service.verify_token(token, "access")
+        with patch("app.services.auth.jwt.decode") as mock_decode:
+            second = self.jwt_service.verify_token(token, "access")
+
+        assert second == first
+        mock_decode.assert_not_called()
+
+    def test_verify_token_cache_keyed_by_type(self):
+        """Test a cached access token is not accepted as a refresh token"""
+        token = self.jwt_service.create_access_token(123)
+        self.jwt_service.verify_token(token, "access")
+
+        with pytest.raises(AuthenticationError, match="Invalid token type"):
+            self.jwt_service.verify_token(token, "refresh")
+
+    def test_verify_token_failures_not_cached(self):
+        """Test failed verifications are retried rather than cached"""
+        with pytest.raises(AuthenticationError):
+            self.jwt_service.verify_token("invalid.token.here", "access")
+
+        assert self.jwt_service._verify_cache.get_stats()["size"] == 0
+
 
 class TestRefreshTokenService:
     """Test refresh token service functionality"""
@@ -107,8 +149,45 @@ class TestRefreshTokenService:
         hash2 = self.refresh_service._hash_token(token)
         
         assert hash1 == hash2  # Same input produces same hash
-        assert len(hash1) == 64  # SHA256 hex length
+        assert hash1.startswith("b2$")  # Keyed BLAKE2b marker
+        assert len(hash1) == 3 + 64  # Prefix + 32-byte hex digest
         assert hash1 != token  # Hash is different from original
+
+    def test_hash_token_is_keyed(self):
+        """Test token hashes depend on the secret key"""
+        token = "test_token_123"
+        other_service = RefreshTokenService()
+        other_service._hash_key = b"another-secret"
+
+        assert self.refresh_service._hash_token(token) != other_service._hash_token(token)
+
+    def test_hash_tokens_bulk_matches_single(self):
+        """Test batch hashing produces the same hashes as one-at-a-time"""
+        tokens = [f"token_{i}" for i in range(5)]
+
+        assert self.refresh_service.hash_tokens_bulk(tokens) == [
+            self.refresh_service._hash_token(token) for token in tokens
+        ]
+
+    def test_hash_token_uses_pepper(self):
+        """Test TOKEN_PEPPER takes precedence over SECRET_KEY as the hash key"""
+        with patch("app.services.auth.settings") as mock_settings:
+            mock_settings.TOKEN_PEPPER = "pepper"
+            mock_settings.SECRET_KEY = "secret"
+            mock_settings.REFRESH_TOKEN_EXPIRE_DAYS = 30
+            peppered = RefreshTokenService()
+
+        assert peppered._hash_key == b"pepper"
+
+    def test_token_hash_candidates_include_legacy(self):
+        """Test lookups still match rows hashed with plain SHA-256"""
+        import hashlib
+
+        token = "test_token_123"
+        candidates = self.refresh_service._token_hash_candidates(token)
+
+        assert candidates[0] == self.refresh_service._hash_token(token)
+        assert hashlib.sha256(token.encode()).hexdigest() in candidates
     
     @pytest.mark.asyncio
     async def test_store_refresh_token(self):
@@ -121,7 +200,60 @@ class TestRefreshTokenService:
         
         assert db_mock.add.called
         assert db_mock.commit.called
-        assert db_mock.refresh.called
+        assert not db_mock.refresh.called
+        assert result.token_hash == self.refresh_service._hash_token(token)
+
+    @pytest.mark.asyncio
+    async def test_store_refresh_token_without_commit(self):
+        """Test storing refresh token inside the caller's transaction"""
+        db_mock = AsyncMock(spec=AsyncSession)
+
+        await self.refresh_service.store_refresh_token(
+            db_mock, 123, "test_refresh_token", commit=False
+        )
+
+        assert db_mock.add.called
+        assert not db_mock.commit.called
+    
+    @pytest.mark.asyncio
+    async def test_store_refresh_tokens_bulk_small_batch(self):
+        """Test small bulk batches fall back to an ORM insert"""
+        db_mock = AsyncMock(spec=AsyncSession)
+        db_mock.get_bind = MagicMock()
+        db_mock.get_bind.return_value.dialect.driver = "asyncpg"
+
+        count = await self.refresh_service.store_refresh_tokens_bulk(
+            db_mock, [(1, "token_a"), (2, "token_b")]
+        )
+
+        assert count == 2
+        rows = db_mock.add_all.call_args.args[0]
+        assert [row.user_id for row in rows] == [1, 2]
+        assert rows[0].token_hash == self.refresh_service._hash_token("token_a")
+        assert not db_mock.connection.called
+        assert db_mock.commit.called
+
+    @pytest.mark.asyncio
+    async def test_store_refresh_tokens_bulk_uses_copy(self):
+        """Test large batches on asyncpg are written with COPY"""
+        db_mock = AsyncMock(spec=AsyncSession)
+        db_mock.get_bind = MagicMock()
+        db_mock.get_bind.return_value.dialect.driver = "asyncpg"
+        raw_conn = MagicMock()
+        raw_conn.driver_connection.copy_records_to_table = AsyncMock()
+        conn = MagicMock()
+        conn.get_raw_connection = AsyncMock(return_value=raw_conn)
+        db_mock.connection = AsyncMock(return_value=conn)
+
+        tokens = [(i, f"token_{i}") for i in range(RefreshTokenService.BULK_COPY_THRESHOLD)]
+        count = await self.refresh_service.store_refresh_tokens_bulk(db_mock, tokens)
+
+        assert count == len(tokens)
+        copy = raw_conn.driver_connection.copy_records_to_table
+        copy.assert_awaited_once()
+        assert copy.call_args.args[0] == "refresh_tokens"
+        assert len(copy.call_args.kwargs["records"]) == len(tokens)
+        assert not db_mock.add_all.called
     
     @pytest.mark.asyncio
     async def test_verify_refresh_token_valid(self):
@@ -148,6 +280,41 @@ class TestRefreshTokenService:
         assert result == mock_token
         assert db_mock.execute.called
     
+    @pytest.mark.asyncio
+    async def test_verify_refresh_token_by_jti(self):
+        """Test refresh tokens are found by jti without a hash lookup"""
+        db_mock = AsyncMock(spec=AsyncSession)
+        mock_token = RefreshToken(id=1, user_id=123, token_hash="hash", jti="abc")
+        mock_result = MagicMock()
+        mock_result.scalar_one_or_none.return_value = mock_token
+        db_mock.execute = AsyncMock(return_value=mock_result)
+
+        with patch.object(self.refresh_service, '_token_hash_candidates') as mock_hash:
+            result = await self.refresh_service.verify_refresh_token(
+                db_mock, "test_refresh_token", jti="abc"
+            )
+
+        assert result == mock_token
+        assert db_mock.execute.await_count == 1
+        mock_hash.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_verify_refresh_token_jti_falls_back_to_hash(self):
+        """Test rows stored before jti was recorded are matched by hash"""
+        db_mock = AsyncMock(spec=AsyncSession)
+        legacy_token = RefreshToken(id=1, user_id=123, token_hash="hash")
+        miss, hit = MagicMock(), MagicMock()
+        miss.scalar_one_or_none.return_value = None
+        hit.scalar_one_or_none.return_value = legacy_token
+        db_mock.execute = AsyncMock(side_effect=[miss, hit])
+
+        result = await self.refresh_service.verify_refresh_token(
+            db_mock, "test_refresh_token", jti="abc"
+        )
+
+        assert result == legacy_token
+        assert db_mock.execute.await_count == 2
+    
     @pytest.mark.asyncio
     async def test_verify_refresh_token_invalid(self):
         """Test verifying invalid refresh token"""
@@ -193,6 +360,38 @@ class TestRefreshTokenService:
         assert db_mock.execute.called
         assert db_mock.commit.called
 
+    @pytest.mark.asyncio
+    async def test_rotate_refresh_token(self):
+        """Test rotation revokes the token and returns its owner without committing"""
+        db_mock = AsyncMock(spec=AsyncSession)
+        mock_result = MagicMock()
+        mock_result.scalar_one_or_none.return_value = 123
+        db_mock.execute = AsyncMock(return_value=mock_result)
+
+        user_id = await self.refresh_service.rotate_refresh_token(
+            db_mock, "test_refresh_token", jti="abc"
+        )
+
+        assert user_id == 123
+        assert db_mock.execute.await_count == 1
+        assert not db_mock.commit.called
+
+    @pytest.mark.asyncio
+    async def test_cleanup_expired_tokens_batches(self):
+        """Test expired tokens are deleted in committed batches"""
+        db_mock = AsyncMock(spec=AsyncSession)
+        db_mock.execute = AsyncMock(side_effect=[
+            MagicMock(rowcount=2),
+            MagicMock(rowcount=2),
+            MagicMock(rowcount=1)
+        ])
+
+        result = await self.refresh_service.cleanup_expired_tokens(db_mock, batch_size=2)
+
+        assert result == 5
+        assert db_mock.execute.await_count == 3
+        assert db_mock.commit.await_count == 3
+
 
 class TestAuthenticationService:
     """Test main authentication service"""
@@ -200,6 +399,31 @@ class TestAuthenticationService:
     def setup_method(self):
         self.auth_service = AuthenticationService()
     
+    def test_module_services_are_shared(self):
+        """Test the module-level services share one JWT/refresh-token pair"""
+        from app.services import auth as auth_module
+        from app.services.clerk_auth import clerk_auth_service
+        
+        assert auth_module.auth_service.jwt_service is auth_module.jwt_service
+        assert auth_module.auth_service.refresh_service is auth_module.refresh_token_service
+        assert clerk_auth_service.auth_service is auth_module.auth_service
+    
+    @pytest.mark.asyncio
+    async def test_get_user_by_id_binds_parameter(self):
+        """Test the shared active-user statement is reused with a bound id"""
+        db_mock = AsyncMock(spec=AsyncSession)
+        mock_result = MagicMock()
+        mock_result.scalar_one_or_none.return_value = None
+        db_mock.execute = AsyncMock(return_value=mock_result)
+        
+        await self.auth_service.get_user_by_id(db_mock, 1)
+        await self.auth_service.get_user_by_id(db_mock, 2)
+        
+        first, second = db_mock.execute.call_args_list
+        assert first.args[0] is second.args[0]
+        assert first.args[1] == {"uid": 1}
+        assert second.args[1] == {"uid": 2}
+    
     @pytest.mark.asyncio
     async def test_create_token_pair(self):
         """Test creating token pair"""
@@ -223,19 +447,10 @@ class TestAuthenticationService:
         db_mock = AsyncMock(spec=AsyncSession)
         refresh_token = self.auth_service.jwt_service.create_refresh_token(123)
         
-        # Mock refresh token verification
-        mock_stored_token = RefreshToken(
-            id=1,
-            user_id=123,
-            token_hash="hash",
-            expires_at=datetime.utcnow() + timedelta(days=1),
-            is_revoked=False
-        )
-        
-        with patch.object(self.auth_service.refresh_service, 'verify_refresh_token') as mock_verify:
+        with patch.object(self.auth_service.refresh_service, 'rotate_refresh_token') as mock_rotate:
             with patch.object(self.auth_service, 'get_user_by_id') as mock_get_user:
                 with patch.object(self.auth_service, 'create_token_pair') as mock_create:
-                    mock_verify.return_value = mock_stored_token
+                    mock_rotate.return_value = 123
                     mock_get_user.return_value = User(id=123, email="test@example.com", nickname="test", is_active=True)
                     mock_create.return_value = TokenResponse(
                         access_token="new_access",
@@ -247,9 +462,25 @@ class TestAuthenticationService:
                     result = await self.auth_service.refresh_access_token(db_mock, refresh_token)
                     
                     assert isinstance(result, TokenResponse)
-                    assert mock_verify.called
+                    assert mock_rotate.called
+                    assert mock_rotate.call_args.kwargs["jti"]
                     assert mock_get_user.called
                     assert mock_create.called
+
+    @pytest.mark.asyncio
+    async def test_refresh_access_token_reused(self):
+        """Test an already rotated refresh token cannot be used again"""
+        db_mock = AsyncMock(spec=AsyncSession)
+        refresh_token = self.auth_service.jwt_service.create_refresh_token(123)
+
+        with patch.object(self.auth_service.refresh_service, 'rotate_refresh_token') as mock_rotate:
+            with patch.object(self.auth_service, 'create_token_pair') as mock_create:
+                mock_rotate.return_value = None
+
+                with pytest.raises(AuthenticationError, match="not found or expired"):
+                    await self.auth_service.refresh_access_token(db_mock, refresh_token)
+
+                assert not mock_create.called
     
     @pytest.mark.asyncio
     async def test_refresh_access_token_invalid(self):
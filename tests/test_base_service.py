@@ -0,0 +1,157 @@
+"""
+BaseService CRUD helper tests
+"""
+import pytest
+from sqlalchemy import String, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.pool import StaticPool
+
+from app.schemas.base import PaginationParams
+from app.services.base import BaseService
+
+
+class _Base(DeclarativeBase):
+    pass
+
+
+class Item(_Base):
+    """Standalone model so the tests do not depend on the app schema"""
+    __tablename__ = "items"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(50))
+    category: Mapped[str] = mapped_column(String(50))
+
+
+@pytest.fixture
+async def session():
+    """In-memory database seeded with 25 items (10 in category 'a')"""
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False}
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(_Base.metadata.create_all)
+
+    async with async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)() as db:
+        db.add_all([
+            Item(name=f"item{i}", category="a" if i < 10 else "b")
+            for i in range(25)
+        ])
+        await db.commit()
+        yield db
+
+    await engine.dispose()
+
+
+class TestBaseServiceGetMulti:
+    """Test paginated listing"""
+
+    def setup_method(self):
+        self.service = BaseService(Item)
+
+    @pytest.mark.asyncio
+    async def test_get_multi_page_and_total(self, session):
+        """Test the page and total come back from one query"""
+        result = await self.service.get_multi(session, PaginationParams(page=2, size=10))
+
+        assert [item.name for item in result.items] == [f"item{i}" for i in range(10, 20)]
+        assert result.total == 25
+        assert result.pages == 3
+
+    @pytest.mark.asyncio
+    async def test_get_multi_filters(self, session):
+        """Test filters apply to both the page and the total"""
+        result = await self.service.get_multi(
+            session, PaginationParams(page=1, size=4), filters={"category": "a"}
+        )
+
+        assert len(result.items) == 4
+        assert result.total == 10
+
+    @pytest.mark.asyncio
+    async def test_get_multi_past_last_page(self, session):
+        """Test an empty page still reports the real total"""
+        result = await self.service.get_multi(session, PaginationParams(page=10, size=10))
+
+        assert result.items == []
+        assert result.total == 25
+
+    @pytest.mark.asyncio
+    async def test_get_multi_keyset(self, session):
+        """Test after_id walks the table by id in one query per page, without a count"""
+        queries = []
+
+        def count_queries(conn, cursor, statement, parameters, context, executemany):
+            queries.append(statement)
+
+        sync_engine = session.bind.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", count_queries)
+        try:
+            first = await self.service.get_multi(
+                session, PaginationParams(size=4, after_id=0), filters={"category": "a"}
+            )
+            second = await self.service.get_multi(
+                session, PaginationParams(size=4, after_id=first.next_after), filters={"category": "a"}
+            )
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", count_queries)
+
+        assert [item.id for item in first.items] == [1, 2, 3, 4]
+        assert [item.id for item in second.items] == [5, 6, 7, 8]
+        assert second.next_after == 8
+        assert first.total is None and first.pages is None
+        assert len(queries) == 2
+        assert not any("count(" in statement.lower() for statement in queries)
+
+    @pytest.mark.asyncio
+    async def test_get_multi_keyset_last_page(self, session):
+        """Test the cursor is cleared once a short page is returned"""
+        result = await self.service.get_multi(session, PaginationParams(size=10, after_id=20))
+
+        assert [item.id for item in result.items] == [21, 22, 23, 24, 25]
+        assert result.next_after is None
+        assert result.total is None
+
+        past_end = await self.service.get_multi(session, PaginationParams(size=10, after_id=25))
+        assert past_end.items == [] and past_end.next_after is None
+
+    @pytest.mark.asyncio
+    async def test_get_multi_ignores_unknown_filters(self, session):
+        """Test filters naming non-column attributes are skipped"""
+        result = await self.service.get_multi(
+            session,
+            PaginationParams(page=1, size=30),
+            filters={"metadata": "x", "category": None, "unknown": 1}
+        )
+
+        assert result.total == 25
+
+
+class TestBaseServiceLookups:
+    """Test single-record lookups"""
+
+    def setup_method(self):
+        self.service = BaseService(Item)
+
+    @pytest.mark.asyncio
+    async def test_get(self, session):
+        """Test get binds the id into the prebuilt statement"""
+        assert (await self.service.get(session, 3)).name == "item2"
+        assert (await self.service.get(session, 7)).name == "item6"
+        assert await self.service.get(session, 99) is None
+
+    @pytest.mark.asyncio
+    async def test_exists(self, session):
+        """Test exists reports presence by id"""
+        assert await self.service.exists(session, 1) is True
+        assert await self.service.exists(session, 99) is False
+
+    @pytest.mark.asyncio
+    async def test_delete(self, session):
+        """Test delete removes the record found by get"""
+        assert await self.service.delete(session, 5) is True
+        assert await self.service.exists(session, 5) is False
+        assert await self.service.delete(session, 5) is False
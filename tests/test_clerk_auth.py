@@ -0,0 +1,524 @@
+"""
+Clerk authentication service tests
+"""
+import asyncio
+import json
+import time
+import pytest
+import jwt
+from unittest.mock import AsyncMock, MagicMock, patch
+from cryptography.hazmat.primitives.asymmetric import rsa
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+
+from app.core.exceptions import AuthenticationError
+from app.models.user import User
+from app.services.clerk_auth import ClerkAuthService, ClerkUserPayload
+
+
+ISSUER = "https://clerk.example.com"
+JWKS_URL = f"{ISSUER}/.well-known/jwks.json"
+
+
+def _make_key(kid: str):
+    """Generate an RSA key and its public JWK"""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({"kid": kid, "use": "sig", "alg": "RS256"})
+    return private_key, jwk
+
+
+def _jwks_response(*jwks):
+    response = MagicMock()
+    response.json.return_value = {"keys": list(jwks)}
+    response.raise_for_status.return_value = None
+    return response
+
+
+class TestClerkTokenVerification:
+    """Test Clerk JWT verification against the cached JWKS"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.service = ClerkAuthService()
+        self.service._jwks_url = JWKS_URL
+        self.service._issuer = ISSUER
+        self.service._http = MagicMock()
+        self.service._http.get = AsyncMock()
+
+    def _token(self, private_key, kid: str, **claims) -> str:
+        payload = {
+            "sub": "user_123",
+            "iss": ISSUER,
+            "iat": int(time.time()),
+            "exp": int(time.time()) + 300,
+            **claims
+        }
+        payload = {k: v for k, v in payload.items() if v is not None}
+        return jwt.encode(payload, private_key, algorithm="RS256", headers={"kid": kid})
+
+    @pytest.mark.asyncio
+    async def test_verify_clerk_token_caches_jwks(self):
+        """Test the JWKS is fetched once and reused across verifications"""
+        private_key, jwk = _make_key("key-1")
+        self.service._http.get.return_value = _jwks_response(jwk)
+        token = self._token(private_key, "key-1")
+
+        first = await self.service.verify_clerk_token(token)
+        second = await self.service.verify_clerk_token(token)
+
+        assert first["sub"] == "user_123"
+        assert second == first
+        self.service._http.get.assert_awaited_once_with(JWKS_URL)
+
+    @pytest.mark.asyncio
+    async def test_verify_clerk_token_refetches_on_unknown_kid(self):
+        """Test a rotated signing key triggers a single JWKS refresh"""
+        old_key, old_jwk = _make_key("key-1")
+        new_key, new_jwk = _make_key("key-2")
+        self.service._http.get.side_effect = [
+            _jwks_response(old_jwk),
+            _jwks_response(old_jwk, new_jwk),
+        ]
+
+        assert await self.service.verify_clerk_token(self._token(old_key, "key-1"))
+        # Age the cached set past the minimum refresh interval
+        fetched_at, jwks = self.service._jwks_cache
+        self.service._jwks_cache = (fetched_at - ClerkAuthService.JWKS_MIN_REFRESH_SECONDS, jwks)
+        payload = await self.service.verify_clerk_token(self._token(new_key, "key-2"))
+
+        assert payload["sub"] == "user_123"
+        assert self.service._http.get.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_verify_clerk_token_unknown_kid_refresh_is_rate_limited(self):
+        """Test unknown kids do not refetch a JWKS fetched moments ago"""
+        private_key, jwk = _make_key("key-1")
+        self.service._http.get.return_value = _jwks_response(jwk)
+
+        for kid in ("bogus-1", "bogus-2", "bogus-3"):
+            assert await self.service.verify_clerk_token(self._token(private_key, kid)) is None
+
+        self.service._http.get.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_kid_misses_share_one_refresh(self):
+        """Test a burst of tokens with a rotated kid triggers one JWKS fetch"""
+        old_key, old_jwk = _make_key("key-1")
+        new_key, new_jwk = _make_key("key-2")
+        self.service._http.get.return_value = _jwks_response(old_jwk)
+        await self.service._get_jwks()
+        fetched_at, jwks = self.service._jwks_cache
+        self.service._jwks_cache = (fetched_at - ClerkAuthService.JWKS_MIN_REFRESH_SECONDS, jwks)
+
+        async def slow_fetch(url):
+            await asyncio.sleep(0.01)
+            return _jwks_response(old_jwk, new_jwk)
+
+        self.service._http.get = AsyncMock(side_effect=slow_fetch)
+        payloads = await asyncio.gather(
+            *(self.service.verify_clerk_token(self._token(new_key, "key-2")) for _ in range(5))
+        )
+
+        assert all(payloads)
+        self.service._http.get.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_verify_clerk_token_decodes_off_event_loop(self):
+        """Test signature verification runs in a worker thread"""
+        private_key, jwk = _make_key("key-1")
+        self.service._http.get.return_value = _jwks_response(jwk)
+
+        with patch("app.services.clerk_auth.asyncio.to_thread", wraps=asyncio.to_thread) as mock_to_thread:
+            assert await self.service.verify_clerk_token(self._token(private_key, "key-1"))
+
+        assert mock_to_thread.call_args.args[0] == self.service._decode_clerk_token
+
+    @pytest.mark.asyncio
+    async def test_start_jwks_refresh_prefetches(self):
+        """Test startup fetches the JWKS and schedules the background refresher"""
+        private_key, jwk = _make_key("key-1")
+        self.service._http.get.return_value = _jwks_response(jwk)
+        self.service._http.aclose = AsyncMock()
+
+        await self.service.start_jwks_refresh()
+        try:
+            self.service._http.get.assert_awaited_once_with(JWKS_URL)
+            assert self.service._jwks_refresh_task is not None
+            assert await self.service.verify_clerk_token(self._token(private_key, "key-1"))
+            self.service._http.get.assert_awaited_once()
+        finally:
+            await self.service.aclose()
+
+        assert self.service._jwks_refresh_task is None
+
+    @pytest.mark.asyncio
+    async def test_jwks_fetch_failure_keeps_cached_keys(self):
+        """Test a Clerk outage keeps verifying with the last known keys"""
+        private_key, jwk = _make_key("key-1")
+        self.service._http.get.side_effect = [_jwks_response(jwk), Exception("Clerk down")]
+
+        await self.service._get_jwks()
+        jwks = await self.service._get_jwks(refresh=True)
+
+        assert [key.key_id for key in jwks.keys] == ["key-1"]
+        assert await self.service.verify_clerk_token(self._token(private_key, "key-1"))
+
+    @pytest.mark.asyncio
+    async def test_verify_clerk_token_wrong_signature(self):
+        """Test a token signed by a key outside the JWKS is rejected"""
+        _, jwk = _make_key("key-1")
+        other_key, _ = _make_key("key-1")
+        self.service._http.get.return_value = _jwks_response(jwk)
+
+        assert await self.service.verify_clerk_token(self._token(other_key, "key-1")) is None
+
+    @pytest.mark.asyncio
+    async def test_verify_clerk_token_rejects_foreign_issuer_early(self):
+        """Test tokens from another issuer are rejected before any key lookup"""
+        private_key, jwk = _make_key("key-1")
+        self.service._http.get.return_value = _jwks_response(jwk)
+        token = self._token(private_key, "key-1", iss="https://evil.example.com")
+
+        assert await self.service.verify_clerk_token(token) is None
+        assert not self.service._http.get.called
+
+    @pytest.mark.asyncio
+    async def test_verify_clerk_token_allows_clock_skew(self):
+        """Test tokens expired within the leeway are still accepted"""
+        private_key, jwk = _make_key("key-1")
+        self.service._http.get.return_value = _jwks_response(jwk)
+        token = self._token(private_key, "key-1", exp=int(time.time()) - 5)
+
+        assert await self.service.verify_clerk_token(token)
+
+    @pytest.mark.asyncio
+    async def test_verify_clerk_token_requires_claims(self):
+        """Test tokens without iat are rejected"""
+        private_key, jwk = _make_key("key-1")
+        self.service._http.get.return_value = _jwks_response(jwk)
+
+        assert await self.service.verify_clerk_token(self._token(private_key, "key-1", iat=None)) is None
+
+    @pytest.mark.asyncio
+    async def test_verify_clerk_tokens_batch(self):
+        """Test a batch resolves each kid once and keeps input order"""
+        key_1, jwk_1 = _make_key("key-1")
+        key_2, jwk_2 = _make_key("key-2")
+        self.service._http.get.return_value = _jwks_response(jwk_1, jwk_2)
+        self.service._get_signing_key_for_kid = AsyncMock(
+            wraps=self.service._get_signing_key_for_kid
+        )
+        tokens = [
+            self._token(key_1, "key-1", sub="a"),
+            self._token(key_2, "key-2", sub="b"),
+            self._token(key_1, "key-1", iss="https://evil.example.com"),
+            self._token(key_1, "key-1", sub="c"),
+        ]
+
+        payloads = await self.service.verify_clerk_tokens_batch(tokens)
+
+        assert [p and p["sub"] for p in payloads] == ["a", "b", None, "c"]
+        assert self.service._get_signing_key_for_kid.await_count == 2
+        self.service._http.get.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_authenticate_with_clerk_has_no_unverified_fallback(self):
+        """Test an unverifiable token never reaches the Clerk API"""
+        _, jwk = _make_key("key-1")
+        other_key, _ = _make_key("key-1")
+        self.service._http.get.return_value = _jwks_response(jwk)
+        self.service._get_clerk_user_info = AsyncMock()
+
+        with pytest.raises(AuthenticationError):
+            await self.service.authenticate_with_clerk(
+                AsyncMock(), self._token(other_key, "key-1")
+            )
+
+        assert not self.service._get_clerk_user_info.called
+
+    @pytest.mark.asyncio
+    async def test_authenticate_with_clerk_uses_token_claims(self):
+        """Test tokens carrying an email skip the Clerk API lookup"""
+        private_key, jwk = _make_key("key-1")
+        self.service._http.get.return_value = _jwks_response(jwk)
+        self.service._get_clerk_user_info = AsyncMock()
+        self.service._find_or_create_clerk_user = AsyncMock(return_value=User(id=7, email="c@example.com"))
+        self.service.auth_service = MagicMock()
+        self.service.auth_service.create_token_pair = AsyncMock(return_value="tokens")
+        token = self._token(private_key, "key-1", email="c@example.com", picture="https://example.com/p.png")
+
+        assert await self.service.authenticate_with_clerk(AsyncMock(), token) == "tokens"
+
+        assert not self.service._get_clerk_user_info.called
+        profile = self.service._find_or_create_clerk_user.call_args.args[1]
+        assert profile.email == "c@example.com"
+        assert profile.avatar_url == "https://example.com/p.png"
+
+
+class TestClerkUserUpsert:
+    """Test the Clerk find-or-create upsert"""
+
+    def setup_method(self):
+        self.service = ClerkAuthService()
+        self.payload = ClerkUserPayload.from_payload({
+            "sub": "user_123",
+            "email": "clerk@example.com",
+            "first_name": "Clerk",
+            "last_name": "User",
+            "image_url": "https://example.com/a.png"
+        })
+
+    def test_payload_parsing(self):
+        """Test the nickname and avatar are derived once from the payload"""
+        assert self.payload == ClerkUserPayload(
+            clerk_user_id="user_123",
+            email="clerk@example.com",
+            nickname="Clerk User",
+            avatar_url="https://example.com/a.png"
+        )
+        fallback = ClerkUserPayload.from_payload(
+            {"sub": "user_1", "email": "ann@example.com", "profile_image_url": "p.png"}
+        )
+        assert (fallback.nickname, fallback.avatar_url) == ("ann", "p.png")
+
+        with pytest.raises(AuthenticationError):
+            ClerkUserPayload.from_payload({"sub": "user_1"})
+
+    @staticmethod
+    def _db_mock(**execute):
+        """Session mock whose savepoints propagate errors like the real one"""
+        db_mock = AsyncMock()
+        db_mock.execute = AsyncMock(**execute)
+        savepoint = MagicMock()
+        savepoint.__aenter__ = AsyncMock()
+        savepoint.__aexit__ = AsyncMock(return_value=False)
+        db_mock.begin_nested = MagicMock(return_value=savepoint)
+        return db_mock
+
+    @pytest.mark.asyncio
+    async def test_find_or_create_is_single_upsert(self):
+        """Test a login issues one INSERT ... ON CONFLICT ... RETURNING"""
+        user = User(id=1, email="clerk@example.com", nickname="Clerk User", clerk_id="user_123")
+        result = MagicMock()
+        result.scalar_one.return_value = user
+        db_mock = self._db_mock(return_value=result)
+
+        assert await self.service._find_or_create_clerk_user(db_mock, self.payload) is user
+
+        assert db_mock.execute.await_count == 1
+        sql = str(db_mock.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+        assert "ON CONFLICT (clerk_id) DO UPDATE" in sql
+        assert "RETURNING" in sql
+        db_mock.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_find_or_create_links_existing_email(self):
+        """Test an email conflict links the unclaimed account with that email"""
+        user = User(id=1, email="clerk@example.com", nickname="Clerk User", clerk_id="user_123")
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = user
+        db_mock = self._db_mock(
+            side_effect=[IntegrityError("INSERT", {}, Exception("email")), result]
+        )
+
+        assert await self.service._find_or_create_clerk_user(db_mock, self.payload) is user
+
+        # Only the savepoint is rolled back, never the caller's transaction
+        assert db_mock.begin_nested.call_count == 2
+        db_mock.rollback.assert_not_awaited()
+        sql = str(db_mock.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+        assert sql.startswith("UPDATE users SET clerk_id=")
+        assert "users.clerk_id IS NULL" in sql
+        db_mock.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_find_or_create_email_claimed_by_other_clerk_account(self):
+        """Test an email linked to a different Clerk account is not taken over"""
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = None
+        db_mock = self._db_mock(
+            side_effect=[IntegrityError("INSERT", {}, Exception("email")), result]
+        )
+
+        with pytest.raises(AuthenticationError, match="already linked"):
+            await self.service._find_or_create_clerk_user(db_mock, self.payload)
+
+        assert not db_mock.commit.called
+
+    @pytest.mark.asyncio
+    async def test_find_or_create_new_email_owned_by_unlinked_account(self):
+        """Test a linked user switching to another account's email is rejected, not a 500"""
+        db_mock = self._db_mock(side_effect=[
+            IntegrityError("INSERT", {}, Exception("email")),
+            IntegrityError("UPDATE", {}, Exception("clerk_id")),
+        ])
+
+        with pytest.raises(AuthenticationError, match="already used"):
+            await self.service._find_or_create_clerk_user(db_mock, self.payload)
+
+        assert not db_mock.commit.called
+        db_mock.rollback.assert_not_awaited()
+
+
+class TestClerkUserInfo:
+    """Test Clerk Backend API user lookups"""
+
+    def setup_method(self):
+        self.service = ClerkAuthService()
+        self.api_client = MagicMock()
+        self.api_client.get = AsyncMock()
+        self.service._api_client = self.api_client
+
+    @pytest.mark.asyncio
+    async def test_get_clerk_user_info_reuses_client(self):
+        """Test lookups go through the pooled API client"""
+        response = MagicMock(status_code=200)
+        response.content = json.dumps({
+            "primary_email_address_id": "e2",
+            "email_addresses": [
+                {"id": "e1", "email_address": "old@example.com"},
+                {"id": "e2", "email_address": "clerk@example.com"}
+            ],
+            "first_name": "Clerk"
+        }).encode()
+        self.api_client.get.return_value = response
+        self.service._clerk_secret = "sk_test"
+
+        first = await self.service._get_clerk_user_info("user_1")
+        await self.service._get_clerk_user_info("user_2")
+
+        assert first["email"] == "clerk@example.com"
+        assert [c.args[0] for c in self.api_client.get.await_args_list] == [
+            "/v1/users/user_1", "/v1/users/user_2"
+        ]
+        assert self.service._get_api_client() is self.api_client
+
+    @pytest.mark.asyncio
+    async def test_get_clerk_user_info_cached_and_coalesced(self):
+        """Test concurrent and repeated lookups share one API call"""
+        release = asyncio.Event()
+
+        async def fetch(user_id):
+            await release.wait()
+            return {"email": f"{user_id}@example.com"}
+
+        self.service._fetch_clerk_user_info = AsyncMock(side_effect=fetch)
+
+        pending = [
+            asyncio.create_task(self.service._get_clerk_user_info("user_1"))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*pending)
+        again = await self.service._get_clerk_user_info("user_1")
+
+        assert all(r["email"] == "user_1@example.com" for r in results + [again])
+        self.service._fetch_clerk_user_info.assert_awaited_once_with("user_1")
+
+    @pytest.mark.asyncio
+    async def test_get_clerk_user_info_errors_not_cached(self):
+        """Test failed lookups are retried on the next call"""
+        self.service._fetch_clerk_user_info = AsyncMock(
+            side_effect=[AuthenticationError("Clerk API error: 404"), {"email": "a@example.com"}]
+        )
+
+        with pytest.raises(AuthenticationError):
+            await self.service._get_clerk_user_info("user_1")
+        assert (await self.service._get_clerk_user_info("user_1"))["email"] == "a@example.com"
+
+
+class TestClerkLinkAccount:
+    """Test linking a Clerk account to an existing user"""
+
+    def setup_method(self):
+        self.service = ClerkAuthService()
+        self.service.verify_clerk_token = AsyncMock(return_value={"sub": "user_123"})
+
+    @pytest.mark.asyncio
+    async def test_link_is_single_update(self):
+        """Test linking issues one UPDATE ... RETURNING"""
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = "linked@example.com"
+        db_mock = AsyncMock()
+        db_mock.execute = AsyncMock(return_value=result)
+
+        assert await self.service.link_clerk_to_existing_user(db_mock, 1, "token") is True
+
+        assert db_mock.execute.await_count == 1
+        sql = str(db_mock.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+        assert sql.startswith("UPDATE users SET clerk_id=")
+        db_mock.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_link_missing_user(self):
+        """Test linking to an unknown user id fails without committing"""
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = None
+        db_mock = AsyncMock()
+        db_mock.execute = AsyncMock(return_value=result)
+
+        with pytest.raises(AuthenticationError, match="User not found"):
+            await self.service.link_clerk_to_existing_user(db_mock, 1, "token")
+
+        assert not db_mock.commit.called
+
+
+class TestClerkUserLookup:
+    """Test resolving a BountyGo user from a Clerk token"""
+
+    def setup_method(self):
+        self.service = ClerkAuthService()
+        self.service.verify_clerk_token = AsyncMock(return_value={"sub": "user_123"})
+        self.service._get_clerk_user_info = AsyncMock(return_value={"email": "c@example.com"})
+
+    @pytest.mark.asyncio
+    async def test_linked_user_found_by_clerk_id(self):
+        """Test a linked user is found without calling the Clerk API"""
+        user = User(id=1, email="c@example.com", clerk_id="user_123")
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = user
+        db_mock = AsyncMock()
+        db_mock.execute = AsyncMock(return_value=result)
+
+        assert await self.service.get_user_from_clerk_token(db_mock, "token") is user
+
+        assert db_mock.execute.await_count == 1
+        assert not self.service._get_clerk_user_info.called
+
+    @pytest.mark.asyncio
+    async def test_unlinked_user_found_by_email(self):
+        """Test an unlinked user falls back to the Clerk email"""
+        user = User(id=1, email="c@example.com")
+        missing, found = MagicMock(), MagicMock()
+        missing.scalar_one_or_none.return_value = None
+        found.scalar_one_or_none.return_value = user
+        db_mock = AsyncMock()
+        db_mock.execute = AsyncMock(side_effect=[missing, found])
+
+        assert await self.service.get_user_from_clerk_token(db_mock, "token") is user
+        self.service._get_clerk_user_info.assert_awaited_once_with("user_123")
+
+    @pytest.mark.asyncio
+    async def test_unlinked_user_uses_token_email(self):
+        """Test the email claim avoids the Clerk API call"""
+        self.service.verify_clerk_token = AsyncMock(
+            return_value={"sub": "user_123", "email": "c@example.com"}
+        )
+        missing, found = MagicMock(), MagicMock()
+        missing.scalar_one_or_none.return_value = None
+        found.scalar_one_or_none.return_value = User(id=1, email="c@example.com")
+        db_mock = AsyncMock()
+        db_mock.execute = AsyncMock(side_effect=[missing, found])
+
+        assert await self.service.get_user_from_clerk_token(db_mock, "token") is not None
+        assert not self.service._get_clerk_user_info.called
+
+
+def test_supported_providers_is_shared_constant():
+    """Test the providers list is not rebuilt per call"""
+    service = ClerkAuthService()
+
+    assert service.get_supported_providers() is ClerkAuthService.SUPPORTED_PROVIDERS
+    assert "google" in service.get_supported_providers()
@@ -2,9 +2,15 @@
 Google OAuth authentication tests
 """
 import pytest
+import asyncio
 import json
+import threading
+import jwt
 from unittest.mock import AsyncMock, MagicMock, patch
 from httpx import AsyncClient
+from cryptography.hazmat.primitives.asymmetric import rsa
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
 
 from app.main import app
@@ -243,117 +249,87 @@ class TestGoogleOAuthEndpoints:
 
 class TestGoogleOAuthUserManagement:
     """Test Google OAuth user management"""
-    
-    @pytest.mark.asyncio
-    async def test_get_or_create_google_user_new_user(self):
-        """Test creating new user from Google OAuth"""
-        from app.services.user import user_service
-        
-        db_mock = AsyncMock()
-        google_user_info = GoogleUserInfo(
+
+    @pytest.fixture
+    def google_user_info(self):
+        return GoogleUserInfo(
             google_id="google_user_123",
-            email="newuser@example.com",
-            nickname="New User",
+            email="user@example.com",
+            nickname="Google User",
             avatar_url="https://example.com/avatar.jpg",
             verified_email=True
         )
-        
-        # Mock database operations
-        db_mock.execute.return_value.scalar_one_or_none.return_value = None  # User doesn't exist
-        
-        with patch.object(user_service, 'create') as mock_create:
-            mock_create.return_value = User(
-                id=1,
-                google_id="google_user_123",
-                email="newuser@example.com",
-                nickname="New User",
-                avatar_url="https://example.com/avatar.jpg",
-                is_active=True
-            )
-            
-            user = await user_service.get_or_create_google_user(db_mock, google_user_info)
-            
-            assert user.google_id == "google_user_123"
-            assert user.email == "newuser@example.com"
-            assert user.nickname == "New User"
-            mock_create.assert_called_once()
+
+    @staticmethod
+    def _db_mock(**execute):
+        """Session mock whose savepoints propagate errors like the real one"""
+        db_mock = AsyncMock()
+        db_mock.execute = AsyncMock(**execute)
+        savepoint = MagicMock()
+        savepoint.__aenter__ = AsyncMock()
+        savepoint.__aexit__ = AsyncMock(return_value=False)
+        db_mock.begin_nested = MagicMock(return_value=savepoint)
+        return db_mock
+
+    @staticmethod
+    def _sql(db_mock) -> str:
+        return str(db_mock.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
     
     @pytest.mark.asyncio
-    async def test_get_or_create_google_user_existing_user(self):
-        """Test getting existing user from Google OAuth"""
+    async def test_get_or_create_google_user_is_single_upsert(self, google_user_info):
+        """Test a login creates or refreshes the user with one INSERT ... ON CONFLICT"""
         from app.services.user import user_service
-        
-        db_mock = AsyncMock()
-        google_user_info = GoogleUserInfo(
-            google_id="google_user_123",
-            email="existing@example.com",
-            nickname="Existing User",
-            avatar_url="https://example.com/avatar.jpg",
-            verified_email=True
-        )
-        
-        existing_user = User(
-            id=1,
-            google_id="google_user_123",
-            email="existing@example.com",
-            nickname="Existing User",
-            avatar_url="https://example.com/avatar.jpg",
-            is_active=True
-        )
-        
-        # Mock database operations
-        mock_result = MagicMock()
-        mock_result.scalar_one_or_none.return_value = existing_user
-        db_mock.execute.return_value = mock_result
-        
-        user = await user_service.get_or_create_google_user(db_mock, google_user_info)
-        
-        assert user.id == 1
-        assert user.google_id == "google_user_123"
-        assert user.email == "existing@example.com"
-    
+
+        user = User(id=1, google_id="google_user_123", email="user@example.com", is_active=True)
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = user
+        db_mock = self._db_mock(return_value=result)
+
+        assert await user_service.get_or_create_google_user(db_mock, google_user_info) is user
+
+        assert db_mock.execute.await_count == 1
+        sql = self._sql(db_mock)
+        assert "ON CONFLICT (google_id) DO UPDATE" in sql
+        assert "nickname = excluded.nickname" in sql
+        assert "WHERE users.is_active = true" in sql
+        assert "RETURNING" in sql
+        db_mock.commit.assert_awaited_once()
+
     @pytest.mark.asyncio
-    async def test_get_or_create_google_user_inactive_user(self):
-        """Test reactivating inactive user from Google OAuth"""
+    async def test_get_or_create_google_user_links_existing_email(self, google_user_info):
+        """Test an email conflict links the Google ID to the existing account"""
         from app.services.user import user_service
-        
-        db_mock = AsyncMock()
-        google_user_info = GoogleUserInfo(
-            google_id="google_user_123",
-            email="inactive@example.com",
-            nickname="Inactive User",
-            avatar_url="https://example.com/avatar.jpg",
-            verified_email=True
-        )
-        
-        inactive_user = User(
-            id=1,
-            google_id="google_user_123",
-            email="inactive@example.com",
-            nickname="Inactive User",
-            avatar_url="https://example.com/avatar.jpg",
-            is_active=False  # Inactive user
+
+        user = User(id=1, google_id="google_user_123", email="user@example.com", is_active=True)
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = user
+        db_mock = self._db_mock(
+            side_effect=[IntegrityError("INSERT", {}, Exception("email")), result]
         )
-        
-        # Mock database operations
-        mock_result = MagicMock()
-        mock_result.scalar_one_or_none.return_value = inactive_user
-        db_mock.execute.return_value = mock_result
-        
-        with patch.object(user_service, 'update') as mock_update:
-            mock_update.return_value = User(
-                id=1,
-                google_id="google_user_123",
-                email="inactive@example.com",
-                nickname="Inactive User",
-                avatar_url="https://example.com/avatar.jpg",
-                is_active=True  # Reactivated
-            )
-            
-            user = await user_service.get_or_create_google_user(db_mock, google_user_info)
-            
-            assert user.is_active is True
-            mock_update.assert_called_once()
+
+        assert await user_service.get_or_create_google_user(db_mock, google_user_info) is user
+
+        # Only the savepoint is rolled back, never the caller's transaction
+        db_mock.begin_nested.assert_called_once()
+        db_mock.rollback.assert_not_awaited()
+        sql = self._sql(db_mock)
+        assert sql.startswith("UPDATE users SET google_id=coalesce(users.google_id,")
+        db_mock.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_get_or_create_google_user_inactive_user(self, google_user_info):
+        """Test an inactive account is neither updated nor logged in"""
+        from app.services.user import user_service
+        from app.core.exceptions import InactiveUserError
+
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = None
+        db_mock = self._db_mock(return_value=result)
+
+        with pytest.raises(InactiveUserError):
+            await user_service.get_or_create_google_user(db_mock, google_user_info)
+
+        assert not db_mock.commit.called
 
 
 class TestGoogleOAuthSecurity:
@@ -704,5 +680,160 @@ class TestGoogleOAuthPerformance:
                     assert response_time < 1.0  # Should respond within 1 second
 
 
+
+class TestGoogleIdTokenCache:
+    """Test reuse of verified Google ID token claims"""
+
+    def setup_method(self):
+        from app.services.google_auth import GoogleAuthService
+
+        self.service = GoogleAuthService()
+        self.idinfo = {
+            "iss": "https://accounts.google.com",
+            "aud": self.service.client_id,
+            "sub": "google_user_123",
+            "email": "test@example.com",
+            "email_verified": True,
+            "exp": int(datetime.utcnow().timestamp()) + 3600
+        }
+        self.token = "header." + "p" * 120 + ".signature"
+
+    @pytest.mark.asyncio
+    async def test_entry_points_share_verification(self):
+        """Test a token is signature-checked once across both entry points"""
+        with patch.object(self.service, '_decode_id_token', return_value=self.idinfo) as mock_verify:
+            await self.service.verify_and_get_user_info(self.token)
+            user_info = await self.service.verify_google_token(self.token)
+
+        assert user_info.google_id == "google_user_123"
+        mock_verify.assert_called_once()
+        # Only the token hash is used as the cache key
+        assert self.service._id_token_cache.get(self.token) is None
+
+    @pytest.mark.asyncio
+    async def test_verification_runs_off_event_loop(self):
+        """Test signature verification runs in a worker thread"""
+        loop_thread = threading.get_ident()
+        threads = []
+
+        def verify(token):
+            threads.append(threading.get_ident())
+            return self.idinfo
+
+        with patch.object(self.service, '_decode_id_token', side_effect=verify):
+            await self.service.verify_google_token(self.token)
+
+        assert threads and threads[0] != loop_thread
+
+    def _mock_jwks(self, keys):
+        """Replace the JWKS client with one serving the given keys"""
+        self.service._jwks_client = MagicMock()
+        self.service._jwks_client.get_signing_keys.return_value = keys
+        self.service._jwks_client.match_kid.side_effect = jwt.PyJWKClient.match_kid
+
+    def test_unknown_kid_refetch_is_rate_limited(self):
+        """Test made-up kids trigger at most one JWKS refetch per interval"""
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+        self._mock_jwks([jwt.PyJWK({**jwk, "kid": "google-1", "alg": "RS256"})])
+        get_keys = self.service._jwks_client.get_signing_keys
+
+        for i in range(5):
+            forged = jwt.encode(self.idinfo, private_key, algorithm="RS256", headers={"kid": f"forged-{i}"})
+            with pytest.raises(jwt.PyJWKClientError):
+                self.service._decode_id_token(forged)
+
+        refreshes = [c for c in get_keys.call_args_list if c.kwargs.get("refresh")]
+        assert len(refreshes) == 1
+
+        # Past the interval a rotated key is picked up again
+        self.service._jwks_refreshed_at -= self.service.GOOGLE_CERTS_MIN_REFRESH_SECONDS
+        get_keys.side_effect = lambda refresh=False: (
+            [jwt.PyJWK({**jwk, "kid": "google-2", "alg": "RS256"})] if refresh else get_keys.return_value
+        )
+        rotated = jwt.encode(self.idinfo, private_key, algorithm="RS256", headers={"kid": "google-2"})
+        assert self.service._decode_id_token(rotated)["sub"] == "google_user_123"
+
+    def test_decode_checks_signature_audience_and_issuer(self):
+        """Test ID tokens are verified locally against the cached JWKS"""
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+        self._mock_jwks([jwt.PyJWK({**jwk, "kid": "google-1", "alg": "RS256"})])
+
+        def sign(**claims):
+            return jwt.encode({**self.idinfo, **claims}, private_key, algorithm="RS256",
+                              headers={"kid": "google-1"})
+
+        assert self.service._decode_id_token(sign())["sub"] == "google_user_123"
+        # Both issuer spellings Google uses are accepted
+        assert self.service._decode_id_token(sign(iss="accounts.google.com"))["sub"] == "google_user_123"
+        with pytest.raises(jwt.InvalidAudienceError):
+            self.service._decode_id_token(sign(aud="other.apps.googleusercontent.com"))
+        with pytest.raises(jwt.InvalidIssuerError):
+            self.service._decode_id_token(sign(iss="https://evil.example.com"))
+
+    @pytest.mark.asyncio
+    async def test_expired_claims_are_not_reused(self):
+        """Test cached claims past exp force a fresh verification"""
+        with patch.object(self.service, '_decode_id_token', return_value=self.idinfo) as mock_verify:
+            await self.service.verify_google_token(self.token)
+            self.idinfo["exp"] = int(datetime.utcnow().timestamp()) - 1
+            await self.service.verify_google_token(self.token)
+
+        assert mock_verify.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_verification_is_not_cached(self):
+        """Test rejected tokens are verified again on every attempt"""
+        with patch.object(self.service, '_decode_id_token',
+                          side_effect=jwt.InvalidSignatureError("Signature verification failed")) as mock_verify:
+            for _ in range(2):
+                with pytest.raises(GoogleAuthenticationError):
+                    await self.service.verify_google_token(self.token)
+
+        assert mock_verify.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_google_calls_share_pooled_client(self):
+        """Test Google API calls reuse the service's keep-alive client"""
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"access_token": "new"}
+        self.service._http = MagicMock()
+        self.service._http.post = AsyncMock(return_value=response)
+        self.service._http.get = AsyncMock(return_value=response)
+
+        assert await self.service.refresh_google_token("refresh") == {"access_token": "new"}
+        assert await self.service.get_google_user_info("access") == {"access_token": "new"}
+        assert await self.service.revoke_google_access("access") is True
+
+        assert self.service._http.post.await_count == 2
+        self.service._http.get.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_google_calls_bounded_by_semaphore(self):
+        """Test concurrent Google API calls never exceed the in-flight cap"""
+        in_flight = 0
+        peak = 0
+
+        async def slow_post(*args, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return MagicMock(status_code=200)
+
+        self.service._http = MagicMock()
+        self.service._http.post = slow_post
+        self.service._google_semaphore = asyncio.Semaphore(2)
+
+        results = await asyncio.gather(
+            *(self.service.revoke_google_access(f"access-{i}") for i in range(6))
+        )
+
+        assert all(results)
+        assert peak == 2
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
@@ -148,7 +148,7 @@ async def test_google_oauth_endpoint():
         expires_in=900
     )
     
-    with patch('google.oauth2.id_token.verify_oauth2_token') as mock_verify:
+    with patch('app.services.google_auth.google_auth_service._decode_id_token') as mock_verify:
         with patch('app.services.user.user_service.get_or_create_google_user') as mock_get_create:
             with patch('app.services.auth.auth_service.create_token_pair') as mock_create_tokens:
                 
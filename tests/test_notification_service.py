@@ -0,0 +1,413 @@
+"""
+Notification service tests
+"""
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from sqlalchemy import event, select
+
+from app.models.notification import (
+    Notification,
+    NotificationType,
+    NotificationStatus,
+    NotificationTemplate,
+    UserNotificationPreference
+)
+from app.models.task import Task, Todo
+from app.models.user import User
+from app.schemas.notification import UserNotificationPreferenceUpdate
+from app.schemas.task import REMIND_T_1D, REMIND_DDL_2H, remind_flags_to_json
+from app.services.notification import (
+    notification_service,
+    task_reminder_scheduler,
+    user_notification_preference_service
+)
+
+
+@pytest.fixture
+async def session(fresh_db_session):
+    """In-memory database with the application schema and one user"""
+    # Cached templates belong to the previous test's database
+    notification_service.invalidate_template_cache()
+    fresh_db_session.add(User(id=1, email="user@example.com", nickname="User", is_active=True))
+    await fresh_db_session.commit()
+    return fresh_db_session
+
+
+class TestGetUserNotifications:
+    """Test paginated notification listing"""
+
+    @pytest.mark.asyncio
+    async def test_total_counts_matching_rows(self, session):
+        """Test the total is a COUNT over the same filters as the page"""
+        now = datetime.utcnow()
+        session.add_all([
+            Notification(
+                user_id=1, type="task_reminder_1d", channel="websocket",
+                status="sent" if i % 3 == 0 else "pending",
+                title=f"n{i}", message="m", scheduled_at=now + timedelta(minutes=i)
+            )
+            for i in range(7)
+        ])
+        await session.commit()
+
+        page, total = await notification_service.get_user_notifications(session, 1, page=1, size=2)
+        assert (len(page), total) == (2, 7)
+
+        sent, total = await notification_service.get_user_notifications(
+            session, 1, size=10, status=NotificationStatus.SENT
+        )
+        assert total == 3
+        assert {n.title for n in sent} == {"n0", "n3", "n6"}
+
+
+class TestScheduleTaskReminders:
+    """Test batched reminder scheduling"""
+
+    async def _seed_task(self, session, participants: int) -> Task:
+        """A task due in four days joined by the given number of users"""
+        now = datetime.utcnow()
+        task = Task(
+            title="Bounty",
+            sponsor_id=1,
+            deadline=int(now.timestamp()) + 4 * 24 * 3600
+        )
+        session.add(task)
+        await session.flush()
+
+        for i in range(participants):
+            user = User(email=f"joiner{i}@example.com", nickname=f"Joiner {i}", is_active=True)
+            session.add(user)
+            await session.flush()
+            # The last joiner has no stored preferences yet
+            if i < participants - 1:
+                session.add(UserNotificationPreference(
+                    user_id=user.id, telegram_enabled=True, websocket_enabled=True
+                ))
+            session.add(Todo(user_id=user.id, task_id=task.id, added_at=now))
+
+        await session.commit()
+        return task
+
+    @pytest.mark.asyncio
+    async def test_reminders_inserted_in_one_statement(self, session):
+        """Test all users' reminders are written by a single INSERT"""
+        task = await self._seed_task(session, participants=3)
+        inserts = []
+        preference_queries = []
+
+        def count_inserts(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("INSERT INTO notifications"):
+                inserts.append(statement)
+            elif statement.startswith("SELECT") and "FROM user_notification_preferences" in statement:
+                preference_queries.append(statement)
+
+        sync_engine = session.bind.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", count_inserts)
+        try:
+            await task_reminder_scheduler.schedule_task_reminders(session, task.id)
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", count_inserts)
+
+        notifications = (await session.execute(select(Notification))).scalars().all()
+        # 2 users x 3 reminders x 2 channels, plus 3 websocket-only defaults
+        assert len(notifications) == 15
+        assert len(inserts) == 1
+        assert len(preference_queries) == 1
+        assert {n.channel for n in notifications} == {"telegram", "websocket"}
+        assert all(n.status == "pending" and n.title for n in notifications)
+
+        # Default templates were created once per (type, channel)
+        templates = (await session.execute(select(NotificationTemplate))).scalars().all()
+        assert len(templates) == 6
+
+    @pytest.mark.asyncio
+    async def test_content_rendered_once_per_template(self, session):
+        """Test each (type, channel) template is formatted once, not per user"""
+        task = await self._seed_task(session, participants=3)
+
+        with patch.object(
+            notification_service, "_generate_notification_content",
+            wraps=notification_service._generate_notification_content
+        ) as mock_render:
+            await task_reminder_scheduler.schedule_task_reminders(session, task.id)
+
+        assert mock_render.call_count == 6
+
+    @pytest.mark.asyncio
+    async def test_todo_remind_flags_select_reminders(self, session):
+        """Test stored todo flags and malformed values map onto reminder types"""
+        task = await self._seed_task(session, participants=2)
+        todos = (await session.execute(select(Todo).order_by(Todo.id))).scalars().all()
+        todos[0].remind_flags = remind_flags_to_json(REMIND_T_1D | REMIND_DDL_2H)
+        todos[1].remind_flags = "not json"
+        await session.commit()
+
+        await task_reminder_scheduler.schedule_task_reminders(session, task.id)
+
+        notifications = (await session.execute(select(Notification))).scalars().all()
+        by_user = {}
+        for n in notifications:
+            by_user.setdefault(n.user_id, set()).add(n.type)
+        assert by_user[todos[0].user_id] == {
+            NotificationType.TASK_REMINDER_1D.value, NotificationType.TASK_REMINDER_2H.value
+        }
+        # Unparseable flags fall back to every reminder
+        assert len(by_user[todos[1].user_id]) == 3
+
+    @pytest.mark.asyncio
+    async def test_task_marked_scheduled_only_once_joined(self, session):
+        """Test reminder_scheduled_at is stamped with the reminders, not for empty tasks"""
+        empty = await self._seed_task(session, participants=0)
+        joined = await self._seed_task(session, participants=1)
+
+        await task_reminder_scheduler.schedule_task_reminders(session, empty.id)
+        await task_reminder_scheduler.schedule_task_reminders(session, joined.id)
+
+        await session.refresh(empty)
+        await session.refresh(joined)
+        assert empty.reminder_scheduled_at is None
+        assert joined.reminder_scheduled_at is not None
+
+    @pytest.mark.asyncio
+    async def test_late_joiner_gets_only_own_reminders(self, session):
+        """Test a user joining a scanned task is scheduled without duplicating others"""
+        task = await self._seed_task(session, participants=1)
+        await task_reminder_scheduler.schedule_task_reminders(session, task.id)
+        await session.refresh(task)
+        scanned_at = task.reminder_scheduled_at
+        before = (await session.execute(select(Notification))).scalars().all()
+
+        late = User(email="late@example.com", nickname="Late", is_active=True)
+        session.add(late)
+        await session.flush()
+        session.add(Todo(user_id=late.id, task_id=task.id, added_at=datetime.utcnow()))
+        await session.commit()
+
+        await task_reminder_scheduler.schedule_task_reminders(session, task.id, user_id=late.id)
+
+        notifications = (await session.execute(select(Notification))).scalars().all()
+        added = [n for n in notifications if n.user_id == late.id]
+        # Three websocket-only defaults for the new user, nothing new for the first
+        assert len(added) == 3
+        assert len(notifications) == len(before) + 3
+        await session.refresh(task)
+        assert task.reminder_scheduled_at == scanned_at
+
+
+class TestGetNotificationTemplates:
+    """Test batched template lookup"""
+
+    @pytest.mark.asyncio
+    async def test_accepts_one_shot_iterable(self, session):
+        """Test a generator of pairs is looked up, not mistaken for all-cached"""
+        wanted = [
+            (NotificationType.TASK_REMINDER_1D, "websocket"),
+            (NotificationType.TASK_REMINDER_2H, "telegram"),
+        ]
+
+        templates = await notification_service.get_notification_templates(
+            session, (pair for pair in wanted)
+        )
+
+        assert set(templates) == set(wanted)
+        stored = (await session.execute(select(NotificationTemplate))).scalars().all()
+        assert len(stored) == 2
+
+
+class TestCreateTaskReminder:
+    """Test single reminder creation"""
+
+    @pytest.mark.asyncio
+    async def test_preloaded_task_is_not_refetched(self, session):
+        """Test passing the task skips the Task SELECT"""
+        task = Task(title="Bounty", sponsor_id=1, deadline=int(datetime.utcnow().timestamp()) + 3600)
+        session.add(task)
+        await session.commit()
+        task_queries = []
+
+        def count_task_queries(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("SELECT") and "FROM tasks" in statement:
+                task_queries.append(statement)
+
+        sync_engine = session.bind.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", count_task_queries)
+        try:
+            notification = await notification_service.create_task_reminder(
+                session, 1, task.id, NotificationType.TASK_REMINDER_2H,
+                datetime.utcnow(), task=task
+            )
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", count_task_queries)
+
+        assert notification.title == "Task Reminder - 2 Hours Left"
+        assert task_queries == []
+
+    @pytest.mark.asyncio
+    async def test_due_reminder_wakes_scheduler(self, session):
+        """Test only reminders that are already due wake the delivery loop"""
+        from app.services.scheduler import scheduler_manager
+        task = Task(title="Bounty", sponsor_id=1, deadline=int(datetime.utcnow().timestamp()) + 3600)
+        session.add(task)
+        await session.commit()
+
+        with patch.object(scheduler_manager.notification_scheduler, "wakeup") as mock_wakeup:
+            await notification_service.create_task_reminder(
+                session, 1, task.id, NotificationType.TASK_REMINDER_2H,
+                datetime.utcnow() + timedelta(hours=1), task=task
+            )
+            mock_wakeup.assert_not_called()
+
+            await notification_service.create_task_reminder(
+                session, 1, task.id, NotificationType.TASK_REMINDER_2H,
+                datetime.utcnow() - timedelta(seconds=1), task=task
+            )
+            mock_wakeup.assert_called_once()
+
+
+class TestNotificationTemplates:
+    """Test in-process template caching"""
+
+    @pytest.mark.asyncio
+    async def test_template_cached_until_invalidated(self, session):
+        """Test repeated lookups skip the template SELECT"""
+        session.add(NotificationTemplate(
+            type=NotificationType.TASK_REMINDER_1D.value, channel="websocket",
+            title_template="Due soon", message_template="{task_title}"
+        ))
+        await session.commit()
+        template_queries = []
+
+        def count_template_queries(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("SELECT") and "FROM notification_templates" in statement:
+                template_queries.append(statement)
+
+        sync_engine = session.bind.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", count_template_queries)
+        try:
+            first = await notification_service.get_notification_template(
+                session, NotificationType.TASK_REMINDER_1D, "websocket"
+            )
+            batch = await notification_service.get_notification_templates(
+                session, [(NotificationType.TASK_REMINDER_1D, "websocket")]
+            )
+            assert batch[(NotificationType.TASK_REMINDER_1D, "websocket")] is first
+            assert len(template_queries) == 1
+
+            notification_service.invalidate_template_cache()
+            await notification_service.get_notification_template(
+                session, NotificationType.TASK_REMINDER_1D, "websocket"
+            )
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", count_template_queries)
+
+        assert len(template_queries) == 2
+
+
+class TestNotificationUpdates:
+    """Test single-statement status and preference updates"""
+
+    @pytest.mark.asyncio
+    async def test_mark_sent_and_failed(self, session):
+        """Test status updates report whether the notification exists"""
+        notification = Notification(
+            user_id=1, type="task_reminder_1d", channel="telegram",
+            title="t", message="m", scheduled_at=datetime.utcnow()
+        )
+        session.add(notification)
+        await session.commit()
+
+        assert await notification_service.mark_notification_sent(session, notification.id, "tg-1")
+        assert not await notification_service.mark_notification_sent(session, 999)
+        assert await notification_service.mark_notification_failed(session, notification.id, "boom")
+        assert not await notification_service.mark_notification_failed(session, 999, "boom")
+
+        await session.refresh(notification)
+        assert (notification.delivery_id, notification.error_message) == ("tg-1", "boom")
+
+    @pytest.mark.asyncio
+    async def test_update_preferences_returns_updated_row(self, session):
+        """Test preferences are updated in place, or created when missing"""
+        created = await user_notification_preference_service.update_user_preferences(
+            session, 1, UserNotificationPreferenceUpdate(telegram_enabled=True)
+        )
+        assert created.telegram_enabled is True
+        assert created.websocket_enabled is True
+
+        updated = await user_notification_preference_service.update_user_preferences(
+            session, 1, UserNotificationPreferenceUpdate(websocket_enabled=False)
+        )
+        assert updated.id == created.id
+        assert (updated.telegram_enabled, updated.websocket_enabled) == (True, False)
+
+    @pytest.mark.asyncio
+    async def test_failed_delivery_retried_until_max_retries(self, session):
+        """Test failures keep the notification pending until the last retry"""
+        notification = Notification(
+            user_id=1, type="task_reminder_1d", channel="telegram", title="t",
+            message="m", scheduled_at=datetime.utcnow() - timedelta(minutes=1)
+        )
+        session.add(notification)
+        await session.commit()
+
+        for attempt in range(1, notification.max_retries + 1):
+            pending = await notification_service.get_pending_notifications(session)
+            assert [n.id for n in pending] == [notification.id]
+
+            await notification_service.mark_notification_failed(session, notification.id, "boom")
+            await session.refresh(notification)
+            assert notification.retry_count == attempt
+
+        assert notification.status == "failed"
+        assert await notification_service.get_pending_notifications(session) == []
+
+    @pytest.mark.asyncio
+    async def test_pending_notifications_load_relations_in_one_query(self, session):
+        """Test user and task are joined into the pending query"""
+        session.add(Notification(
+            user_id=1, type="task_reminder_1d", channel="telegram", title="t",
+            message="m", scheduled_at=datetime.utcnow() - timedelta(minutes=1)
+        ))
+        await session.commit()
+        session.expunge_all()
+        queries = []
+
+        def count_queries(conn, cursor, statement, parameters, context, executemany):
+            queries.append(statement)
+
+        sync_engine = session.bind.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", count_queries)
+        try:
+            pending = await notification_service.get_pending_notifications(session)
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", count_queries)
+
+        assert len(queries) == 1
+        assert pending[0].user.email == "user@example.com"
+        assert pending[0].task is None
+
+    @pytest.mark.asyncio
+    async def test_has_due_notifications(self, session):
+        """Test the probe only reports rows that are due and retryable"""
+        assert await notification_service.has_due_notifications(session) is False
+
+        session.add_all([
+            Notification(
+                user_id=1, type="task_reminder_1d", channel="telegram", title="future",
+                message="m", scheduled_at=datetime.utcnow() + timedelta(hours=1)
+            ),
+            Notification(
+                user_id=1, type="task_reminder_1d", channel="telegram", title="exhausted",
+                message="m", scheduled_at=datetime.utcnow() - timedelta(minutes=1),
+                retry_count=3, max_retries=3
+            ),
+        ])
+        await session.commit()
+        assert await notification_service.has_due_notifications(session) is False
+
+        session.add(Notification(
+            user_id=1, type="task_reminder_1d", channel="telegram", title="due",
+            message="m", scheduled_at=datetime.utcnow() - timedelta(minutes=1)
+        ))
+        await session.commit()
+        assert await notification_service.has_due_notifications(session) is True
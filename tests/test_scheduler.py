@@ -0,0 +1,208 @@
+"""
+Background scheduler tests
+"""
+import asyncio
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.task import Task, Todo
+from app.models.user import User
+from app.services.scheduler import NotificationScheduler, SchedulerManager, TaskReminderSchedulerService
+
+
+class TestSchedulerManager:
+    """Test the consolidated scheduler loop"""
+
+    def setup_method(self):
+        """Set up a manager whose jobs are mocked out"""
+        self.manager = SchedulerManager()
+        self.manager.notification_scheduler.POLL_INTERVAL_SECONDS = 60
+        self.manager.task_reminder_scheduler.POLL_INTERVAL_SECONDS = 60
+        self.process = patch.object(
+            self.manager.notification_scheduler, "_process_notifications", new_callable=AsyncMock
+        )
+        self.schedule = patch.object(
+            self.manager.task_reminder_scheduler, "_schedule_upcoming_reminders", new_callable=AsyncMock
+        )
+
+    @pytest.mark.asyncio
+    async def test_wakeup_triggers_processing_before_poll_interval(self):
+        """Test wakeup() drains pending notifications without waiting for the poll"""
+        with self.process as mock_process, self.schedule as mock_schedule:
+            await self.manager.start_all()
+            try:
+                await asyncio.sleep(0.01)
+                assert mock_process.await_count == 1
+                assert mock_schedule.await_count == 1
+
+                self.manager.notification_scheduler.wakeup()
+                await asyncio.sleep(0.01)
+                assert mock_process.await_count == 2
+                # The reminder scan keeps its own interval
+                assert mock_schedule.await_count == 1
+            finally:
+                await self.manager.stop_all()
+
+    @pytest.mark.asyncio
+    async def test_wakeup_during_processing_is_not_lost(self):
+        """Test a wakeup raised mid-drain causes another pass"""
+        calls = 0
+
+        async def process():
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                self.manager.notification_scheduler.wakeup()
+
+        with patch.object(self.manager.notification_scheduler, "_process_notifications",
+                          side_effect=process), self.schedule:
+            await self.manager.start_all()
+            try:
+                await asyncio.sleep(0.01)
+            finally:
+                await self.manager.stop_all()
+
+        assert calls == 2
+
+    @pytest.mark.asyncio
+    async def test_jobs_poll_on_their_own_intervals(self):
+        """Test each job runs on its own interval with no wakeups"""
+        self.manager.notification_scheduler.POLL_INTERVAL_SECONDS = 0.01
+
+        with self.process as mock_process, self.schedule as mock_schedule:
+            await self.manager.start_all()
+            try:
+                await asyncio.sleep(0.05)
+            finally:
+                await self.manager.stop_all()
+
+        assert mock_process.await_count >= 2
+        assert mock_schedule.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_failing_job_backs_off_without_stopping_loop(self):
+        """Test an error delays that job but the loop keeps running"""
+        self.manager.task_reminder_scheduler.POLL_INTERVAL_SECONDS = 0.01
+        self.manager.notification_scheduler.ERROR_BACKOFF_SECONDS = 60
+
+        with patch.object(self.manager.notification_scheduler, "_process_notifications",
+                          new_callable=AsyncMock, side_effect=RuntimeError("boom")) as mock_process, \
+                self.schedule as mock_schedule:
+            await self.manager.start_all()
+            try:
+                await asyncio.sleep(0.05)
+            finally:
+                await self.manager.stop_all()
+
+        assert mock_process.await_count == 1
+        assert mock_schedule.await_count >= 2
+
+
+    @pytest.mark.asyncio
+    async def test_failing_job_retries_sooner_than_poll(self):
+        """Test a transient error is retried after the short backoff, not the poll interval"""
+        self.manager.notification_scheduler.RETRY_INITIAL_SECONDS = 0.01
+        self.manager.notification_scheduler._backoff = 0.01
+
+        with patch.object(self.manager.notification_scheduler, "_process_notifications",
+                          new_callable=AsyncMock, side_effect=[RuntimeError("boom"), None]) as mock_process, \
+                self.schedule:
+            await self.manager.start_all()
+            try:
+                await asyncio.sleep(0.05)
+            finally:
+                await self.manager.stop_all()
+
+        # Failed once, recovered on the retry, then back on the 60s poll
+        assert mock_process.await_count == 2
+
+
+class TestScheduledJobBackoff:
+    """Test the per-job retry delay"""
+
+    def test_backoff_doubles_with_jitter_and_resets(self):
+        """Test consecutive failures double the delay up to the cap and success resets it"""
+        job = NotificationScheduler()
+
+        delays = [job._next_delay(failed=True) for _ in range(8)]
+        expected = [1, 2, 4, 8, 16, 32, 60, 60]
+        for delay, base in zip(delays, expected):
+            assert base * 0.8 <= delay <= base * 1.2
+
+        assert job._next_delay(failed=False) == job.POLL_INTERVAL_SECONDS
+        assert 0.8 <= job._next_delay(failed=True) <= 1.2
+
+
+class TestNotificationScheduler:
+    """Test a single notification pass"""
+
+    @pytest.mark.asyncio
+    async def test_idle_pass_skips_senders(self):
+        """Test a pass with nothing due does not query each channel"""
+        scheduler = NotificationScheduler()
+        session = AsyncMock()
+        session_factory = MagicMock(return_value=session)
+
+        with patch("app.core.database.AsyncSessionLocal", session_factory), \
+                patch("app.services.scheduler.notification_service.has_due_notifications",
+                      new_callable=AsyncMock) as mock_due, \
+                patch("app.services.scheduler.telegram_notification_sender.send_pending_notifications",
+                      new_callable=AsyncMock) as mock_telegram, \
+                patch("app.services.scheduler.websocket_notification_sender.send_pending_notifications",
+                      new_callable=AsyncMock) as mock_websocket:
+            mock_due.return_value = False
+            await scheduler._process_notifications()
+            mock_telegram.assert_not_awaited()
+            mock_websocket.assert_not_awaited()
+
+            mock_due.return_value = True
+            await scheduler._process_notifications()
+            mock_telegram.assert_awaited_once_with(session)
+            mock_websocket.assert_awaited_once_with(session)
+
+        # One session object serves every pass and is reset after each
+        session_factory.assert_called_once()
+        assert session.close.await_count == 2
+
+        await scheduler.aclose()
+        assert scheduler._session is None
+
+
+class TestTaskReminderSchedulerService:
+    """Test the hourly upcoming-deadline scan"""
+
+    @pytest.mark.asyncio
+    async def test_scan_picks_unscheduled_tasks_in_window(self, fresh_engine):
+        """Test only active, unscheduled tasks with participants due within seven days are scheduled"""
+        session_factory = async_sessionmaker(bind=fresh_engine, class_=AsyncSession, expire_on_commit=False)
+
+        now = int(datetime.utcnow().timestamp())
+        async with session_factory() as db:
+            db.add(User(id=1, email="sponsor@example.com", nickname="Sponsor", is_active=True))
+            db.add_all([
+                Task(id=1, title="due", sponsor_id=1, deadline=now + 3600),
+                Task(id=2, title="far", sponsor_id=1, deadline=now + 30 * 24 * 3600),
+                Task(id=3, title="past", sponsor_id=1, deadline=now - 3600),
+                Task(id=4, title="closed", sponsor_id=1, deadline=now + 3600, status="completed"),
+                Task(id=5, title="done", sponsor_id=1, deadline=now + 3600,
+                     reminder_scheduled_at=datetime.utcnow()),
+                Task(id=6, title="nobody", sponsor_id=1, deadline=now + 3600),
+                Task(id=7, title="left", sponsor_id=1, deadline=now + 3600),
+            ])
+            # Every task but 6 and 7 has a participant; task 7's only todo was removed
+            added_at = datetime.utcnow()
+            db.add_all([
+                Todo(user_id=1, task_id=task_id, added_at=added_at) for task_id in (1, 2, 3, 4, 5)
+            ])
+            db.add(Todo(user_id=1, task_id=7, added_at=added_at, is_active=False))
+            await db.commit()
+
+        service = TaskReminderSchedulerService()
+        with patch("app.core.database.AsyncSessionLocal", session_factory), \
+                patch("app.services.scheduler.task_reminder_scheduler.schedule_task_reminders",
+                      new_callable=AsyncMock) as mock_schedule:
+            await service._schedule_upcoming_reminders()
+
+        assert [call.args[1] for call in mock_schedule.await_args_list] == [1]
@@ -0,0 +1,97 @@
+"""
+Task endpoint tests
+"""
+import pytest
+from datetime import datetime
+from sqlalchemy import event, select
+
+from app.api.v1.endpoints.tasks import join_task, update_task
+from app.models.notification import Notification
+from app.models.task import Task, Todo
+from app.models.user import User
+from app.schemas.task import TaskUpdate, TodoCreate
+from app.services.notification import notification_service, task_reminder_scheduler
+
+
+@pytest.fixture
+async def session(fresh_db_session):
+    """In-memory database with a sponsor, a joiner and a task due in four days"""
+    notification_service.invalidate_template_cache()
+
+    # Todo.added_at defaults to NOW() on PostgreSQL only
+    @event.listens_for(fresh_db_session.sync_session, "before_flush")
+    def stamp_todos(db, flush_context, instances):
+        for obj in db.new:
+            if isinstance(obj, Todo) and obj.added_at is None:
+                obj.added_at = datetime.utcnow()
+
+    fresh_db_session.add_all([
+        User(id=1, email="sponsor@example.com", nickname="Sponsor", is_active=True),
+        User(id=2, email="joiner@example.com", nickname="Joiner", is_active=True),
+        User(id=3, email="late@example.com", nickname="Late", is_active=True),
+        Task(id=1, title="Bounty", sponsor_id=1,
+             deadline=int(datetime.utcnow().timestamp()) + 4 * 24 * 3600),
+    ])
+    await fresh_db_session.commit()
+    return fresh_db_session
+
+
+async def _reminders(db, user_id=None):
+    """Reminder notifications for task 1, optionally for one user"""
+    query = select(Notification).where(Notification.task_id == 1)
+    if user_id is not None:
+        query = query.where(Notification.user_id == user_id)
+    return (await db.execute(query)).scalars().all()
+
+
+class TestJoinTask:
+    """Test reminder scheduling when joining a task"""
+
+    @pytest.mark.asyncio
+    async def test_join_before_scan_leaves_task_to_scheduler(self, session):
+        """Test joining an unscanned task schedules nothing itself"""
+        await join_task(1, TodoCreate(), current_user=await session.get(User, 2), db=session)
+
+        assert await _reminders(session) == []
+        assert (await session.get(Task, 1)).reminder_scheduled_at is None
+
+    @pytest.mark.asyncio
+    async def test_join_after_scan_schedules_joiner(self, session):
+        """Test a user joining an already scanned task gets their own reminders"""
+        await join_task(1, TodoCreate(), current_user=await session.get(User, 2), db=session)
+        await task_reminder_scheduler.schedule_task_reminders(session, 1)
+        first_scan = len(await _reminders(session))
+        assert first_scan > 0
+
+        await join_task(1, TodoCreate(), current_user=await session.get(User, 3), db=session)
+
+        late = await _reminders(session, user_id=3)
+        assert len(late) == first_scan
+        # The earlier joiner's reminders are not duplicated
+        assert len(await _reminders(session, user_id=2)) == first_scan
+
+
+class TestUpdateTaskDeadline:
+    """Test reminders follow deadline changes"""
+
+    @pytest.mark.asyncio
+    async def test_deadline_change_resets_pending_reminders(self, session):
+        """Test moving the deadline drops pending reminders and requeues the task"""
+        sponsor = await session.get(User, 1)
+        await join_task(1, TodoCreate(), current_user=await session.get(User, 2), db=session)
+        await task_reminder_scheduler.schedule_task_reminders(session, 1)
+        reminders = await _reminders(session)
+        reminders[0].status = "sent"
+        await session.commit()
+
+        await update_task(1, TaskUpdate(title="Renamed"), current_user=sponsor, db=session)
+        assert len(await _reminders(session)) == len(reminders)
+
+        task = await session.get(Task, 1)
+        await update_task(
+            1, TaskUpdate(deadline=task.deadline + 24 * 3600), current_user=sponsor, db=session
+        )
+
+        # Only the reminder already delivered survives
+        assert [n.status for n in await _reminders(session)] == ["sent"]
+        assert (await session.get(Task, 1)).reminder_scheduled_at is None
@@ -0,0 +1,88 @@
+"""
+Tests for task and todo Pydantic schemas
+"""
+import pytest
+from datetime import datetime
+from pydantic import ValidationError
+
+from app.schemas.task import (
+    TaskCreate, Todo, TodoCreate, TodoUpdate,
+    REMIND_ALL, REMIND_T_1D, REMIND_DDL_2H,
+    remind_flags_to_dict, remind_flags_from_dict, remind_flags_to_json
+)
+
+
+class TestTaskCreate:
+    """Test the task creation schema"""
+
+    def test_tag_ids_default_is_empty_tuple(self):
+        """Test tag_ids defaults to an immutable empty tuple"""
+        task = TaskCreate(title="Bounty")
+
+        assert task.tag_ids == ()
+
+    def test_tag_ids_accepts_list_payload(self):
+        """Test JSON arrays still validate into tag_ids"""
+        task = TaskCreate(title="Bounty", tag_ids=[1, 2, 3])
+
+        assert task.tag_ids == (1, 2, 3)
+
+    def test_tag_ids_limit(self):
+        """Test at most 20 tags may be attached"""
+        with pytest.raises(ValidationError):
+            TaskCreate(title="Bounty", tag_ids=list(range(21)))
+
+
+class TestRemindFlags:
+    """Test the todo remind_flags bitmask"""
+
+    def test_default_is_all_reminders(self):
+        """Test todos remind on every milestone by default"""
+        todo = TodoCreate(task_id=1)
+
+        assert todo.remind_flags == REMIND_ALL
+
+    def test_out_of_range_rejected(self):
+        """Test masks outside the three known bits are rejected"""
+        with pytest.raises(ValidationError):
+            TodoCreate(remind_flags=8)
+        with pytest.raises(ValidationError):
+            TodoUpdate(remind_flags=-1)
+
+    def test_dict_round_trip(self):
+        """Test bitmask <-> dict conversion"""
+        mask = REMIND_T_1D | REMIND_DDL_2H
+        flags = remind_flags_to_dict(mask)
+
+        assert flags == {"t_3d": False, "t_1d": True, "ddl_2h": True}
+        assert remind_flags_from_dict(flags) == mask
+        assert remind_flags_from_dict({}) == REMIND_ALL
+
+    def test_response_parses_stored_json(self):
+        """Test the response schema reads the JSON text stored in the DB"""
+        now = datetime.utcnow()
+        todo = Todo(
+            id=1,
+            user_id=1,
+            added_at=now,
+            is_completed=False,
+            created_at=now,
+            updated_at=now,
+            remind_flags=remind_flags_to_json(REMIND_T_1D)
+        )
+
+        assert todo.remind_flags == REMIND_T_1D
+        assert todo.model_dump()["remind_settings"] == {
+            "t_3d": False, "t_1d": True, "ddl_2h": False
+        }
+
+    def test_response_defaults_when_unset(self):
+        """Test NULL or malformed stored flags fall back to all reminders"""
+        now = datetime.utcnow()
+        common = dict(
+            id=1, user_id=1, added_at=now, is_completed=False,
+            created_at=now, updated_at=now
+        )
+
+        assert Todo(remind_flags=None, **common).remind_flags == REMIND_ALL
+        assert Todo(remind_flags="not json", **common).remind_flags == REMIND_ALL
@@ -0,0 +1,448 @@
+"""
+Telegram notification delivery tests
+"""
+import asyncio
+import json
+import time
+import httpx
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.notification import Notification
+from app.models.user import User
+from app.api.v1.endpoints.notifications import telegram_webhook
+from app.schemas.notification import TelegramBindRequest
+from app.services.telegram_bot import TelegramBotService, TelegramNotificationSender, _TokenBucket
+
+
+@pytest.fixture
+async def session(fresh_db_session):
+    """In-memory database with bound, unbound and muted Telegram users"""
+    fresh_db_session.add_all([
+        User(id=1, email="bound@example.com", nickname="Bound", is_active=True,
+             telegram_chat_id="1001", telegram_notifications_enabled=True),
+        User(id=2, email="unbound@example.com", nickname="Unbound", is_active=True),
+        User(id=3, email="muted@example.com", nickname="Muted", is_active=True,
+             telegram_chat_id="1003", telegram_notifications_enabled=False),
+    ])
+    await fresh_db_session.commit()
+    return fresh_db_session
+
+
+async def _seed_notifications(db: AsyncSession, user_id: int, count: int):
+    """Add due pending Telegram notifications for a user"""
+    due = datetime.utcnow() - timedelta(minutes=1)
+    db.add_all([
+        Notification(
+            user_id=user_id, type="new_message", channel="telegram",
+            title=f"Title {i}", message="Body", scheduled_at=due
+        )
+        for i in range(count)
+    ])
+    await db.commit()
+
+
+class TestTelegramBotService:
+    """Test direct Bot API delivery"""
+
+    def setup_method(self):
+        """Point the service's pooled client at a mock transport"""
+        self.requests = []
+        self.service = TelegramBotService()
+        self.service._send_message_url = "https://api.telegram.org/botTOKEN/sendMessage"
+
+    def _use_transport(self, *bodies: dict):
+        """Answer successive requests with the given bodies, repeating the last"""
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            body = bodies[min(len(self.requests), len(bodies)) - 1]
+            return httpx.Response(429 if body.get("error_code") == 429 else 200, json=body)
+
+        self.service._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    @pytest.mark.asyncio
+    async def test_send_notification_posts_send_message(self):
+        """Test notifications go straight to sendMessage on the pooled client"""
+        self._use_transport({"ok": True, "result": {"message_id": 42}})
+
+        delivery_id = await self.service.send_notification("1001", "Title", "Body")
+
+        assert delivery_id == "42"
+        assert len(self.requests) == 1
+        assert str(self.requests[0].url) == self.service._send_message_url
+        assert json.loads(self.requests[0].content) == {
+            "chat_id": "1001", "text": "🔔 Title\n\nBody"
+        }
+
+    @pytest.mark.asyncio
+    async def test_markdown_characters_sent_verbatim(self):
+        """Test titles with Markdown metacharacters go out as plain text"""
+        self._use_transport({"ok": True, "result": {"message_id": 1}})
+
+        await self.service.send_notification("1001", "fix_bug [*urgent*]", "see `main`")
+
+        body = json.loads(self.requests[0].content)
+        assert "parse_mode" not in body
+        assert body["text"] == "🔔 fix_bug [*urgent*]\n\nsee `main`"
+
+    @pytest.mark.asyncio
+    async def test_send_notification_rejected_by_api(self):
+        """Test an ok=false reply is reported as a failed delivery"""
+        self._use_transport({"ok": False, "description": "Bad Request: chat not found"})
+
+        assert await self.service.send_notification("1001", "Title", "Body") is None
+
+    @pytest.mark.asyncio
+    async def test_send_notification_without_client(self):
+        """Test sends are skipped before the bot is initialized"""
+        assert await self.service.send_notification("1001", "Title", "Body") is None
+
+    @pytest.mark.asyncio
+    async def test_rate_limited_send_retried_once(self):
+        """Test a 429 waits retry_after and retries, giving up on a second 429"""
+        limited = {"ok": False, "error_code": 429, "parameters": {"retry_after": 0}}
+        self._use_transport(limited, {"ok": True, "result": {"message_id": 7}})
+
+        assert await self.service.send_notification("1001", "Title", "Body") == "7"
+        assert len(self.requests) == 2
+
+        self.requests.clear()
+        self._use_transport(limited)
+        self.service.CHAT_SEND_INTERVAL_SECONDS = 0
+
+        assert await self.service.send_notification("1002", "Title", "Body") is None
+        assert len(self.requests) == 2
+
+    @pytest.mark.asyncio
+    async def test_messages_to_one_chat_are_spaced(self):
+        """Test consecutive sends to a chat wait out the per-chat interval"""
+        self._use_transport({"ok": True, "result": {"message_id": 1}})
+        self.service.CHAT_SEND_INTERVAL_SECONDS = 0.05
+
+        started = time.monotonic()
+        await asyncio.gather(*(
+            self.service.send_notification("1001", "Title", f"Body {i}") for i in range(3)
+        ))
+        elapsed = time.monotonic() - started
+
+        assert len(self.requests) == 3
+        assert elapsed >= 0.1
+
+    @pytest.mark.asyncio
+    async def test_token_bucket_paces_after_burst(self):
+        """Test the global bucket allows a burst and then paces to its rate"""
+        bucket = _TokenBucket(rate=50, capacity=2)
+
+        started = time.monotonic()
+        for _ in range(4):
+            await bucket.acquire()
+        elapsed = time.monotonic() - started
+
+        # Two tokens from the burst, then two more at 50/s
+        assert elapsed >= 0.035
+
+
+class TestTelegramNotificationSender:
+    """Test pending Telegram notification delivery"""
+
+    def setup_method(self):
+        """Set up a sender around an initialized bot service"""
+        self.bot_service = TelegramBotService()
+        self.bot_service._initialized = True
+        self.bot_service._http = MagicMock()
+        # Pacing is covered by TestTelegramBotService
+        self.bot_service.CHAT_SEND_INTERVAL_SECONDS = 0
+        self.sender = TelegramNotificationSender(self.bot_service)
+
+    @pytest.mark.asyncio
+    async def test_stopped_bot_skips_pass(self, session):
+        """Test a stopped bot is detected once per pass, before any query or send"""
+        self.bot_service._http = AsyncMock()
+        await self.bot_service.stop_bot()
+
+        with patch("app.services.telegram_bot.notification_service.get_pending_notifications",
+                   new_callable=AsyncMock) as mock_pending, \
+                patch.object(self.bot_service, "send_notification_broadcast",
+                             new_callable=AsyncMock) as mock_broadcast:
+            await self.sender.send_pending_notifications(session)
+
+        assert self.bot_service._initialized is False
+        mock_pending.assert_not_awaited()
+        mock_broadcast.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_sends_run_concurrently_within_limit(self, session):
+        """Test sends overlap within the in-flight cap and are recorded in bulk"""
+        await _seed_notifications(session, user_id=1, count=6)
+        self.bot_service._send_semaphore = asyncio.Semaphore(3)
+        in_flight = 0
+        peak = 0
+
+        async def slow_send(chat_id, text):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            # Delivery id echoes the title from the first line
+            return f"msg-{text.splitlines()[0].removeprefix('🔔 ')}"
+
+        updates = []
+
+        def count_updates(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("UPDATE notifications"):
+                updates.append(statement)
+
+        sync_engine = session.bind.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", count_updates)
+        try:
+            with patch.object(self.bot_service, "_send_raw", side_effect=slow_send):
+                await self.sender.send_pending_notifications(session)
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", count_updates)
+
+        assert peak == 3
+        # One sweep for undeliverable rows, then every delivery recorded by one UPDATE
+        assert len(updates) == 2
+        notifications = (await session.execute(select(Notification))).scalars().all()
+        assert all(n.status == "sent" for n in notifications)
+        assert all(n.delivery_id == f"msg-{n.title}" for n in notifications)
+
+    @pytest.mark.asyncio
+    async def test_outcomes_recorded_per_notification(self, session):
+        """Test unbound users, send failures and errors are marked failed"""
+        await _seed_notifications(session, user_id=1, count=3)
+        await _seed_notifications(session, user_id=2, count=1)
+        ids = (await session.execute(
+            select(Notification.id).where(Notification.user_id == 1).order_by(Notification.id)
+        )).scalars().all()
+
+        async def send(chat_id, text):
+            if "Title 0" in text:
+                return None
+            if "Title 1" in text:
+                raise httpx.ConnectError("boom")
+            return "ok"
+
+        with patch.object(self.bot_service, "_send_raw", side_effect=send):
+            await self.sender.send_pending_notifications(session)
+
+        rows = {
+            n.id: n for n in (await session.execute(select(Notification))).scalars().all()
+        }
+        assert rows[ids[0]].error_message == "Failed to send Telegram message"
+        assert rows[ids[1]].error_message == "Failed to send Telegram message"
+        assert rows[ids[2]].status == "sent"
+        unbound = [n for n in rows.values() if n.user_id == 2]
+        assert unbound[0].error_message == "User has no Telegram chat ID"
+        assert all(rows[i].retry_count == 1 for i in ids[:2])
+
+    @pytest.mark.asyncio
+    async def test_shared_notification_formatted_once(self, session):
+        """Test notifications sharing title and message go out as one broadcast"""
+        session.add_all([
+            User(id=4, email="four@example.com", nickname="Four", is_active=True,
+                 telegram_chat_id="1004", telegram_notifications_enabled=True),
+            User(id=5, email="five@example.com", nickname="Five", is_active=True,
+                 telegram_chat_id="1005", telegram_notifications_enabled=True),
+        ])
+        await session.commit()
+        for user_id in (1, 4, 5):
+            await _seed_notifications(session, user_id=user_id, count=1)
+
+        async def send(chat_id, text):
+            return f"msg-{chat_id}"
+
+        with patch.object(self.bot_service, "_send_raw", side_effect=send) as mock_raw, \
+                patch.object(TelegramBotService, "_format_notification",
+                             wraps=TelegramBotService._format_notification) as mock_format:
+            await self.sender.send_pending_notifications(session)
+
+        mock_format.assert_called_once_with("Title 0", "Body")
+        assert sorted(call.args[0] for call in mock_raw.await_args_list) == ["1001", "1004", "1005"]
+        assert len({call.args[1] for call in mock_raw.await_args_list}) == 1
+        notifications = (await session.execute(select(Notification))).scalars().all()
+        chat_ids = {1: "1001", 4: "1004", 5: "1005"}
+        assert all(n.delivery_id == f"msg-{chat_ids[n.user_id]}" for n in notifications)
+
+    @pytest.mark.asyncio
+    async def test_undeliverable_rejected_in_bulk(self, session):
+        """Test unbound and muted users are failed by one UPDATE without loading their rows"""
+        await _seed_notifications(session, user_id=2, count=3)
+        await _seed_notifications(session, user_id=3, count=2)
+        await _seed_notifications(session, user_id=1, count=1)
+        updates = []
+
+        def count_updates(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("UPDATE notifications"):
+                updates.append(statement)
+
+        sync_engine = session.bind.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", count_updates)
+        try:
+            with patch.object(self.bot_service, "_send_raw", return_value="m1") as mock_send:
+                await self.sender.send_pending_notifications(session)
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", count_updates)
+
+        # Only the bound user's row is sent
+        mock_send.assert_called_once()
+        assert mock_send.call_args.args[0] == "1001"
+        # The sweep and the sent-marking
+        assert len(updates) == 2
+
+        notifications = (await session.execute(select(Notification))).scalars().all()
+        errors = {n.user_id: n.error_message for n in notifications}
+        assert errors == {
+            1: None,
+            2: "User has no Telegram chat ID",
+            3: "User has Telegram notifications disabled",
+        }
+        undeliverable = [n for n in notifications if n.user_id != 1]
+        assert all(n.retry_count == 1 and n.status == "pending" for n in undeliverable)
+
+
+class TestTelegramCommandLookups:
+    """Test chat -> account lookups in the command handlers"""
+
+    def setup_method(self):
+        """Set up a fresh command service"""
+        self.service = TelegramBotService()
+
+    @staticmethod
+    def _update(chat_id: str):
+        update = MagicMock()
+        update.effective_chat.id = chat_id
+        update.message.reply_text = AsyncMock()
+        return update
+
+    @staticmethod
+    def _session_factory(session):
+        factory = MagicMock()
+        factory.return_value.__aenter__ = AsyncMock(return_value=session)
+        factory.return_value.__aexit__ = AsyncMock(return_value=False)
+        return factory
+
+    @pytest.mark.asyncio
+    async def test_status_lookup_cached_until_unbind(self, session):
+        """Test repeated /status skips the query and /unbind drops the entry"""
+        user_queries = []
+
+        def count_user_queries(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("SELECT") and "FROM users" in statement:
+                user_queries.append(statement)
+
+        sync_engine = session.bind.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", count_user_queries)
+        try:
+            with patch("app.core.database.AsyncSessionLocal", self._session_factory(session)):
+                for _ in range(3):
+                    update = self._update("1001")
+                    await self.service.status_command(update, MagicMock())
+                    assert "Status: Bound" in update.message.reply_text.await_args.args[0]
+
+                update = self._update("1001")
+                await self.service.unbind_command(update, MagicMock())
+                assert "unbound successfully" in update.message.reply_text.await_args.args[0]
+
+                update = self._update("1001")
+                await self.service.status_command(update, MagicMock())
+                assert "Not bound" in update.message.reply_text.await_args.args[0]
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", count_user_queries)
+
+        # One lookup for the first /status, one after the unbind
+        assert len(user_queries) == 2
+        user = await session.get(User, 1)
+        await session.refresh(user)
+        assert user.telegram_chat_id is None
+        assert user.telegram_notifications_enabled is False
+
+    @pytest.mark.asyncio
+    async def test_unbind_unknown_chat(self, session):
+        """Test /unbind for an unbound chat changes nothing"""
+        with patch("app.core.database.AsyncSessionLocal", self._session_factory(session)):
+            update = self._update("9999")
+            await self.service.unbind_command(update, MagicMock())
+
+        assert "No account is bound" in update.message.reply_text.await_args.args[0]
+
+
+class TestTelegramBindRequest:
+    """Test chat ids bound through the API match the bot's lookup key"""
+
+    def test_numeric_chat_id_stored_as_str(self):
+        """Test JSON numbers and strings normalize to str(chat.id)"""
+        assert TelegramBindRequest(telegram_chat_id=-1001234).telegram_chat_id == "-1001234"
+        assert TelegramBindRequest(telegram_chat_id="1001").telegram_chat_id == "1001"
+
+    def test_non_canonical_chat_id_rejected(self):
+        """Test ids the bot could never match are rejected up front"""
+        for chat_id in (" 1001", "@someone", 10.5):
+            with pytest.raises(ValidationError):
+                TelegramBindRequest(telegram_chat_id=chat_id)
+
+
+class TestTelegramWebhook:
+    """Test webhook mode for bot commands"""
+
+    def setup_method(self):
+        """Set up a service around a mocked PTB application"""
+        self.service = TelegramBotService()
+        self.service._initialized = True
+        self.service.bot = AsyncMock()
+        self.service.application = MagicMock()
+        self.service.application.initialize = AsyncMock()
+        self.service.application.start = AsyncMock()
+        self.service.application.updater.start_polling = AsyncMock()
+        self.service.application.update_queue = asyncio.Queue()
+
+    @pytest.mark.asyncio
+    async def test_webhook_mode_replaces_polling(self):
+        """Test a configured webhook is registered and no polling loop starts"""
+        with patch("app.services.telegram_bot.settings") as mock_settings:
+            mock_settings.TELEGRAM_WEBHOOK_URL = "https://api.example.com/hook"
+            mock_settings.TELEGRAM_WEBHOOK_SECRET = "s3cret"
+            await self.service.start_bot()
+
+        self.service.bot.set_webhook.assert_awaited_once_with(
+            url="https://api.example.com/hook", secret_token="s3cret", drop_pending_updates=True
+        )
+        self.service.application.updater.start_polling.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_polling_without_webhook_secret(self):
+        """Test a webhook URL without a secret falls back to polling"""
+        with patch("app.services.telegram_bot.settings") as mock_settings:
+            mock_settings.TELEGRAM_WEBHOOK_URL = "https://api.example.com/hook"
+            mock_settings.TELEGRAM_WEBHOOK_SECRET = None
+            await self.service.start_bot()
+
+        self.service.bot.set_webhook.assert_not_awaited()
+        self.service.application.updater.start_polling.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_pushed_update_is_queued(self):
+        """Test the webhook route checks the secret and queues the update"""
+        self.service.application.running = True
+        request = MagicMock()
+        request.json = AsyncMock(return_value={"update_id": 7})
+
+        with patch("app.services.telegram_bot.telegram_bot_service", self.service), \
+                patch("app.api.v1.endpoints.notifications.settings") as mock_settings:
+            mock_settings.TELEGRAM_WEBHOOK_SECRET = "s3cret"
+
+            with pytest.raises(HTTPException) as exc_info:
+                await telegram_webhook(request, secret_token="wrong")
+            assert exc_info.value.status_code == 403
+            assert self.service.application.update_queue.empty()
+
+            response = await telegram_webhook(request, secret_token="s3cret")
+
+        assert response.success is True
+        assert self.service.application.update_queue.get_nowait().update_id == 7
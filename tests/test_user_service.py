@@ -0,0 +1,53 @@
+"""
+User service tests
+"""
+import pytest
+from sqlalchemy import event
+
+from app.core.exceptions import NotFoundError
+from app.models.user import User, UserWallet
+from app.services.user import user_service
+
+
+@pytest.fixture
+async def session(fresh_db_session):
+    """In-memory database with one Google user holding two wallets"""
+    fresh_db_session.add(User(id=1, email="user@example.com", nickname="User", google_id="g-1", is_active=True))
+    fresh_db_session.add_all([
+        UserWallet(user_id=1, wallet_address="0x" + "1" * 40, is_primary=True),
+        UserWallet(user_id=1, wallet_address="0x" + "2" * 40),
+    ])
+    await fresh_db_session.commit()
+    return fresh_db_session
+
+
+class TestGetUserStats:
+    """Test the per-user stats summary"""
+
+    @pytest.mark.asyncio
+    async def test_stats_in_one_query(self, session):
+        """Test the user row and wallet count come back in a single SELECT"""
+        session.expunge_all()
+        queries = []
+
+        def count_queries(conn, cursor, statement, parameters, context, executemany):
+            queries.append(statement)
+
+        sync_engine = session.bind.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", count_queries)
+        try:
+            stats = await user_service.get_user_stats(session, 1)
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", count_queries)
+
+        assert len(queries) == 1
+        assert stats["user_id"] == 1
+        assert stats["is_active"] is True
+        assert stats["has_google_auth"] is True
+        assert stats["wallet_count"] == 2
+
+    @pytest.mark.asyncio
+    async def test_unknown_user(self, session):
+        """Test a missing user raises NotFoundError"""
+        with pytest.raises(NotFoundError):
+            await user_service.get_user_stats(session, 999)
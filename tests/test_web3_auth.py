@@ -3,7 +3,7 @@ Tests for Web3 wallet authentication service
 """
 import pytest
 from datetime import datetime, timedelta
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from eth_account import Account
 from eth_account.messages import encode_defunct
 
@@ -16,17 +16,19 @@ from app.models.user import User, UserWallet
 class TestWeb3AuthService:
     """Test Web3 authentication service"""
     
-    def test_generate_auth_nonce_valid_address(self):
+    @pytest.mark.asyncio
+    async def test_generate_auth_nonce_valid_address(self):
         """Test generating nonce for valid wallet address"""
         wallet_address = "0x742d35Cc6634C0532925a3b8D4C9db96C4b4d8b6"
         
-        nonce = web3_auth_service.generate_auth_nonce(wallet_address)
+        nonce = await web3_auth_service.generate_auth_nonce(wallet_address)
         
         assert nonce is not None
         assert len(nonce) == 32  # 16 bytes hex = 32 characters
         assert all(c in '0123456789abcdef' for c in nonce)
     
-    def test_generate_auth_nonce_invalid_address(self):
+    @pytest.mark.asyncio
+    async def test_generate_auth_nonce_invalid_address(self):
         """Test generating nonce for invalid wallet address"""
         invalid_addresses = [
             "",
@@ -38,7 +40,7 @@ class TestWeb3AuthService:
         
         for address in invalid_addresses:
             with pytest.raises(ValidationError):
-                web3_auth_service.generate_auth_nonce(address)
+                await web3_auth_service.generate_auth_nonce(address)
     
     def test_get_auth_message(self):
         """Test getting authentication message"""
@@ -105,60 +107,84 @@ class TestWeb3AuthService:
         
         assert is_valid is False
     
-    def test_validate_nonce_valid(self):
+    @pytest.mark.asyncio
+    async def test_validate_nonce_valid(self):
         """Test validating valid nonce"""
         wallet_address = "0x742d35Cc6634C0532925a3b8D4C9db96C4b4d8b6"
         
         # Generate nonce
-        nonce = web3_auth_service.generate_auth_nonce(wallet_address)
+        nonce = await web3_auth_service.generate_auth_nonce(wallet_address)
         
         # Validate nonce
-        is_valid = web3_auth_service._validate_nonce(wallet_address, nonce)
+        is_valid = await web3_auth_service._validate_nonce(wallet_address, nonce)
         
         assert is_valid is True
     
-    def test_validate_nonce_invalid(self):
+    @pytest.mark.asyncio
+    async def test_validate_nonce_invalid(self):
         """Test validating invalid nonce"""
         wallet_address = "0x742d35Cc6634C0532925a3b8D4C9db96C4b4d8b6"
         invalid_nonce = "invalid_nonce"
         
-        is_valid = web3_auth_service._validate_nonce(wallet_address, invalid_nonce)
+        is_valid = await web3_auth_service._validate_nonce(wallet_address, invalid_nonce)
         
         assert is_valid is False
     
-    def test_validate_nonce_used(self):
+    @pytest.mark.asyncio
+    async def test_validate_nonce_used(self):
         """Test validating already used nonce"""
         wallet_address = "0x742d35Cc6634C0532925a3b8D4C9db96C4b4d8b6"
         
         # Generate nonce
-        nonce = web3_auth_service.generate_auth_nonce(wallet_address)
+        nonce = await web3_auth_service.generate_auth_nonce(wallet_address)
         
         # Use nonce once
-        web3_auth_service._validate_nonce(wallet_address, nonce)
+        await web3_auth_service._validate_nonce(wallet_address, nonce)
         
         # Try to use again
-        is_valid = web3_auth_service._validate_nonce(wallet_address, nonce)
+        is_valid = await web3_auth_service._validate_nonce(wallet_address, nonce)
         
         assert is_valid is False
     
-    def test_validate_nonce_expired(self):
+    @pytest.mark.asyncio
+    async def test_validate_nonce_expired(self):
         """Test validating expired nonce"""
         wallet_address = "0x742d35Cc6634C0532925a3b8D4C9db96C4b4d8b6"
         
         # Generate nonce
-        nonce = web3_auth_service.generate_auth_nonce(wallet_address)
+        nonce = await web3_auth_service.generate_auth_nonce(wallet_address)
         
         # Manually expire the nonce
-        normalized_address = wallet_address.lower()
-        web3_auth_service._nonces[normalized_address]['expires_at'] = (
+        key = web3_auth_service._nonce_key(wallet_address.lower())
+        web3_auth_service._local_nonces._cache[key].expires_at = (
             datetime.utcnow() - timedelta(seconds=1)
         )
         
         # Try to validate expired nonce
-        is_valid = web3_auth_service._validate_nonce(wallet_address, nonce)
+        is_valid = await web3_auth_service._validate_nonce(wallet_address, nonce)
         
         assert is_valid is False
     
+    @pytest.mark.asyncio
+    async def test_nonce_stored_in_redis_when_available(self):
+        """Test nonces use SETEX with the TTL and are consumed with GETDEL"""
+        wallet_address = "0x742d35Cc6634C0532925a3b8D4C9db96C4b4d8b6"
+        key = "w3nonce:" + wallet_address.lower()
+        redis_client = AsyncMock()
+        
+        with patch("app.services.web3_auth.get_redis", AsyncMock(return_value=redis_client)):
+            nonce = await web3_auth_service.generate_auth_nonce(wallet_address)
+            redis_client.setex.assert_awaited_once_with(key, 300, nonce)
+            assert web3_auth_service._local_nonces.get(key) is None
+            
+            redis_client.getdel.return_value = nonce
+            assert await web3_auth_service._validate_nonce(wallet_address, nonce) is True
+            redis_client.getdel.assert_awaited_once_with(key)
+            
+            # Already consumed
+            redis_client.getdel.return_value = None
+            assert await web3_auth_service._validate_nonce(wallet_address, nonce) is False
+    
     def test_extract_nonce_from_message(self):
         """Test extracting nonce from authentication message"""
         wallet_address = "0x742d35Cc6634C0532925a3b8D4C9db96C4b4d8b6"
@@ -212,24 +238,6 @@ class TestWeb3AuthService:
         
         with pytest.raises(ValueError):
             web3_auth_service.normalize_wallet_address(invalid_address)
-    
-    def test_cleanup_expired_nonces(self):
-        """Test cleanup of expired nonces"""
-        wallet_address = "0x742d35Cc6634C0532925a3b8D4C9db96C4b4d8b6"
-        
-        # Generate nonce
-        nonce = web3_auth_service.generate_auth_nonce(wallet_address)
-        
-        # Manually expire the nonce
-        normalized_address = wallet_address.lower()
-        web3_auth_service._nonces[normalized_address]['expires_at'] = (
-            datetime.utcnow() - timedelta(seconds=1)
-        )
-        
-        # Cleanup should remove expired nonce
-        web3_auth_service._cleanup_expired_nonces()
-        
-        assert normalized_address not in web3_auth_service._nonces
 
 
 @pytest.mark.asyncio
@@ -257,7 +265,7 @@ class TestWeb3AuthIntegration:
         await db_session.commit()
         
         # Generate nonce and message
-        nonce = web3_auth_service.generate_auth_nonce(wallet_address)
+        nonce = await web3_auth_service.generate_auth_nonce(wallet_address)
         message = web3_auth_service.get_auth_message(wallet_address, nonce)
         
         # Sign message
@@ -289,7 +297,7 @@ class TestWeb3AuthIntegration:
         wallet_address = account.address
         
         # Generate nonce and message
-        nonce = web3_auth_service.generate_auth_nonce(wallet_address)
+        nonce = await web3_auth_service.generate_auth_nonce(wallet_address)
         message = web3_auth_service.get_auth_message(wallet_address, nonce)
         
         # Sign message
@@ -318,7 +326,7 @@ class TestWeb3AuthIntegration:
         wallet_address = account.address
         
         # Generate nonce and message
-        nonce = web3_auth_service.generate_auth_nonce(wallet_address)
+        nonce = await web3_auth_service.generate_auth_nonce(wallet_address)
         message = web3_auth_service.get_auth_message(wallet_address, nonce)
         
         # Sign message
@@ -364,7 +372,7 @@ class TestWeb3AuthIntegration:
         await db_session.commit()
         
         # Generate nonce and message
-        nonce = web3_auth_service.generate_auth_nonce(wallet_address)
+        nonce = await web3_auth_service.generate_auth_nonce(wallet_address)
         message = web3_auth_service.get_auth_message(wallet_address, nonce)
         
         # Sign message